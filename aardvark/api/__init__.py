@@ -1,3 +1,4 @@
+from aardvark.api.flavor import FlavorList  # noqa
 from aardvark.api.instance import Instance  # noqa
 from aardvark.api.instance import InstanceList  # noqa
 from aardvark.api.project import Project  # noqa
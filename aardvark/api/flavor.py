@@ -0,0 +1,42 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from novaclient import exceptions as n_exc
+
+from aardvark.api.rest import nova
+
+
+class FlavorList(object):
+
+    def __init__(self):
+        self.client = nova.novaclient()
+
+    def flavor(self, flavor_id):
+        """Returns the flavor in the format embedded in the servers
+
+        Returns None if the flavor does not exist anymore.
+        """
+        try:
+            flavor = self.client.flavors.get(flavor_id)
+        except n_exc.NotFound:
+            return None
+        return {
+            'vcpus': flavor.vcpus,
+            'ram': flavor.ram,
+            'disk': flavor.disk,
+            'ephemeral': flavor.ephemeral,
+            # NOTE(ttsiouts): swap is an empty string for flavors without swap
+            'swap': flavor.swap or 0,
+        }
@@ -13,16 +13,26 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from aardvark.api.rest import nova
 from aardvark.objects import instance
 
 
+HOST_ATTR = 'OS-EXT-SRV-ATTR:host'
+
+# Servers requested per page. Nova may return fewer, up to its max_limit.
+PAGE_SIZE = 1000
+
+
 class Instance(object):
 
-    def __init__(self, uuid, name, flavor):
+    def __init__(self, uuid, name, flavor, host=None, project_id=None):
         self.uuid = uuid
         self.name = name
         self.flavor = flavor
+        self.host = host
+        self.project_id = project_id
 
 
 class InstanceList(object):
@@ -30,11 +40,39 @@ class InstanceList(object):
     def __init__(self):
         self.client = nova.novaclient()
 
+    def _servers(self, filters):
+        """Lists all the matching servers, following the pages of Nova
+
+        Nova returns at most max_limit servers per request, so the servers
+        are listed page by page until an empty page is returned.
+        """
+        marker = None
+        while True:
+            page = self.client.servers.list(search_opts=filters,
+                                            marker=marker, limit=PAGE_SIZE)
+            if not page:
+                return
+            for server in page:
+                yield server
+            marker = page[-1].id
+
     def instances(self, **filters):
         if 'project_id' in filters:
             filters.update({'all_tenants': True})
         return [instance.Instance(server.id, server.name, server.flavor)
-                for server in self.client.servers.list(search_opts=filters)]
+                for server in self._servers(filters)]
+
+    def instances_by_host(self, **filters):
+        """Lists the servers once and indexes them by their compute host"""
+        if 'project_id' in filters:
+            filters.update({'all_tenants': True})
+        by_host = collections.defaultdict(list)
+        for server in self._servers(filters):
+            host = getattr(server, HOST_ATTR, None)
+            by_host[host].append(instance.Instance(
+                server.id, server.name, server.flavor, host=host,
+                project_id=getattr(server, 'tenant_id', None)))
+        return by_host
 
     def delete_instance(self, instance):
         self.client.servers.delete(instance.uuid)
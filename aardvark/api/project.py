@@ -13,8 +13,34 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
+
 from aardvark.api.rest import keystone
+import aardvark.conf
 from aardvark.objects import project as pr_obj
+from aardvark import utils
+
+
+CONF = aardvark.conf.CONF
+
+_preemptible_cache = None
+_cache_lock = threading.Lock()
+
+
+def _load_preemptible_projects():
+    client = keystone.KeystoneClient()
+    return [pr_obj.Project(project['id'], project['name'], preemptible=True)
+            for project in client.get_projects(tags=['preemptible'])]
+
+
+def preemptible_projects_cache():
+    """Returns the process wide cache of the preemptible projects"""
+    global _preemptible_cache
+    with _cache_lock:
+        if _preemptible_cache is None:
+            _preemptible_cache = utils.ExpiringCache(
+                _load_preemptible_projects, CONF.identity.project_cache_ttl)
+        return _preemptible_cache
 
 
 class Project(object):
@@ -46,8 +72,4 @@ class ProjectList(object):
     @property
     def preemptible_projects(self):
         # Pluggable filters
-        projects = []
-        for project in self.client.get_projects(tags=['preemptible']):
-            projects.append(pr_obj.Project(
-                project['id'], project['name'], preemptible=True))
-        return projects
+        return list(preemptible_projects_cache().get())
@@ -14,6 +14,7 @@
 #    under the License.
 
 from aardvark.api.rest import placement as client
+from aardvark.api import snapshot
 from aardvark.objects import capabilities
 from aardvark.objects import resource_provider as rp_obj
 from aardvark.objects import resources
@@ -59,3 +60,7 @@ class ResourceProviderList(object):
     def resource_providers(self):
         rps = self.client.resource_providers(self.aggregates)
         return [rp_obj.ResourceProvider(rp['uuid'], rp['name']) for rp in rps]
+
+    def load_capabilities(self, resource_providers):
+        loader = snapshot.SnapshotLoader()
+        return loader.load([rp.uuid for rp in resource_providers])
@@ -0,0 +1,170 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Asyncio clients for the Placement, Nova and Keystone APIs
+
+This module is only used by the asyncio reaper workers. It requires Python 3
+and aiohttp, which is installed with the 'asyncio' extra.
+"""
+
+import asyncio
+import functools
+
+from oslo_utils import importutils
+
+from aardvark.api.rest import session
+import aardvark.conf
+
+
+CONF = aardvark.conf.CONF
+
+aiohttp = importutils.try_import('aiohttp')
+
+
+class NotFound(Exception):
+    """The requested resource does not exist"""
+
+
+def available():
+    """Returns True if the asyncio clients can be used"""
+    return aiohttp is not None
+
+
+def create_http_session():
+    """Creates the aiohttp session shared by all the asyncio clients
+
+    Has to be called from within the event loop that will use it.
+    """
+    connector = aiohttp.TCPConnector(limit=CONF.reaper.async_http_limit)
+    return aiohttp.ClientSession(connector=connector)
+
+
+class AsyncRestClient(object):
+    """Base class of the asyncio clients
+
+    The token and the endpoint are taken from the keystoneauth session of
+    the service, shared with the synchronous clients, so the authentication
+    and the service catalog are handled in one place.
+    """
+
+    group = None
+    # The service type looked up in the catalog, instead of the configured
+    # one of the group.
+    service_type = None
+
+    def __init__(self, http):
+        self.http = http
+        self.session = session.get_session(self.group)
+        self._endpoint = None
+
+    def headers(self):
+        return {}
+
+    async def _auth(self):
+        loop = asyncio.get_event_loop()
+        # NOTE(ttsiouts): keystoneauth caches the token and renews it before
+        # it expires, so most of the times this does not block.
+        token = await loop.run_in_executor(None, self.session.get_token)
+        if self._endpoint is None:
+            conf = getattr(CONF, self.group)
+            get_endpoint = functools.partial(
+                self.session.get_endpoint,
+                service_type=self.service_type or conf.service_type,
+                interface=conf.valid_interfaces)
+            self._endpoint = await loop.run_in_executor(None, get_endpoint)
+        return token, self._endpoint.rstrip('/')
+
+    async def request(self, method, url, json=None):
+        token, endpoint = await self._auth()
+        headers = {'X-Auth-Token': token, 'Accept': 'application/json'}
+        headers.update(self.headers())
+        async with self.http.request(method, endpoint + url, json=json,
+                                     headers=headers) as response:
+            if response.status == 404:
+                raise NotFound(url)
+            response.raise_for_status()
+            body = await response.read()
+            if not body:
+                return None
+            return await response.json(content_type=None)
+
+
+class AsyncPlacementClient(AsyncRestClient):
+    """Asyncio client for querying Placement API"""
+
+    group = 'placement'
+
+    def headers(self):
+        return {'OpenStack-API-Version': 'placement 1.17'}
+
+    async def usages(self, resource_provider):
+        url = "/resource_providers/%s/usages" % resource_provider
+        response = await self.request('GET', url)
+        return response['usages']
+
+    async def inventories(self, resource_provider_uuid):
+        url = '/resource_providers/%s/inventories' % resource_provider_uuid
+        response = await self.request('GET', url)
+        return response['inventories']
+
+    async def get_allocations(self, consumer):
+        """Returns allocations for the provided consumer
+
+        Returns None if Placement does not know the consumer, like the
+        synchronous client does.
+        """
+        try:
+            return await self.request('GET', '/allocations/%s' % consumer)
+        except NotFound:
+            return None
+
+
+class AsyncNovaClient(AsyncRestClient):
+    """Asyncio client for the server actions of Nova API"""
+
+    group = 'compute'
+
+    def headers(self):
+        return {'X-OpenStack-Nova-API-Version': CONF.compute.client_version}
+
+    async def delete_server(self, server_uuid):
+        await self.request('DELETE', '/servers/%s' % server_uuid)
+
+    async def rebuild_server(self, server_uuid, image):
+        body = {'rebuild': {'imageRef': image}}
+        await self.request('POST', '/servers/%s/action' % server_uuid,
+                           json=body)
+
+    async def reset_state(self, server_uuid, state='error'):
+        body = {'os-resetState': {'state': state}}
+        await self.request('POST', '/servers/%s/action' % server_uuid,
+                           json=body)
+
+
+class AsyncKeystoneClient(AsyncRestClient):
+    """Asyncio client for querying Keystone API"""
+
+    group = 'identity'
+    # NOTE(ttsiouts): Same as the KeystoneClient, the service type of the
+    # identity group defaults to 'keystone', which is not the one in the
+    # catalog.
+    service_type = 'identity'
+
+    async def get_projects(self, tags=None):
+        url = "/v3/projects"
+        if tags is not None:
+            url += "?tags=%s" % ','.join(tag for tag in tags)
+        response = await self.request('GET', url)
+        return response['projects']
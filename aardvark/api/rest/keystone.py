@@ -14,8 +14,8 @@
 #    under the License.
 
 from keystoneauth1 import exceptions as keystone_exc
-from keystoneauth1 import loading as keystone_loading
 
+from aardvark.api.rest import session
 import aardvark.conf
 
 
@@ -47,10 +47,7 @@ class KeystoneClient(object):
 
     def _create_client(self):
         """Creates the client to Keyston API"""
-        auth_plugin = keystone_loading.load_auth_from_conf_options(
-            CONF, 'identity')
-        client = keystone_loading.load_session_from_conf_options(
-            CONF, 'identity', auth=auth_plugin)
+        client = session.get_session('identity')
         client.additional_headers = {'accept': 'application/json'}
         return client
 
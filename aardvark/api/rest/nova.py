@@ -13,14 +13,19 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-from keystoneauth1 import loading as keystone_loading
+import threading
+
 from novaclient import client
 
+from aardvark.api.rest import session
 import aardvark.conf
 
 
 CONF = aardvark.conf.CONF
 
+_novaclient = None
+_lock = threading.Lock()
+
 
 def delete_server(server_uuid):
     """Deletes the given server"""
@@ -33,8 +38,10 @@ def rebuild_server(server_uuid):
 
 
 def novaclient():
-    auth_plugin = keystone_loading.load_auth_from_conf_options(CONF,
-                                                               'compute')
-    session = keystone_loading.load_session_from_conf_options(
-        CONF, 'compute', auth=auth_plugin)
-    return client.Client(CONF.compute.client_version, session=session)
+    """Returns the novaclient shared in the process"""
+    global _novaclient
+    with _lock:
+        if _novaclient is None:
+            _novaclient = client.Client(CONF.compute.client_version,
+                                        session=session.get_session('compute'))
+        return _novaclient
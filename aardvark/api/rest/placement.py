@@ -14,8 +14,8 @@
 #    under the License.
 
 from keystoneauth1 import exceptions as keystone_exc
-from keystoneauth1 import loading as keystone_loading
 
+from aardvark.api.rest import session
 import aardvark.conf
 
 
@@ -70,10 +70,7 @@ class PlacementClient(object):
 
     def _create_client(self):
         """Creates the client to Placement API"""
-        auth_plugin = keystone_loading.load_auth_from_conf_options(
-            CONF, 'placement')
-        client = keystone_loading.load_session_from_conf_options(
-            CONF, 'placement', auth=auth_plugin)
+        client = session.get_session('placement')
         client.additional_headers = {'accept': 'application/json'}
         return client
 
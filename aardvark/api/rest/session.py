@@ -0,0 +1,61 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+from keystoneauth1 import loading as keystone_loading
+import requests
+from requests import adapters
+
+import aardvark.conf
+
+
+CONF = aardvark.conf.CONF
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def get_session(group):
+    """Returns the session shared in the process for the given conf group
+
+    Sharing the session means that all the clients of a service reuse the
+    same token and the same pool of keep-alive connections.
+
+    :param group: the configuration group of the service, e.g. 'placement'
+    """
+    with _lock:
+        if group not in _sessions:
+            _sessions[group] = _create_session(group)
+        return _sessions[group]
+
+
+def _create_session(group):
+    http = requests.Session()
+    adapter = adapters.HTTPAdapter(
+        pool_connections=CONF.aardvark.http_pool_connections,
+        pool_maxsize=CONF.aardvark.http_pool_maxsize)
+    http.mount('http://', adapter)
+    http.mount('https://', adapter)
+
+    auth_plugin = keystone_loading.load_auth_from_conf_options(CONF, group)
+    return keystone_loading.load_session_from_conf_options(
+        CONF, group, auth=auth_plugin, session=http)
+
+
+def reset():
+    """Drops the shared sessions, e.g. after the configuration changed"""
+    with _lock:
+        _sessions.clear()
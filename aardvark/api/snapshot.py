@@ -0,0 +1,129 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from concurrent import futures
+import threading
+import time
+
+from keystoneauth1 import exceptions as keystone_exc
+from oslo_log import log as logging
+
+from aardvark.api.rest import placement as client
+import aardvark.conf
+from aardvark.objects import capabilities
+from aardvark.objects import resources
+
+
+LOG = logging.getLogger(__name__)
+CONF = aardvark.conf.CONF
+
+
+# NOTE(ttsiouts): Only transient failures are retried. Anything else means
+# that the provider cannot be loaded right now and it is skipped.
+RETRIABLE_EXCEPTIONS = (
+    keystone_exc.RetriableConnectionFailure,
+    keystone_exc.ServiceUnavailable,
+    keystone_exc.GatewayTimeout,
+)
+
+# Time (in seconds) to wait before the first retry of a failed request. It is
+# doubled for every following retry, so that an overloaded Placement is not
+# hit again right away.
+RETRY_BACKOFF = 0.2
+
+
+class SnapshotLoader(object):
+    """Loads the capabilities of many resource providers in parallel
+
+    Instead of walking the resource providers one by one, the inventories
+    and the usages of all of them are requested concurrently through a
+    bounded pool of workers.
+    """
+
+    def __init__(self, workers=None, retries=None):
+        self.client = client.PlacementClient()
+        self.workers = workers or CONF.placement.snapshot_workers
+        self.retries = (retries if retries is not None
+                        else CONF.placement.snapshot_retries)
+        self._lock = threading.Lock()
+        self.fetch_time = 0
+        self.failed = 0
+        self.retried = 0
+
+    def load(self, uuids):
+        """Returns a dict with the capabilities per provider uuid
+
+        Providers whose inventories or usages could not be loaded are left
+        out of the returned dict.
+
+        :param uuids: the uuids of the resource providers to load
+        """
+        self.failed = 0
+        self.retried = 0
+        start = time.time()
+
+        calls = {}
+        with futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for uuid in uuids:
+                calls[uuid] = (
+                    pool.submit(self._fetch, 'inventories', uuid),
+                    pool.submit(self._fetch, 'usages', uuid))
+
+        loaded = {}
+        for uuid, (inventories, usages) in calls.items():
+            inventories = inventories.result()
+            usages = usages.result()
+            if inventories is None or usages is None:
+                LOG.warning("Skipping resource provider %s from snapshot",
+                            uuid)
+                continue
+            loaded[uuid] = capabilities.Capabilities(
+                resources.Resources(usages),
+                resources.Resources.obj_from_inventories(inventories))
+
+        self.fetch_time = time.time() - start
+        LOG.info("Loaded snapshot of %d resource providers in %.2fs "
+                 "(failed calls: %d, retried calls: %d)", len(loaded),
+                 self.fetch_time, self.failed, self.retried)
+        return loaded
+
+    def _fetch(self, call, uuid):
+        method = getattr(self.client, call)
+        attempt = 0
+        while True:
+            try:
+                result = method(uuid)
+            except RETRIABLE_EXCEPTIONS as e:
+                if attempt < self.retries:
+                    delay = RETRY_BACKOFF * 2 ** attempt
+                    attempt += 1
+                    self._count('retried')
+                    LOG.debug("Retrying to load %s of %s in %.1fs: %s",
+                              call, uuid, delay, e)
+                    time.sleep(delay)
+                    continue
+                LOG.error("Failed to load %s of %s: %s", call, uuid, e)
+                result = None
+            except keystone_exc.ClientException as e:
+                LOG.error("Failed to load %s of %s: %s", call, uuid, e)
+                result = None
+
+            if result is None:
+                self._count('failed')
+            return result
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
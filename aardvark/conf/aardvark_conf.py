@@ -60,6 +60,56 @@ enable it, set the config option aardvark.enable_watermark_mode to True.
                default=10,
                help="""
 Default interval (in seconds) for running periodic tasks.
+"""
+    ),
+    cfg.BoolOpt('enable_state_model',
+                default=False,
+                help="""
+Enable the in-memory cluster state model
+
+If this option is True, the service keeps a model of the usages and the
+servers of the resource providers. The model is updated by the instance
+notifications and periodically reconciled with Placement and Nova, so that
+the reaper does not have to query them for every request. This requires the
+notification handling to be enabled.
+"""
+    ),
+    cfg.IntOpt('state_reconcile_interval',
+               default=600,
+               min=1,
+               help="""
+Interval (in seconds) between two full reconciliations of the cluster state
+model with Placement and Nova.
+
+This is taken under consideration only if the state model is enabled.
+"""
+    ),
+    cfg.IntOpt('aggregate_cache_ttl',
+               default=3600,
+               min=0,
+               help="""
+Time (in seconds) for which the uuids of the watched aggregates are cached.
+
+The cache is also refreshed when an aggregate is created, updated or deleted,
+if the notification handling is enabled. Set to 0 to ask Nova every time.
+"""
+    ),
+    cfg.IntOpt('http_pool_connections',
+               default=4,
+               min=1,
+               help="""
+Number of hosts for which keep-alive connections are pooled per service.
+"""
+    ),
+    cfg.IntOpt('http_pool_maxsize',
+               default=20,
+               min=1,
+               help="""
+Maximum number of keep-alive connections kept per host.
+
+The sessions towards Placement, Nova and Keystone are shared by all the
+threads of the service, so this should be at least as large as the number
+of concurrent requests, e.g. placement.snapshot_workers.
 """
     ),
 ]
@@ -27,9 +27,24 @@ identity_group = cfg.OptGroup(
 )
 
 
+identity_opts = [
+    cfg.IntOpt("project_cache_ttl",
+        default=300,
+        min=0,
+        help="""
+Time (in seconds) for which the list of preemptible projects is cached.
+
+When the cached list expires it keeps being served while it is refreshed in
+the background. Set to 0 to query Keystone every time the list is needed.
+"""
+    ),
+]
+
+
 def register_opts(conf):
 
     conf.register_group(identity_group)
+    conf.register_opts(identity_opts, group=identity_group)
 
     group = getattr(identity_group, 'name', identity_group)
 
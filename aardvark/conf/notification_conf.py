@@ -34,6 +34,94 @@ notification_opts = [
     cfg.MultiStrOpt("topics",
         default=["versioned_notifications"],
         help="""Set the topics where the listeners should subscribe to"""),
+    cfg.IntOpt("batch_size",
+        default=1,
+        min=1,
+        help="""
+Maximum number of notifications handed over to the endpoints at once.
+
+If greater than 1, the batch notification listener is used. The
+instance.update notifications of each batch are filtered on their raw state
+fields and are correlated with the instance.schedule notifications of the
+same batch. This reduces the overhead per notification on busy clouds.
+"""
+    ),
+    cfg.IntOpt("batch_timeout",
+        default=1,
+        min=1,
+        help="""
+Maximum time (in seconds) to wait for a batch of notifications to fill up
+before handing it over to the endpoints.
+
+This is taken under consideration only if batch_size is greater than 1.
+"""
+    ),
+    cfg.IntOpt("pending_ttl",
+        default=600,
+        min=1,
+        help="""
+Time (in seconds) for which the info of a scheduled server, or of a partially
+bundled multi-instance request, is kept while waiting for the rest of its
+notifications.
+
+The entries of servers that never reach the pending state are dropped after
+this time.
+"""
+    ),
+    cfg.IntOpt("pending_max_size",
+        default=10000,
+        min=1,
+        help="""
+Maximum number of entries kept while waiting for the rest of the
+notifications of the servers. The oldest ones are dropped first.
+"""
+    ),
+    cfg.IntOpt("pending_shards",
+        default=16,
+        min=1,
+        help="""
+Number of independently locked shards the entries kept while waiting for the
+notifications of the servers are spread over.
+"""
+    ),
+    cfg.IntOpt("dedup_ttl",
+        default=60,
+        min=0,
+        help="""
+Time (in seconds) for which the received notifications that trigger the
+reaper are remembered, in order to drop their duplicates.
+
+Notifications can be delivered more than once, e.g. when they are requeued or
+when more than one transport is used. A notification is a duplicate if its
+message id, or the same state transition of the same server, was already
+received within this time. Set to 0 to handle all of them.
+"""
+    ),
+    cfg.FloatOpt("schedule_event_timeout",
+        default=2.0,
+        min=0,
+        help="""
+Maximum time (in seconds) to wait for the instance.schedule notification of a
+server that was set to the pending state before it arrived.
+
+The update of the server is parked meanwhile, without blocking the listener.
+If the scheduling notification does not arrive in time, the server is set to
+the error state.
+"""
+    ),
+    cfg.IntOpt("stats_interval",
+        default=300,
+        min=0,
+        help="""
+Interval (in seconds) between the logs of the statistics of the notification
+handling, e.g. the duplicates dropped, the size of the maps of the entries
+waiting for other notifications and how long the updates waited for their
+scheduling events.
+
+The statistics are logged while handling the notifications that trigger the
+reaper. Set to 0 to disable them.
+"""
+    ),
 ]
 
 
@@ -32,6 +32,16 @@ compute_opts = [
         default="2.61",
         help="""
 Selects where the API microversion requested by the novaclient.
+"""
+    ),
+    cfg.IntOpt("flavor_cache_ttl",
+        default=3600,
+        min=0,
+        help="""
+Time (in seconds) for which a flavor looked up by id in the Nova API is cached.
+
+Flavors embedded in the server representations are cached for the lifetime of
+the service, since their content cannot change.
 """
     ),
 ]
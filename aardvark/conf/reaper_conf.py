@@ -55,6 +55,48 @@ each requested slot.
                help="""
 The number of alternative slots that the the reaper will try to free up for
 each requested slot.
+"""
+    ),
+    cfg.FloatOpt('strict_driver_time_budget',
+                 default=5.0,
+                 min=0,
+                 help="""
+Maximum time (in seconds) that the strict_driver spends searching for the best
+matching combination of servers for each requested slot.
+
+When the budget is exhausted, the best combination found so far is used.
+"""
+    ),
+    cfg.StrOpt('planner_mode',
+               default='inline',
+               choices=('inline', 'process'),
+               help="""
+Where the reaper driver selects the servers to cull.
+
+The options are:
+
+* 'inline': In the thread of the reaper worker
+* 'process': In a pool of processes shared by all the workers, so that the
+  workers of different aggregates can plan in parallel
+"""
+    ),
+    cfg.IntOpt('planner_workers',
+               min=1,
+               help="""
+Number of processes of the planning pool. Defaults to the number of CPUs.
+
+This is taken under consideration only if planner_mode is 'process'.
+"""
+    ),
+    cfg.BoolOpt('vectorized_host_selection',
+                default=False,
+                help="""
+Use NumPy to evaluate which hosts can provide the requested resources.
+
+If enabled, the chance_driver keeps the potential capacity of all the hosts in
+a matrix and finds the valid hosts with a single vector comparison, instead of
+checking them one by one. Requires NumPy; if it is not installed the option is
+ignored.
 """
     ),
     cfg.ListOpt('watched_aggregates',
@@ -89,6 +131,107 @@ backends are redis and zookeper.
                default='localhost',
                help="""
 Specifies the host where the job board backend can be found.
+"""
+    ),
+    cfg.FloatOpt('job_poll_interval',
+                 default=5.0,
+                 min=0.1,
+                 help="""
+Maximum time (in seconds) that an idle reaper worker waits before checking
+the job board again.
+
+The workers are woken up as soon as a new job is posted (through Redis pub/sub
+or ZooKeeper watches), this is only the fallback for missed notifications.
+It has to be well below the interval of the worker health check.
+"""
+    ),
+    cfg.FloatOpt('coalescing_window',
+                 default=0,
+                 min=0,
+                 help="""
+Time window (in seconds) for coalescing reaper requests.
+
+When a reaper worker picks up a request, it waits for this long and then
+claims all the pending requests for the same aggregates, so that the victims
+for all of them are selected and deleted in a single pass over one system
+snapshot. Set to 0 to handle each request on its own.
+"""
+    ),
+    cfg.StrOpt('worker_mode',
+               default='thread',
+               choices=('thread', 'asyncio'),
+               help="""
+How the reaper workers are run.
+
+The options are:
+
+* 'thread': Each group of watched aggregates is served by a thread of its own
+* 'asyncio': All the groups are served by tasks of a single event loop, which
+  fetch the snapshots, delete, wait for and rebuild the servers through
+  asynchronous requests. Requires Python 3 and aiohttp, otherwise the 'thread'
+  mode is used. Requests are not coalesced in this mode.
+"""
+    ),
+    cfg.IntOpt('async_http_limit',
+               default=100,
+               min=1,
+               help="""
+Maximum number of concurrent HTTP requests of the asyncio reaper workers.
+
+This is taken under consideration only if worker_mode is 'asyncio'.
+"""
+    ),
+    cfg.IntOpt('delete_workers',
+               default=10,
+               min=1,
+               help="""
+Maximum number of preemptible servers deleted concurrently by a reaper worker.
+"""
+    ),
+    cfg.IntOpt('rebuild_workers',
+               default=10,
+               min=1,
+               help="""
+Maximum number of pending servers rebuilt concurrently by a reaper worker.
+"""
+    ),
+    cfg.BoolOpt('pipelined_rebuild',
+                default=False,
+                help="""
+Rebuild the pending servers as soon as capacity is released.
+
+If enabled, a pending server is rebuilt as soon as the allocations of all the
+preemptible servers culled to make space for it are removed, instead of
+waiting for the allocations of all the culled servers. This reduces the time
+to spawn the first servers of multi-instance requests.
+"""
+    ),
+    cfg.IntOpt('allocation_wait_timeout',
+               default=20,
+               min=0,
+               help="""
+Maximum time (in seconds) to wait for the allocations of the deleted servers
+to be removed from Placement before rebuilding the pending servers.
+"""
+    ),
+    cfg.FloatOpt('allocation_poll_interval',
+                 default=0.5,
+                 min=0.01,
+                 help="""
+Initial interval (in seconds) between two checks of the allocations of the
+deleted servers.
+
+The interval is doubled after each check up to allocation_poll_max_interval.
+The wait ends earlier for the servers whose instance.delete.end notification
+is received by the notification listener.
+"""
+    ),
+    cfg.FloatOpt('allocation_poll_max_interval',
+                 default=4.0,
+                 min=0.01,
+                 help="""
+Maximum interval (in seconds) between two checks of the allocations of the
+deleted servers.
 """
     ),
 ]
@@ -0,0 +1,2 @@
+from aardvark.db.resource_provider import ResourceProvider  # noqa
+from aardvark.db.resource_provider import ResourceProviderList  # noqa
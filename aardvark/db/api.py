@@ -0,0 +1,146 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+from oslo_config import cfg
+from oslo_log import log as logging
+import sqlalchemy as sa
+
+import aardvark.conf
+from aardvark.db import models
+
+
+LOG = logging.getLogger(__name__)
+CONF = aardvark.conf.CONF
+
+_engines = {}
+_lock = threading.Lock()
+
+
+def get_engine():
+    """Returns the engine shared in the process for the configured DB"""
+    connection = CONF.placement.connection
+    if not connection:
+        raise cfg.RequiredOptError('connection',
+                                   cfg.OptGroup('placement'))
+    with _lock:
+        if connection not in _engines:
+            _engines[connection] = sa.create_engine(
+                connection, pool_pre_ping=True)
+        return _engines[connection]
+
+
+def reset():
+    """Disposes the engines, e.g. after the configuration changed"""
+    with _lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+def _providers_query(aggregates=None):
+    rps = models.resource_providers
+    query = sa.select(rps.c.id, rps.c.uuid, rps.c.name)
+    if aggregates:
+        rp_aggs = models.resource_provider_aggregates
+        aggs = models.placement_aggregates
+        members = sa.select(rp_aggs.c.resource_provider_id).where(
+            rp_aggs.c.aggregate_id == aggs.c.id).where(
+            aggs.c.uuid.in_(list(aggregates)))
+        query = query.where(rps.c.id.in_(members))
+    return query
+
+
+def resource_providers(aggregates=None):
+    """Returns the uuid and the name of the resource providers
+
+    :param aggregates: if given, only the members of any of these aggregates
+                       are returned
+    """
+    with get_engine().connect() as conn:
+        rows = conn.execute(_providers_query(aggregates))
+        return [{'uuid': row.uuid, 'name': row.name} for row in rows]
+
+
+def _resource_class_names(conn):
+    names = dict(enumerate(models.STANDARD_RESOURCE_CLASSES))
+    rcs = models.resource_classes
+    for row in conn.execute(sa.select(rcs.c.id, rcs.c.name)):
+        names[row.id] = row.name
+    return names
+
+
+def capabilities(uuids):
+    """Returns the inventories and the usages of many resource providers
+
+    Everything is loaded with one query per table, whatever the number of
+    the resource providers.
+
+    Returns a dict with the provider uuid as key and a tuple of the
+    inventories and the usages, formatted as in the Placement API, as value.
+
+    :param uuids: the uuids of the resource providers
+    """
+    uuids = list(uuids)
+    if not uuids:
+        return {}
+
+    rps = models.resource_providers
+    invs = models.inventories
+    allocs = models.allocations
+
+    inventories_query = sa.select(
+        rps.c.uuid, invs.c.resource_class_id, invs.c.total,
+        invs.c.reserved, invs.c.min_unit, invs.c.max_unit,
+        invs.c.step_size, invs.c.allocation_ratio).where(
+        invs.c.resource_provider_id == rps.c.id).where(
+        rps.c.uuid.in_(uuids))
+
+    usages_query = sa.select(
+        rps.c.uuid, allocs.c.resource_class_id,
+        sa.func.sum(allocs.c.used).label('used')).where(
+        allocs.c.resource_provider_id == rps.c.id).where(
+        rps.c.uuid.in_(uuids)).group_by(
+        rps.c.uuid, allocs.c.resource_class_id)
+
+    loaded = {uuid: ({}, {}) for uuid in uuids}
+    with get_engine().connect() as conn:
+        names = _resource_class_names(conn)
+        for row in conn.execute(inventories_query):
+            rc = names.get(row.resource_class_id)
+            if rc is None:
+                LOG.warning("Unknown resource class with id %s",
+                            row.resource_class_id)
+                continue
+            loaded[row.uuid][0][rc] = {
+                'total': row.total,
+                'reserved': row.reserved,
+                'min_unit': row.min_unit,
+                'max_unit': row.max_unit,
+                'step_size': row.step_size,
+                'allocation_ratio': row.allocation_ratio,
+            }
+        for row in conn.execute(usages_query):
+            rc = names.get(row.resource_class_id)
+            if rc is not None:
+                loaded[row.uuid][1][rc] = int(row.used)
+
+    # Providers with inventories only on classes without usages still have
+    # a zero usage for them, like in the Placement API.
+    for inventories, usages in loaded.values():
+        for rc in inventories:
+            usages.setdefault(rc, 0)
+    return loaded
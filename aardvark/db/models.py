@@ -0,0 +1,96 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""The tables of the Placement database used by aardvark
+
+Only the tables and the columns needed to calculate the capabilities of the
+resource providers are defined here.
+"""
+
+import sqlalchemy as sa
+
+
+metadata = sa.MetaData()
+
+resource_providers = sa.Table(
+    'resource_providers', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('uuid', sa.String(36), nullable=False, unique=True),
+    sa.Column('name', sa.Unicode(200)),
+    sa.Column('generation', sa.Integer),
+    sa.Column('root_provider_id', sa.Integer),
+    sa.Column('parent_provider_id', sa.Integer),
+)
+
+inventories = sa.Table(
+    'inventories', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('resource_provider_id', sa.Integer, nullable=False),
+    sa.Column('resource_class_id', sa.Integer, nullable=False),
+    sa.Column('total', sa.Integer, nullable=False),
+    sa.Column('reserved', sa.Integer, nullable=False),
+    sa.Column('min_unit', sa.Integer, nullable=False),
+    sa.Column('max_unit', sa.Integer, nullable=False),
+    sa.Column('step_size', sa.Integer, nullable=False),
+    sa.Column('allocation_ratio', sa.Float, nullable=False),
+)
+
+allocations = sa.Table(
+    'allocations', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('resource_provider_id', sa.Integer, nullable=False),
+    sa.Column('consumer_id', sa.String(36), nullable=False),
+    sa.Column('resource_class_id', sa.Integer, nullable=False),
+    sa.Column('used', sa.Integer, nullable=False),
+)
+
+placement_aggregates = sa.Table(
+    'placement_aggregates', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('uuid', sa.String(36), index=True),
+)
+
+resource_provider_aggregates = sa.Table(
+    'resource_provider_aggregates', metadata,
+    sa.Column('resource_provider_id', sa.Integer, primary_key=True),
+    sa.Column('aggregate_id', sa.Integer, primary_key=True),
+)
+
+resource_classes = sa.Table(
+    'resource_classes', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('name', sa.String(255), nullable=False, unique=True),
+)
+
+# NOTE(ttsiouts): Older Placement databases do not store the standard
+# resource classes in the resource_classes table. Their ids are their
+# positions in this list.
+STANDARD_RESOURCE_CLASSES = [
+    'VCPU',
+    'MEMORY_MB',
+    'DISK_GB',
+    'PCI_DEVICE',
+    'SRIOV_NET_VF',
+    'NUMA_SOCKET',
+    'NUMA_CORE',
+    'NUMA_THREAD',
+    'NUMA_MEMORY_MB',
+    'IPV4_ADDRESS',
+    'VGPU',
+    'VGPU_DISPLAY_HEAD',
+    'NET_BW_EGR_KILOBIT_PER_SEC',
+    'NET_BW_IGR_KILOBIT_PER_SEC',
+    'PCPU',
+]
@@ -0,0 +1,64 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from aardvark.db import api
+from aardvark.objects import capabilities
+from aardvark.objects import resource_provider as rp_obj
+from aardvark.objects import resources
+
+
+class ResourceProvider(object):
+
+    def __init__(self, uuid, name):
+        self.uuid = uuid
+        self.name = name
+
+    def _load(self):
+        return api.capabilities([self.uuid])[self.uuid]
+
+    @property
+    def usages(self):
+        return resources.Resources(self._load()[1])
+
+    @property
+    def inventories(self):
+        return resources.Resources.obj_from_inventories(self._load()[0])
+
+    @property
+    def capabilities(self):
+        inventories, usages = self._load()
+        return capabilities.Capabilities(
+            resources.Resources(usages),
+            resources.Resources.obj_from_inventories(inventories))
+
+
+class ResourceProviderList(object):
+
+    def __init__(self, aggregates=None):
+        self.aggregates = aggregates
+
+    @property
+    def resource_providers(self):
+        rps = api.resource_providers(self.aggregates)
+        return [rp_obj.ResourceProvider(rp['uuid'], rp['name']) for rp in rps]
+
+    def load_capabilities(self, resource_providers):
+        loaded = api.capabilities([rp.uuid for rp in resource_providers])
+        return {
+            uuid: capabilities.Capabilities(
+                resources.Resources(usages),
+                resources.Resources.obj_from_inventories(inventories))
+            for uuid, (inventories, usages) in loaded.items()
+        }
@@ -13,7 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import threading
+
 import aardvark.conf
+from aardvark import utils
 import oslo_messaging
 
 
@@ -33,6 +36,10 @@ class NotificationEndpoint(object):
             self.filter_rule = oslo_messaging.NotificationFilter(
                 event_type='|'.join(self.event_types))
 
+    def close(self):
+        """Releases the resources held by the endpoint"""
+        pass
+
     def _default_action(self, *args, **kwargs):
         if CONF.notification.default_action == "requeue":
             return oslo_messaging.NotificationResult.REQUEUE
@@ -57,3 +64,62 @@ class NotificationEvent(object):
 
     def __init__(self, payload):
         self.payload = payload
+
+
+class Deduplicator(object):
+    """Recognizes the notifications that were already received
+
+    Notifications may be delivered more than once, e.g. when they are
+    requeued or received from more than one transport. The keys seen are
+    kept for CONF.notification.dedup_ttl seconds.
+    """
+
+    def __init__(self):
+        self.seen = utils.ShardedMap(CONF.notification.dedup_ttl,
+                                     CONF.notification.pending_max_size,
+                                     shards=CONF.notification.pending_shards)
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.duplicates = 0
+
+    def is_duplicate(self, message_id, *keys):
+        """Returns True if the message or any of the given keys was seen
+
+        The keys are marked as seen right away, so that the copies of a
+        notification received concurrently are dropped. The message_id is
+        only marked by mark(), once the notification is handled, so that a
+        message that failed is handled when it is delivered again. None keys
+        are ignored.
+        """
+        if not CONF.notification.dedup_ttl:
+            return False
+        duplicate = message_id is not None and message_id in self.seen
+        for key in keys:
+            if key is None:
+                continue
+            count = self.seen.update(key, lambda seen: (seen or 0) + 1)
+            duplicate = duplicate or count > 1
+        with self._lock:
+            self.checked += 1
+            if duplicate:
+                self.duplicates += 1
+        return duplicate
+
+    def mark(self, *keys):
+        """Marks the given keys as seen"""
+        if not CONF.notification.dedup_ttl:
+            return
+        for key in keys:
+            if key is not None:
+                self.seen[key] = 1
+
+    def forget(self, *keys):
+        """Forgets the given keys, the next notification is not a duplicate"""
+        for key in keys:
+            self.seen.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            rate = float(self.duplicates) / self.checked if self.checked else 0
+            return {'checked': self.checked, 'duplicates': self.duplicates,
+                    'duplicate_rate': rate}
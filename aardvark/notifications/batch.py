@@ -0,0 +1,160 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Endpoints for the batch notification listener
+
+The batch listener hands over lists of messages, grouped by priority, instead
+of calling the endpoints once per notification.
+"""
+
+from oslo_log import log as logging
+import oslo_messaging
+
+from aardvark.notifications import endpoints as endpoint_objs
+from aardvark.notifications import events
+
+
+LOG = logging.getLogger(__name__)
+
+
+def _call(method, message):
+    return method(message['ctxt'], message['publisher_id'],
+                  message['event_type'], message['payload'],
+                  message['metadata'])
+
+
+class BatchEndpoint(object):
+    """Adapts a notification endpoint to the batch listener
+
+    Each message of the batch is passed to the endpoint on its own.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.filter_rule = getattr(endpoint, 'filter_rule', None)
+
+    def _dispatch(self, priority, messages):
+        requeue = oslo_messaging.NotificationResult.REQUEUE
+        method = getattr(self.endpoint, priority)
+        result = None
+        for message in messages:
+            # NOTE(ttsiouts): A failing message must not drop the rest of
+            # the batch.
+            try:
+                if _call(method, message) == requeue:
+                    result = requeue
+            except Exception:
+                LOG.exception("Failed to handle %s notification",
+                              message['event_type'])
+        return result
+
+    def audit(self, messages):
+        return self._dispatch('audit', messages)
+
+    def critical(self, messages):
+        return self._dispatch('critical', messages)
+
+    def debug(self, messages):
+        return self._dispatch('debug', messages)
+
+    def error(self, messages):
+        return self._dispatch('error', messages)
+
+    def info(self, messages):
+        return self._dispatch('info', messages)
+
+    def sample(self, messages):
+        return self._dispatch('sample', messages)
+
+    def warn(self, messages):
+        return self._dispatch('warn', messages)
+
+
+class InstanceBatchEndpoint(object):
+    """Handles the scheduling and the update notifications in batches
+
+    The updates are checked on their raw state_update fields and the events
+    are built only for the servers set to the pending state, which are a
+    small fraction of all the instance.update notifications.
+
+    The batch listener dispatches the notifications of a batch sorted by
+    priority, so the scheduling events (error) of the batch are recorded
+    before the updates (info) of the same batch are correlated with them.
+    """
+
+    def __init__(self, scheduling, state_update):
+        self.scheduling = scheduling
+        self.state_update = state_update
+        event_types = scheduling.event_types + state_update.event_types
+        self.filter_rule = oslo_messaging.NotificationFilter(
+            event_type='|'.join(event_types))
+
+    def error(self, messages):
+        for message in messages:
+            if message['event_type'] not in self.scheduling.event_types:
+                continue
+            try:
+                _call(self.scheduling.error, message)
+            except Exception:
+                LOG.exception("Failed to handle %s notification",
+                              message['event_type'])
+
+    def info(self, messages):
+        pending = []
+        for message in messages:
+            if message['event_type'] not in self.state_update.event_types:
+                continue
+            payload = message['payload']
+            try:
+                if events.is_pending_update(payload):
+                    pending.append((events.InstanceUpdateEvent(payload),
+                                    message['metadata']))
+                else:
+                    uuid = payload['nova_object.data']['uuid']
+                    self.state_update.forget(uuid)
+            except Exception:
+                LOG.exception("Failed to handle %s notification",
+                              message['event_type'])
+
+        if pending:
+            LOG.info("%d notifications received triggering reaper",
+                     len(pending))
+        for event, metadata in pending:
+            try:
+                self.state_update.handle_pending(event, metadata)
+            except Exception:
+                LOG.exception("Failed to handle the pending server %s",
+                              event.instance_uuid)
+
+
+def batch_endpoints(endpoints):
+    """Returns the endpoints to be used by the batch listener"""
+    scheduling = state_update = None
+    batch = []
+    for endpoint in endpoints:
+        if isinstance(endpoint, endpoint_objs.SchedulingEndpoint):
+            scheduling = endpoint
+        elif isinstance(endpoint, endpoint_objs.StateUpdateEndpoint):
+            state_update = endpoint
+        else:
+            batch.append(BatchEndpoint(endpoint))
+
+    if scheduling is not None and state_update is not None:
+        batch.append(InstanceBatchEndpoint(scheduling, state_update))
+    else:
+        batch += [BatchEndpoint(endpoint)
+                  for endpoint in (scheduling, state_update)
+                  if endpoint is not None]
+    return batch
@@ -0,0 +1,166 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import heapq
+import threading
+import time
+
+from oslo_log import log as logging
+from taskflow.utils import threading_utils
+
+
+LOG = logging.getLogger(__name__)
+
+
+class Correlator(object):
+    """Matches the servers set to pending with their scheduling events
+
+    Nova may send the instance.update notification of a server set to the
+    pending state before the instance.schedule one. Instead of blocking the
+    listener thread, the update is parked and completed as soon as the
+    scheduling event arrives, from the thread that received it. If it does
+    not arrive within timeout seconds, the update expires.
+
+    The events of each server are matched under one of a few striped locks,
+    so that an event can never be missed between the two notifications.
+    """
+
+    def __init__(self, events, timeout, locks=16):
+        """:param events: the map keeping the scheduling events per uuid"""
+        self.events = events
+        self.timeout = timeout
+        self._locks = [threading.Lock() for _ in range(locks)]
+        self._cond = threading.Condition(threading.Lock())
+        self._parked = {}
+        self._deadlines = []
+        self._thread = None
+
+        self.immediate = 0
+        self.deferred = 0
+        self.correlated = 0
+        self.expired = 0
+        self.cancelled = 0
+        self.wait_time = 0
+        self.max_wait_time = 0
+
+    def _lock(self, uuid):
+        return self._locks[hash(uuid) % len(self._locks)]
+
+    def schedule_received(self, uuid, event):
+        with self._lock(uuid):
+            with self._cond:
+                parked = self._parked.pop(uuid, None)
+                if parked is not None:
+                    self.correlated += 1
+                    self._record_wait(time.time() - parked[0])
+            if parked is None:
+                self.events[uuid] = event
+                return
+
+        LOG.debug("Scheduling event of %s received after its update",
+                  uuid)
+        parked[1](event)
+
+    def update_received(self, uuid, callback, on_expire):
+        """Calls back with the scheduling event of the server
+
+        :param callback: called with the scheduling event, right away if it
+                         was already received
+        :param on_expire: called if the scheduling event is not received
+                          within the timeout
+        """
+        with self._lock(uuid):
+            event = self.events.pop(uuid, None)
+            if event is None:
+                self._park(uuid, callback, on_expire)
+                return
+        with self._cond:
+            self.immediate += 1
+        callback(event)
+
+    def cancel(self, uuid):
+        """Drops the parked update of a server that left the pending state"""
+        with self._lock(uuid):
+            with self._cond:
+                if self._parked.pop(uuid, None) is None:
+                    return
+                self.cancelled += 1
+        LOG.debug("Dropped the parked update of %s", uuid)
+
+    def _park(self, uuid, callback, on_expire):
+        now = time.time()
+        with self._cond:
+            self._parked[uuid] = (now, callback, on_expire)
+            heapq.heappush(self._deadlines, (now + self.timeout, uuid))
+            self.deferred += 1
+            if self._thread is None:
+                self._thread = threading_utils.daemon_thread(self._expire)
+                self._thread.start()
+            self._cond.notify()
+        LOG.debug("Parked the update of %s until its scheduling event "
+                  "arrives", uuid)
+
+    def _expire(self):
+        while True:
+            with self._cond:
+                expired = self._next_expired()
+            if expired is None:
+                continue
+            uuid, on_expire = expired
+            LOG.warning("No scheduling event received for %s within %.1fs",
+                        uuid, self.timeout)
+            try:
+                on_expire()
+            except Exception:
+                LOG.exception("Failed to handle the expired update of %s",
+                              uuid)
+
+    def _next_expired(self):
+        while not self._deadlines:
+            self._cond.wait()
+        deadline, uuid = self._deadlines[0]
+        now = time.time()
+        if deadline > now:
+            self._cond.wait(deadline - now)
+            return None
+        heapq.heappop(self._deadlines)
+
+        parked = self._parked.get(uuid)
+        if parked is None or parked[0] + self.timeout > now:
+            # Already correlated or cancelled, or parked again later on.
+            return None
+        del self._parked[uuid]
+        self.expired += 1
+        self._record_wait(now - parked[0])
+        return uuid, parked[2]
+
+    def _record_wait(self, elapsed):
+        self.wait_time += elapsed
+        self.max_wait_time = max(self.max_wait_time, elapsed)
+
+    def stats(self):
+        """Returns how often and how long the updates waited"""
+        with self._cond:
+            waited = self.correlated + self.expired
+            return {
+                'parked': len(self._parked),
+                'immediate': self.immediate,
+                'deferred': self.deferred,
+                'correlated': self.correlated,
+                'expired': self.expired,
+                'cancelled': self.cancelled,
+                'avg_wait_time': self.wait_time / waited if waited else 0,
+                'max_wait_time': self.max_wait_time,
+            }
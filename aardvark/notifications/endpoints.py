@@ -14,24 +14,70 @@
 #    under the License.
 
 
+from aardvark.api import project as project_api
 from aardvark.api.rest import nova
+import aardvark.conf
 from aardvark import exception
 from aardvark.notifications import base
+from aardvark.notifications import correlation
 from aardvark.notifications import events
+from aardvark.objects import cluster_state
 from aardvark.objects import resources as resources_obj
 from aardvark.reaper import job_manager
 from aardvark.reaper import reaper_request as rr_obj
+from aardvark.reaper import release_tracker
 from aardvark import utils
 
-import collections
+import functools
 from novaclient import exceptions as n_exc
 from oslo_log import log as logging
+import threading
+import time
 
 
 LOG = logging.getLogger(__name__)
+CONF = aardvark.conf.CONF
 
+_instance_map = None
+_correlator = None
+_lock = threading.Lock()
 
-instance_map = utils.SafeDict()
+
+def pending_map():
+    """Creates a map for the entries waiting for other notifications"""
+    return utils.ShardedMap(CONF.notification.pending_ttl,
+                            CONF.notification.pending_max_size,
+                            shards=CONF.notification.pending_shards)
+
+
+def instance_map():
+    """Returns the scheduling events of the servers, keyed by their uuid"""
+    global _instance_map
+    with _lock:
+        if _instance_map is None:
+            _instance_map = pending_map()
+        return _instance_map
+
+
+def correlator():
+    """Returns the correlator of the scheduling and the update events"""
+    global _correlator
+    events = instance_map()
+    with _lock:
+        if _correlator is None:
+            _correlator = correlation.Correlator(
+                events, CONF.notification.schedule_event_timeout,
+                locks=CONF.notification.pending_shards)
+        return _correlator
+
+
+def _add(uuids, uuid):
+    return uuids if uuid in uuids else uuids + [uuid]
+
+
+def _pending_key(uuid):
+    # The deduplication key of a server being set to the pending state
+    return (uuid, 'pending')
 
 
 class SchedulingEndpoint(base.NotificationEndpoint):
@@ -42,10 +88,11 @@ class SchedulingEndpoint(base.NotificationEndpoint):
         super(SchedulingEndpoint, self).__init__()
 
     def error(self, ctxt, publisher_id, event_type, payload, metadata):
-        # Add the info in a dict with the uuid as a key
+        # Keep the info with the uuid as a key, unless the update of the
+        # server is already waiting for it.
         event = events.SchedulingEvent(payload)
         for uuid in event.instance_uuids:
-            instance_map[uuid] = event
+            correlator().schedule_received(uuid, event)
 
 
 class StateUpdateEndpoint(base.NotificationEndpoint):
@@ -56,31 +103,71 @@ class StateUpdateEndpoint(base.NotificationEndpoint):
         super(StateUpdateEndpoint, self).__init__()
         self.novaclient = nova.novaclient()
         self.job_manager = job_manager.JobManager()
-        # Use this dict to bundle up the scheduling events
-        self.bundled_reqs = collections.defaultdict(list)
+        # Use this map to bundle up the scheduling events
+        self.bundled_reqs = pending_map()
+        self.deduplicator = base.Deduplicator()
+        self._stats_lock = threading.Lock()
+        self._next_stats = time.time() + CONF.notification.stats_interval
 
     def info(self, ctxt, publisher_id, event_type, payload, metadata):
-        event = events.InstanceUpdateEvent(payload)
-        if event.old_state == 'building' and event.new_state == 'pending':
+        if events.is_pending_update(payload):
             LOG.info("Notification received triggering reaper")
-            self.trigger_reaper(
-               event.instance_uuid, event.flavor, event.image)
+            self.handle_pending(events.InstanceUpdateEvent(payload),
+                                metadata)
         else:
-            # Pop instance info from the instance_map in case this is about
-            # another state transition.
-            uuid = instance_map.pop(event.instance_uuid, None)
-            if uuid:
-                LOG.debug("Removed instance %s from instance map", uuid)
-
-    @utils.retries
-    def trigger_reaper(self, uuid, flavor, image):
+            self.forget(payload['nova_object.data']['uuid'])
+
+    def handle_pending(self, event, metadata=None):
+        """Triggers the reaper for a server set to the pending state
+
+        Duplicates of notifications already handled are dropped.
+        """
+        uuid = event.instance_uuid
+        message_id = (metadata or {}).get('message_id')
+        self.log_stats()
+        if self.deduplicator.is_duplicate(message_id, _pending_key(uuid)):
+            LOG.info("Dropping duplicate notification for server %s (%s)",
+                     uuid, self.deduplicator.stats())
+            return
         try:
-            # No default value in order to retry
-            info = instance_map.pop(uuid)
-        except KeyError:
-            # Maybe there is a race. Raising RetryException to rerty
-            raise exception.RetryException()
+            correlator().update_received(
+                uuid,
+                functools.partial(self.trigger_reaper, uuid, event.flavor,
+                                  event.image, message_id=message_id),
+                functools.partial(self._reset_instances, [uuid]))
+        except Exception:
+            # Let the notification through when it is delivered again.
+            self.deduplicator.forget(_pending_key(uuid))
+            raise
 
+    def log_stats(self):
+        """Logs the stats of the notification handling once per interval"""
+        interval = CONF.notification.stats_interval
+        if not interval:
+            return
+        now = time.time()
+        with self._stats_lock:
+            if now < self._next_stats:
+                return
+            self._next_stats = now + interval
+        LOG.info("Notification stats: deduplicator %s, instance map %s, "
+                 "bundled requests %s, correlator %s",
+                 self.deduplicator.stats(), instance_map().stats(),
+                 self.bundled_reqs.stats(), correlator().stats())
+
+    def forget(self, uuid):
+        # Pop instance info from the instance_map in case this is about
+        # another state transition.
+        info = instance_map().pop(uuid, None)
+        if info:
+            LOG.debug("Removed instance %s from instance map", uuid)
+        # The server is not pending anymore, so its parked update, if any,
+        # must not trigger the reaper when the scheduling event arrives.
+        correlator().cancel(uuid)
+        # If it is set to pending again, it is not a duplicate.
+        self.deduplicator.forget(_pending_key(uuid))
+
+    def trigger_reaper(self, uuid, flavor, image, info, message_id=None):
         # Enrich the request with info from the instance_map
         request = resources_obj.Resources.obj_from_payload(flavor)
 
@@ -88,16 +175,18 @@ class StateUpdateEndpoint(base.NotificationEndpoint):
         request_id = info.request_id
 
         if info.multiple_instances:
-            self.bundled_reqs[info.request_id] += [uuid]
-            if len(info.instance_uuids) != len(self.bundled_reqs[request_id]):
+            bundled = self.bundled_reqs.update(
+                request_id, lambda uuids: _add(uuids or [], uuid))
+            if len(info.instance_uuids) != len(bundled):
                 # Wait until the last instance for this request is set to the
                 # Pending state, bundle the requests and trigger the reaper
                 # once for all of them.
                 LOG.info('Bundling up requests for multiple instances.')
+                self.deduplicator.mark(message_id)
                 return
             # Remove the bundled requests after all instance update
             # notifications are received
-            del self.bundled_reqs[request_id]
+            self.bundled_reqs.pop(request_id, None)
 
         reaper_request = rr_obj.ReaperRequest(
                 uuids, info.project_id, request, image, info.aggregates)
@@ -106,6 +195,11 @@ class StateUpdateEndpoint(base.NotificationEndpoint):
         except exception.ReaperException as e:
             LOG.error(e.message)
             self._reset_instances(uuids)
+            return
+        self.deduplicator.mark(message_id)
+
+    def close(self):
+        self.job_manager.close()
 
     def _reset_instances(self, uuids):
         for uuid in uuids:
@@ -118,3 +212,81 @@ class StateUpdateEndpoint(base.NotificationEndpoint):
                 LOG.info("Server with uuid: %s, not found.", uuid)
                 continue
             LOG.info("Request to reset the server %s was sent.", uuid)
+
+
+class InstanceDeleteEndpoint(base.NotificationEndpoint):
+
+    event_types = ['instance.delete.end']
+
+    def __init__(self):
+        super(InstanceDeleteEndpoint, self).__init__()
+
+    def info(self, ctxt, publisher_id, event_type, payload, metadata):
+        # Wake up the reaper workers waiting for the allocations of this
+        # instance to be removed.
+        event = events.InstanceActionEvent(payload)
+        release_tracker.tracker.release(event.instance_uuid)
+
+
+class ClusterStateEndpoint(base.NotificationEndpoint):
+    """Applies the changes of the servers to the cluster state model"""
+
+    event_types = [
+        'instance.create.end',
+        'instance.delete.end',
+        'instance.resize.confirm.end',
+        'instance.live_migration_post.end',
+    ]
+
+    def __init__(self):
+        super(ClusterStateEndpoint, self).__init__()
+
+    def info(self, ctxt, publisher_id, event_type, payload, metadata):
+        event = events.InstanceActionEvent(payload)
+        state = cluster_state.state
+        if event_type == 'instance.create.end':
+            state.server_created(event.instance_uuid, event.host,
+                                 event.project_id, event.flavor)
+        elif event_type == 'instance.delete.end':
+            state.server_deleted(event.instance_uuid)
+        else:
+            state.server_moved(event.instance_uuid, event.host, event.flavor)
+
+
+class ProjectUpdateEndpoint(base.NotificationEndpoint):
+    """Keeps the cached preemptible projects in sync with Keystone
+
+    Keystone emits these notifications on its own topic (usually
+    'notifications'), which has to be added to CONF.notification.topics.
+    """
+
+    event_types = [
+        'identity.project.created',
+        'identity.project.updated',
+        'identity.project.deleted',
+    ]
+
+    def __init__(self):
+        super(ProjectUpdateEndpoint, self).__init__()
+
+    def info(self, ctxt, publisher_id, event_type, payload, metadata):
+        LOG.debug("Received %s, refreshing preemptible projects", event_type)
+        project_api.preemptible_projects_cache().invalidate()
+
+
+class AggregateUpdateEndpoint(base.NotificationEndpoint):
+    """Keeps the uuids of the watched aggregates in sync with Nova"""
+
+    event_types = [
+        'aggregate.create.end',
+        'aggregate.update_prop.end',
+        'aggregate.delete.end',
+    ]
+
+    def __init__(self):
+        super(AggregateUpdateEndpoint, self).__init__()
+
+    def info(self, ctxt, publisher_id, event_type, payload, metadata):
+        LOG.debug("Received %s, refreshing the watched aggregates",
+                  event_type)
+        utils.aggregate_registry().invalidate()
@@ -51,6 +51,16 @@ class SchedulingEvent(base.NotificationEvent):
             return None
 
 
+def is_pending_update(payload):
+    """Checks the raw payload of an instance.update notification
+
+    Returns True if the server was set from building to pending, without
+    building the event.
+    """
+    state = payload['nova_object.data']['state_update']['nova_object.data']
+    return state['old_state'] == 'building' and state['state'] == 'pending'
+
+
 class InstanceUpdateEvent(base.NotificationEvent):
     """Instance State Update Event"""
 
@@ -77,3 +87,26 @@ class InstanceUpdateEvent(base.NotificationEvent):
     @property
     def flavor(self):
         return self.payload['nova_object.data']['flavor']['nova_object.data']
+
+
+class InstanceActionEvent(base.NotificationEvent):
+    """Instance Action Event, e.g. instance.delete.end"""
+
+    def __init__(self, payload):
+        super(InstanceActionEvent, self).__init__(payload)
+
+    @property
+    def instance_uuid(self):
+        return self.payload['nova_object.data']['uuid']
+
+    @property
+    def host(self):
+        return self.payload['nova_object.data']['host']
+
+    @property
+    def project_id(self):
+        return self.payload['nova_object.data']['tenant_id']
+
+    @property
+    def flavor(self):
+        return self.payload['nova_object.data']['flavor']['nova_object.data']
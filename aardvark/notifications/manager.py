@@ -14,6 +14,7 @@
 #    under the License.
 
 import aardvark.conf
+from aardvark.notifications import batch
 from aardvark.notifications import endpoints as endpoint_objs
 import oslo_messaging
 
@@ -25,16 +26,30 @@ class ListenerManager(object):
 
     def __init__(self):
         self.listeners = []
+        self.endpoints = []
 
     def _get_listeners(self):
         targets = [oslo_messaging.Target(topic=topic)
                    for topic in CONF.notification.topics]
         endpoints = [
             endpoint_objs.SchedulingEndpoint(),
-            endpoint_objs.StateUpdateEndpoint()
+            endpoint_objs.StateUpdateEndpoint(),
+            endpoint_objs.InstanceDeleteEndpoint(),
+            endpoint_objs.ProjectUpdateEndpoint(),
+            endpoint_objs.AggregateUpdateEndpoint()
         ]
+        if CONF.aardvark.enable_state_model:
+            endpoints.append(endpoint_objs.ClusterStateEndpoint())
+        self.endpoints = endpoints
         transports = [oslo_messaging.get_notification_transport(
             CONF, url) for url in CONF.notification.urls]
+        if CONF.notification.batch_size > 1:
+            return [oslo_messaging.get_batch_notification_listener(
+                transport, targets, batch.batch_endpoints(endpoints),
+                executor='threading',
+                batch_size=CONF.notification.batch_size,
+                batch_timeout=CONF.notification.batch_timeout)
+                for transport in transports]
         return [oslo_messaging.get_notification_listener(
             transport, targets, endpoints, executor='threading')
             for transport in transports]
@@ -49,3 +64,6 @@ class ListenerManager(object):
             listener.stop()
             listener.wait()
         self.listeners = []
+        for endpoint in self.endpoints:
+            endpoint.close()
+        self.endpoints = []
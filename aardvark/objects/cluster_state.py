@@ -0,0 +1,259 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import threading
+import time
+
+from oslo_log import log as logging
+
+from aardvark.objects import capabilities
+from aardvark.objects import flavor as flavor_obj
+from aardvark.objects import instance
+from aardvark.objects import resource_provider
+
+
+LOG = logging.getLogger(__name__)
+
+
+class ClusterState(object):
+    """Long lived model of the resource providers and their servers
+
+    The model is loaded from Placement and Nova by reconcile() and it is kept
+    up to date in between by applying the instance notifications as deltas.
+    The servers are tracked by uuid, so a notification about a server that
+    was already accounted for (or that is not known) is ignored instead of
+    being counted twice. Any remaining drift is fixed by the next
+    reconciliation.
+
+    The APIs are queried without holding the lock, so the notifications
+    received while reconciling are recorded and applied again on top of the
+    reloaded model.
+
+    The reaper reads copies of the model through snapshot(), without calling
+    any API.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # resource provider uuid -> (name, Capabilities)
+        self._providers = {}
+        # host name -> resource provider uuid
+        self._hosts = {}
+        # frozenset of aggregates -> resource provider uuids
+        self._members = {}
+        # server uuid -> Instance
+        self._servers = {}
+        # host name -> {server uuid: Instance}
+        self._by_host = collections.defaultdict(dict)
+        self.reconciled_at = None
+        self.applied = 0
+        self.ignored = 0
+        # The deltas received during a reconciliation, None otherwise
+        self._recorded = None
+
+    @property
+    def ready(self):
+        return self.reconciled_at is not None
+
+    def reconcile(self, watched_aggregates=None):
+        """Reloads the whole model from the APIs
+
+        :param watched_aggregates: list of aggregate lists, whose members are
+                                   resolved in advance
+        """
+        start = time.time()
+        with self._lock:
+            self._recorded = []
+        try:
+            providers, members, servers = self._load(watched_aggregates or [])
+        except Exception:
+            with self._lock:
+                self._recorded = None
+            raise
+
+        with self._lock:
+            drifted = 0
+            for uuid, (name, caps) in providers.items():
+                known = self._providers.get(uuid)
+                if known is not None and known[1].used != caps.used:
+                    drifted += 1
+            self._providers = providers
+            self._hosts = {name: uuid
+                           for uuid, (name, _) in providers.items()}
+            self._members = members
+            self._servers = {}
+            self._by_host = collections.defaultdict(dict)
+            for server in servers:
+                self._add_server(server)
+            self.reconciled_at = time.time()
+
+            # NOTE(ttsiouts): The deltas are idempotent per server, so the
+            # ones already included in what was loaded are just ignored.
+            recorded, self._recorded = self._recorded, None
+            for delta, args in recorded:
+                delta(*args)
+
+        LOG.info("Reconciled cluster state with %d resource providers and "
+                 "%d servers in %.2fs (drifted providers: %d, applied "
+                 "events: %d, ignored events: %d, replayed events: %d)",
+                 len(providers), len(servers), time.time() - start, drifted,
+                 self.applied, self.ignored, len(recorded))
+        self.applied = 0
+        self.ignored = 0
+
+    def _load(self, watched_aggregates):
+        rp_list = resource_provider.ResourceProviderList()
+        rps = rp_list.resource_providers
+        loaded = rp_list.load_capabilities(rps)
+        providers = {rp.uuid: (rp.name, loaded[rp.uuid])
+                     for rp in rps if rp.uuid in loaded}
+
+        members = {}
+        for aggregates in watched_aggregates:
+            members[frozenset(aggregates)] = self._list_members(aggregates)
+
+        # NOTE(ttsiouts): All the active servers are needed, not only the
+        # preemptible ones, in order to know which of them are already
+        # included in the usages of the providers.
+        servers = []
+        by_host = instance.InstanceList().instances_by_host(
+            all_tenants=True, vm_state='ACTIVE')
+        for host_servers in by_host.values():
+            servers += host_servers
+        return providers, members, servers
+
+    @staticmethod
+    def _list_members(aggregates):
+        rp_list = resource_provider.ResourceProviderList(aggregates)
+        return set(rp.uuid for rp in rp_list.resource_providers)
+
+    def _add_server(self, server):
+        self._servers[server.uuid] = server
+        self._by_host[server.host][server.uuid] = server
+
+    def _remove_server(self, uuid):
+        server = self._servers.pop(uuid)
+        self._by_host[server.host].pop(uuid, None)
+        return server
+
+    def _record(self, delta, args):
+        if self._recorded is not None:
+            self._recorded.append((delta, args))
+
+    def _update_usage(self, host, added=None, removed=None):
+        uuid = self._hosts.get(host)
+        if uuid is None:
+            return
+        name, caps = self._providers[uuid]
+        # NOTE(ttsiouts): Never modify the usages in place, the snapshots
+        # already handed out may share them.
+        used = caps.used
+        if added is not None:
+            used = used + added
+        if removed is not None:
+            used = used - removed
+        new = capabilities.Capabilities(used, caps.total)
+        self._providers[uuid] = (name, new)
+
+    def server_created(self, uuid, host, project_id, flavor):
+        """Applies the creation of a server
+
+        :param flavor: the flavor as found in the versioned notifications
+        """
+        with self._lock:
+            self._record(self.server_created,
+                         (uuid, host, project_id, flavor))
+            if not self.ready or uuid in self._servers:
+                self.ignored += 1
+                return
+            server = instance.Instance(
+                uuid, None, flavor_obj.flavor_from_payload(flavor),
+                host=host, project_id=project_id)
+            self._add_server(server)
+            self._update_usage(host, added=server.resources)
+            self.applied += 1
+
+    def server_deleted(self, uuid):
+        """Applies the deletion of a server"""
+        with self._lock:
+            self._record(self.server_deleted, (uuid,))
+            if uuid not in self._servers:
+                self.ignored += 1
+                return
+            server = self._remove_server(uuid)
+            self._update_usage(server.host, removed=server.resources)
+            self.applied += 1
+
+    def server_moved(self, uuid, host, flavor):
+        """Applies a resize or a migration of a server
+
+        :param host: the host of the server after the move
+        :param flavor: the flavor of the server after the move, as found in
+                       the versioned notifications
+        """
+        with self._lock:
+            self._record(self.server_moved, (uuid, host, flavor))
+            if uuid not in self._servers:
+                self.ignored += 1
+                return
+            old = self._remove_server(uuid)
+            self._update_usage(old.host, removed=old.resources)
+            server = instance.Instance(
+                uuid, old.name, flavor_obj.flavor_from_payload(flavor),
+                host=host, project_id=old.project_id)
+            self._add_server(server)
+            self._update_usage(host, added=server.resources)
+            self.applied += 1
+
+    def snapshot(self, aggregates=None, preemptible_projects=None):
+        """Returns copies of the resource providers and their servers
+
+        The returned providers can be freely modified by the drivers, e.g.
+        when reserving resources, without affecting the model.
+
+        :param aggregates: the aggregates to return the providers of, if
+                           empty all the providers are returned
+        :param preemptible_projects: the ids of the preemptible projects
+        """
+        members = None
+        if aggregates:
+            key = frozenset(aggregates)
+            with self._lock:
+                members = self._members.get(key)
+            if members is None:
+                members = self._list_members(aggregates)
+                with self._lock:
+                    self._members[key] = members
+
+        preemptible_projects = set(preemptible_projects or [])
+        with self._lock:
+            uuids = members if members is not None else self._providers
+            rps = []
+            for uuid in uuids:
+                if uuid not in self._providers:
+                    continue
+                name, caps = self._providers[uuid]
+                rp = resource_provider.ResourceProvider(uuid, name)
+                rp.capabilities = capabilities.Capabilities(
+                    caps.used.copy(), caps.total)
+                rp.preemptible_servers = [
+                    server for server in self._by_host.get(name, {}).values()
+                    if server.project_id in preemptible_projects]
+                rps.append(rp)
+        return rps
+
+
+state = ClusterState()
@@ -0,0 +1,132 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+from oslo_log import log as logging
+
+import aardvark.conf
+from aardvark.objects import base
+from aardvark.objects import resources
+
+
+CONF = aardvark.conf.CONF
+LOG = logging.getLogger(__name__)
+
+# The fields of the embedded flavor that define the resources of a server.
+SPEC_FIELDS = ('vcpus', 'ram', 'disk', 'ephemeral', 'swap')
+
+
+def flavor_from_payload(flavor):
+    """Converts the flavor of a notification to the embedded flavor format
+
+    The versioned notifications use different names for the fields of the
+    flavor than the servers API, e.g. 'memory_mb' instead of 'ram'.
+    """
+    return {
+        'original_name': flavor.get('name'),
+        'vcpus': flavor.get('vcpus') or 0,
+        'ram': flavor.get('memory_mb') or 0,
+        'disk': flavor.get('root_gb') or 0,
+        'ephemeral': flavor.get('ephemeral_gb') or 0,
+        'swap': flavor.get('swap') or 0,
+    }
+
+
+class FlavorList(base.BaseObjectWrapper):
+
+    def __init__(self):
+        super(FlavorList, self).__init__()
+
+    def flavor(self, flavor_id):
+        return self._resource.flavor(flavor_id)
+
+
+class FlavorCache(object):
+    """Process wide cache of the resources requested by each flavor
+
+    A cloud has only a few distinct flavors, so the Resources objects are
+    built once per flavor and shared by all the servers using it. The shared
+    objects are frozen, so the in-place operators never modify them.
+
+    Flavors are either embedded in the server (microversion >= 2.47), in which
+    case they are keyed by their specs, or references by id that are resolved
+    through the Nova API and kept for CONF.compute.flavor_cache_ttl seconds.
+    A flavor that was deleted from Nova requests no resources.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_spec = {}
+        self._by_id = {}
+        # NOTE(ttsiouts): Nova is queried under a lock per flavor id, so
+        # that a slow request only blocks the lookups of the same flavor.
+        self._id_locks = {}
+        self._flavor_list = None
+
+    def resources(self, flavor):
+        if 'vcpus' not in flavor and 'id' in flavor:
+            return self._resources_from_id(flavor['id'])
+        return self._resources_from_spec(flavor)
+
+    def _resources_from_spec(self, flavor):
+        key = tuple(flavor.get(field) or 0 for field in SPEC_FIELDS)
+        try:
+            return self._by_spec[key]
+        except KeyError:
+            pass
+        obj = resources.Resources.obj_from_flavor(flavor).freeze()
+        with self._lock:
+            return self._by_spec.setdefault(key, obj)
+
+    def _resources_from_id(self, flavor_id):
+        now = time.time()
+        try:
+            expires, obj = self._by_id[flavor_id]
+            if expires > now:
+                return obj
+        except KeyError:
+            pass
+
+        with self._lock:
+            id_lock = self._id_locks.setdefault(flavor_id, threading.Lock())
+            if self._flavor_list is None:
+                self._flavor_list = FlavorList()
+            flavor_list = self._flavor_list
+
+        with id_lock:
+            # Another thread may have resolved the flavor in the meantime.
+            expires, obj = self._by_id.get(flavor_id, (0, None))
+            if expires > now:
+                return obj
+            flavor = flavor_list.flavor(flavor_id)
+            if flavor is None:
+                LOG.warning("Flavor %s not found, its servers are "
+                            "considered to request no resources", flavor_id)
+                flavor = dict.fromkeys(SPEC_FIELDS, 0)
+            obj = self._resources_from_spec(flavor)
+            with self._lock:
+                self._by_id[flavor_id] = (
+                    now + CONF.compute.flavor_cache_ttl, obj)
+            return obj
+
+    def clear(self):
+        with self._lock:
+            self._by_spec.clear()
+            self._by_id.clear()
+
+
+flavor_cache = FlavorCache()
@@ -14,22 +14,25 @@
 #    under the License.
 
 from aardvark.objects import base
-from aardvark.objects import resources
+from aardvark.objects import flavor as flavor_obj
 
 
 class Instance(base.BaseObjectWrapper):
 
-    _attrs = ['name', 'uuid', 'flavor']
+    _attrs = ['name', 'uuid', 'flavor', 'host', 'project_id']
 
-    def __init__(self, uuid, name, flavor):
-        super(Instance, self).__init__(uuid, name, flavor)
+    def __init__(self, uuid, name, flavor, host=None, project_id=None):
+        super(Instance, self).__init__(uuid, name, flavor, host=host,
+                                       project_id=project_id)
         self.uuid = uuid
         self.name = name
         self.flavor = flavor
+        self.host = host
+        self.project_id = project_id
 
     @property
     def resources(self):
-        return resources.Resources.obj_from_flavor(self.flavor)
+        return flavor_obj.flavor_cache.resources(self.flavor)
 
 
 class InstanceList(base.BaseObjectWrapper):
@@ -43,5 +46,8 @@ class InstanceList(base.BaseObjectWrapper):
         instances = self._resource.instances(**filters)
         return instances
 
+    def instances_by_host(self, **filters):
+        return self._resource.instances_by_host(**filters)
+
     def delete_instance(self, instance):
         self._resource.delete_instance(instance)
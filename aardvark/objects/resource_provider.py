@@ -79,3 +79,6 @@ class ResourceProviderList(base.PlacementObjectWrapper):
     def __init__(self, aggregates=None):
         super(ResourceProviderList, self).__init__(aggregates=aggregates)
         self.aggregates = aggregates
+
+    def load_capabilities(self, resource_providers):
+        return self._resource.load_capabilities(resource_providers)
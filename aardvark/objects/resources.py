@@ -14,6 +14,36 @@
 #    under the License.
 
 
+import operator
+import threading
+
+import six
+
+
+# NOTE(ttsiouts): Every resource class gets a fixed position the first time it
+# is seen. The values of the Resources are kept in a list following this
+# index, so that the arithmetic is a walk over two short lists.
+_INDEX = {}
+_NAMES = []
+_INDEX_LOCK = threading.Lock()
+
+
+def _position(name):
+    try:
+        return _INDEX[name]
+    except KeyError:
+        with _INDEX_LOCK:
+            if name not in _INDEX:
+                _INDEX[name] = len(_NAMES)
+                _NAMES.append(six.moves.intern(str(name)))
+            return _INDEX[name]
+
+
+def resource_classes():
+    """Returns the known resource classes in the order of their position"""
+    return list(_NAMES)
+
+
 class Resources(object):
     """Internal representation of resources
 
@@ -26,16 +56,77 @@ class Resources(object):
     # e.g. a = {vcpu: 3, memory: 1024}, b = {vcpu: 2, memory: 512}
     # a < b = False and a > b = False and a == b = False
 
+    __slots__ = ('_values', '_frozen')
+
     def __init__(self, resources=None):
         """Initialized with a dictionary of resource classes and values"""
-        self.resources = set()
-        if resources is None:
-            return
-        for resource, value in resources.items():
-            if value == 0:
-                continue
-            setattr(self, resource, value)
-            self.resources = self.resources | set([resource])
+        values = [0] * len(_NAMES)
+        if resources is not None:
+            for resource, value in resources.items():
+                if value == 0:
+                    continue
+                position = _position(resource)
+                if position >= len(values):
+                    values.extend([0] * (position + 1 - len(values)))
+                values[position] = value
+        self._values = values
+        self._frozen = False
+
+    @classmethod
+    def _from_values(cls, values):
+        obj = cls.__new__(cls)
+        obj._values = values
+        obj._frozen = False
+        return obj
+
+    def _aligned(self, other):
+        # NOTE(ttsiouts): resource classes seen after the creation of an
+        # object have a zero value in it. The shorter list is padded in a
+        # copy, since the other operand may be a frozen object shared by
+        # other threads, e.g. the ones of the FlavorCache.
+        values = self._values
+        others = other._values
+        missing = len(values) - len(others)
+        if missing > 0:
+            others = others + [0] * missing
+        elif missing < 0:
+            values = values + [0] * -missing
+        return values, others
+
+    def __getattr__(self, name):
+        # Only called for the resource classes, e.g. resources.VCPU
+        position = _INDEX.get(name)
+        if position is not None:
+            try:
+                value = self._values[position]
+            except (AttributeError, IndexError):
+                value = 0
+            if value != 0:
+                return value
+        raise AttributeError(name)
+
+    def __reduce__(self):
+        # The positions are process specific, so pickle the dict instead.
+        return (Resources, (self.to_dict(),))
+
+    @property
+    def resources(self):
+        return set(_NAMES[i] for i, value in enumerate(self._values)
+                   if value != 0)
+
+    def freeze(self):
+        """Makes the in-place operators return new objects"""
+        self._frozen = True
+        return self
+
+    def copy(self):
+        return Resources._from_values(list(self._values))
+
+    def to_list(self):
+        """Returns the values following the order of resource_classes()"""
+        values = list(self._values)
+        values.extend([0] * (len(_NAMES) - len(values)))
+        return values
 
     @staticmethod
     def obj_from_inventories(inventories):
@@ -83,38 +174,52 @@ class Resources(object):
 
     @staticmethod
     def max_ratio(one, two):
-        res = one / two
-        return max([ratio for ratio in res.values()])
+        return max(one._ratios(two))
 
     @staticmethod
     def min_ratio(one, two):
-        res = one / two
-        return min([ratio for ratio in res.values()])
+        return min(one._ratios(two))
 
     def __add__(self, other):
-        resources = self.resources | other.resources
-        new = dict()
-        for res in resources:
-            new[res] = getattr(self, res, 0) + getattr(other, res, 0)
-        return Resources(new)
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+        return Resources._from_values(list(map(operator.add, values, others)))
+
+    def __iadd__(self, other):
+        if self._frozen:
+            return self + other
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+            self._values = values
+        values[:] = map(operator.add, values, others)
+        return self
 
     def __sub__(self, other):
-        resources = self.resources | other.resources
-        new = dict()
-        for res in resources:
-            value = getattr(self, res, 0) - getattr(other, res, 0)
-            new[res] = int(value)
-        return Resources(new)
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+        return Resources._from_values(
+            [int(x - y) for x, y in zip(values, others)])
+
+    def __isub__(self, other):
+        if self._frozen:
+            return self - other
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+            self._values = values
+        values[:] = [int(x - y) for x, y in zip(values, others)]
+        return self
 
     def __mul__(self, other):
         # NOTE(ttsiouts): Should be used only with numbers... Resource * 3
-        new = dict()
-        for res in self.resources:
-            try:
-                new[res] = int(getattr(self, res, 0) * other)
-            except TypeError:
-                return None
-        return Resources(new)
+        try:
+            return Resources._from_values(
+                [int(x * other) if x else 0 for x in self._values])
+        except TypeError:
+            return None
 
     def __div__(self, other):
         if isinstance(other, Resources):
@@ -129,62 +234,90 @@ class Resources(object):
         # after dividing all the resource classes:
         # e.g. a = {vcpu: 100, memory: 1024}, b = {vcpu: 1, memory: 512}
         #      a / b = 2 (because a.memory / b.memory = 2)
-        resources = self.resources | other.resources
-        return {rc: getattr(self, rc, 0) / getattr(other, rc, 1)
-                for rc in resources}
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+        return {rc: x / (y or 1) for rc, x, y in zip(_NAMES, values, others)
+                if x or y}
+
+    def _ratios(self, other):
+        # Same as the values of self / other, without building the dict.
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+        return [x / (y or 1) for x, y in zip(values, others) if x or y]
 
     def _div_with_int(self, other):
-        resources = {}
-        for res in self.resources:
-            resources.update({res: getattr(self, res) / other})
-        return Resources(resources)
+        return Resources._from_values(
+            [x / other if x else 0 for x in self._values])
 
     def __eq__(self, other):
-        resources = self.resources | other.resources
-        for res in resources:
-            if getattr(self, res, 0) != getattr(other, res, 0):
-                return False
-        return True
+        if not isinstance(other, Resources):
+            return NotImplemented
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+        return values == others
 
     def __ne__(self, other):
         return not self == other
 
+    # NOTE(ttsiouts): the ordering comparisons only consider the resource
+    # classes of the left operand. They walk the values with a position
+    # instead of zip(), which costs more than the comparisons themselves for
+    # the few resource classes of a server.
     def __gt__(self, other):
-        resp = True
-        for res in self.resources:
-            resp = resp and getattr(self, res) > getattr(other, res, 0)
-        return resp
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+        position = 0
+        for x in values:
+            if x and not x > others[position]:
+                return False
+            position += 1
+        return True
 
     def __lt__(self, other):
-        resp = True
-        for res in self.resources:
-            resp = resp and getattr(self, res) < getattr(other, res, 0)
-        return resp
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+        position = 0
+        for x in values:
+            if x and not x < others[position]:
+                return False
+            position += 1
+        return True
 
     def __ge__(self, other):
-        resp = True
-        if not self.resources:
-            return False
-
-        for res in self.resources:
-            resp = resp and getattr(self, res) >= getattr(other, res, 0)
-        return resp
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+        position = 0
+        for x in values:
+            if x and x < others[position]:
+                return False
+            position += 1
+        return any(values)
 
     def __le__(self, other):
-        resp = True
-        for res in self.resources:
-            resp = resp and getattr(self, res) <= getattr(other, res, 0)
-        return resp
+        values, others = self._values, other._values
+        if len(values) != len(others):
+            values, others = self._aligned(other)
+        position = 0
+        for x in values:
+            if x and x > others[position]:
+                return False
+            position += 1
+        return True
 
     __truediv__ = __div__
+    __hash__ = None
 
     def __repr__(self):
-        text = ', '.join(['%s: %s' % (res, getattr(self, res))
-                         for res in self.resources])
+        text = ', '.join(['%s: %s' % (res, value)
+                         for res, value in sorted(self.to_dict().items())])
         return '<Resources(%s)>' % text
 
     def to_dict(self):
-        tdict = dict()
-        for resource in self.resources:
-            tdict.update({resource: getattr(self, resource)})
-        return tdict
+        return {_NAMES[i]: value for i, value in enumerate(self._values)
+                if value != 0}
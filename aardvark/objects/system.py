@@ -13,13 +13,31 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
+import aardvark.conf
 from aardvark.objects import capabilities
+from aardvark.objects import cluster_state
 from aardvark.objects import instance
 from aardvark.objects import project
 from aardvark.objects import resource_provider
 from aardvark.objects import resources
 
 
+CONF = aardvark.conf.CONF
+
+
+def get_system(aggregates=None):
+    """Returns the System to be used for the given aggregates
+
+    If the cluster state model is enabled and loaded, the system is read from
+    it instead of the APIs.
+    """
+    if CONF.aardvark.enable_state_model and cluster_state.state.ready:
+        return SnapshotSystem(aggregates)
+    return System(aggregates)
+
+
 class System(object):
 
     def __init__(self, aggregates=None):
@@ -38,10 +56,26 @@ class System(object):
     def preemptible_projects(self):
         return self._project_list.preemptible_projects
 
+    def load_capabilities(self):
+        """Loads the capabilities of all the resource providers at once
+
+        Returns the resource providers whose capabilities were loaded.
+        """
+        rps = self.resource_providers
+        loaded = self._rp_list.load_capabilities(rps)
+        for rp in rps:
+            if rp.uuid in loaded:
+                rp.capabilities = loaded[rp.uuid]
+        # NOTE(ttsiouts): The providers that could not be loaded are left out
+        # of the system. Otherwise the drivers would load their capabilities
+        # one by one from the Placement API that just failed.
+        rps[:] = [rp for rp in rps if rp.uuid in loaded]
+        return rps
+
     def system_state(self):
         total_resources = resources.Resources()
         used_resources = resources.Resources()
-        for rp in self.resource_providers:
+        for rp in self.load_capabilities():
             total_resources += rp.total_resources
             used_resources += rp.used_resources
             rp.reinit_object()
@@ -49,18 +83,63 @@ class System(object):
         return capabilities.Capabilities(used_resources, total_resources)
 
     def populate_system_rps(self):
+        self.load_capabilities()
+        self.populate_preemptible_servers()
+
+    def populate_preemptible_servers(self):
         instance_list = instance.InstanceList()
+        # NOTE(ttsiouts): List the active servers of each preemptible project
+        # once for the whole system and distribute them to the providers,
+        # instead of querying Nova for every provider and project.
+        servers_by_host = collections.defaultdict(list)
+        for pr_project in self.preemptible_projects:
+            filters = {
+                'project_id': pr_project.id_,
+                'vm_state': 'ACTIVE'
+            }
+            listed = instance_list.instances_by_host(**filters)
+            for host, servers in listed.items():
+                servers_by_host[host] += servers
+
         for rp in self.resource_providers:
-            servers = list()
-            for pr_project in self.preemptible_projects:
-                filters = {
-                    'host': rp.name,
-                    'project_id': pr_project.id_,
-                    'vm_state': 'ACTIVE'
-                }
-                servers += instance_list.instances(**filters)
-            rp.preemptible_servers = servers
+            rp.preemptible_servers = servers_by_host.get(rp.name, [])
 
     def empty_cache(self):
         self._rp_list.reinit_object()
         self._project_list.reinit_object()
+
+
+class SnapshotSystem(System):
+    """A System read from the in-memory cluster state model
+
+    The resource providers, their capabilities and their preemptible servers
+    are copied from cluster_state.state, so no request is sent to Placement
+    or Nova.
+    """
+
+    def __init__(self, aggregates=None):
+        super(SnapshotSystem, self).__init__(aggregates)
+        self.aggregates = aggregates
+        self._snapshot = None
+
+    @property
+    def resource_providers(self):
+        if self._snapshot is None:
+            preemptible = [
+                project.id_ for project in self.preemptible_projects]
+            self._snapshot = cluster_state.state.snapshot(
+                self.aggregates, preemptible)
+        return self._snapshot
+
+    def load_capabilities(self):
+        return self.resource_providers
+
+    def populate_system_rps(self):
+        # Start from a fresh copy of the model, the previous one may have
+        # been modified.
+        self._snapshot = None
+        return self.resource_providers
+
+    def empty_cache(self):
+        super(SnapshotSystem, self).empty_cache()
+        self._snapshot = None
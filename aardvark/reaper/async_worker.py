@@ -0,0 +1,475 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Reaper workers running as tasks of a shared asyncio event loop
+
+This module requires Python 3 and aiohttp, see aardvark.api.rest.aio.
+"""
+
+import asyncio
+from concurrent import futures
+import functools
+import threading
+import time
+
+from oslo_log import log as logging
+from taskflow.utils import threading_utils
+
+from aardvark.api.rest import aio
+import aardvark.conf
+from aardvark import exception
+from aardvark.objects import capabilities
+from aardvark.objects import resources
+from aardvark.objects import system as system_obj
+from aardvark.reaper import job_board
+from aardvark.reaper import reaper
+from aardvark.reaper import reaper_request as rr_obj
+from aardvark.reaper import release_tracker
+
+
+CONF = aardvark.conf.CONF
+LOG = logging.getLogger(__name__)
+
+# How often (in seconds) a waiting worker checks if the delete notification
+# of one of its servers was received.
+RELEASE_CHECK_INTERVAL = 0.05
+
+
+class EventLoop(object):
+    """The event loop shared by all the asyncio reaper workers
+
+    The loop runs in a daemon thread of its own and is started on first use,
+    along with the aiohttp session used by all the workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.loop = None
+        self.http = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.loop = asyncio.new_event_loop()
+            self._thread = threading_utils.daemon_thread(self._run)
+            self._thread.start()
+            self.http = self.submit(self._create_http()).result()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _create_http(self):
+        return aio.create_http_session()
+
+    def submit(self, coro):
+        """Schedules the coroutine in the loop and returns its future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        with self._lock:
+            if self._thread is None:
+                return
+            if self.http is not None:
+                self.submit(self.http.close()).result()
+                self.http = None
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self._thread = None
+
+
+event_loop = EventLoop()
+
+
+class TaskWorker(object):
+    """Handle of the task of an asyncio reaper worker
+
+    Provides the interface of the worker threads used by the service.
+    """
+
+    def __init__(self, reaper):
+        self.reaper = reaper
+        self.future = None
+
+    def start(self):
+        event_loop.start()
+        self.future = event_loop.submit(self.reaper.run())
+
+    def is_alive(self):
+        return self.future is not None and not self.future.done()
+
+    def join(self, timeout=None):
+        if self.future is not None:
+            futures.wait([self.future], timeout=timeout)
+
+
+class AsyncReaper(reaper.Reaper):
+    """Reaper worker running as a task of the shared event loop
+
+    The snapshot of the system is fetched, the servers are deleted, their
+    allocations are polled and the pending servers are rebuilt through
+    concurrent asynchronous requests. The calls to the job board and to the
+    synchronous parts of aardvark run in a thread dedicated to the worker.
+    """
+
+    def __init__(self, aggregates=None, watermark_mode=False):
+        super(AsyncReaper, self).__init__(aggregates, watermark_mode)
+        self._executor = futures.ThreadPoolExecutor(max_workers=1)
+        self._rebuilds = set()
+        self.placement_aio = None
+        self.nova_aio = None
+        self.keystone_aio = None
+
+    def _run_blocking(self, fn, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def run(self):
+        self.flag = True
+        self.placement_aio = aio.AsyncPlacementClient(event_loop.http)
+        self.nova_aio = aio.AsyncNovaClient(event_loop.http)
+        self.keystone_aio = aio.AsyncKeystoneClient(event_loop.http)
+
+        shards = [job_board.shard_id(self.aggregates)]
+        if shards[0] is not None:
+            shards.append(None)
+
+        boards = []
+        self.waiter = job_board.JobWaiter()
+        try:
+            for shard in shards:
+                backend_conf = job_board.backend_conf(shard)
+                board = await self._run_blocking(
+                    job_board.connect, backend_conf)
+                boards.append(board)
+                await self._run_blocking(
+                    self.waiter.watch, board, backend_conf)
+            await self.attempt_job_claim_async(boards)
+        finally:
+            if self._rebuilds:
+                await asyncio.gather(*self._rebuilds)
+            await self._run_blocking(self.waiter.close)
+            for board in boards:
+                await self._run_blocking(board.close)
+            self._executor.shutdown(wait=False)
+
+        LOG.info("Reaper worker stopped: %s", self.aggregates)
+
+    async def attempt_job_claim_async(self, boards):
+        while self.flag:
+            # Reset the acks in every loop to show you're alive
+            self.missed_acks = 0
+            self.waiter.reset()
+            handled = False
+            for board in boards:
+                handled = await self._claim_jobs_async(board) or handled
+
+            if not handled and self.flag:
+                await self._run_blocking(self.waiter.wait)
+
+    async def _claim_jobs_async(self, board):
+        handled = False
+        jobs = self._claimed_jobs(board)
+        while True:
+            claimed = await self._run_blocking(next, jobs, None)
+            if claimed is None:
+                return handled
+            job, request = claimed
+            await self.handle_request_async(request)
+            await self._run_blocking(board.consume, job, "worker")
+            LOG.debug("Consumed %s", job)
+            handled = True
+
+    async def handle_request_async(self, request):
+
+        if isinstance(request, rr_obj.ReaperRequest):
+            await self.evaluate_reaper_request_async(request)
+
+        elif isinstance(request, rr_obj.StateCalculationRequest):
+            await self._run_blocking(
+                self.handle_state_calculation_request, request)
+
+    async def evaluate_reaper_request_async(self, request):
+        if request.aggregates == []:
+            request.aggregates = self.aggregates
+
+        pending = list(request.uuids)
+
+        def spot_freed():
+            if pending:
+                self._rebuild_later(pending.pop(0), request.image)
+
+        on_spot_freed = None
+        if CONF.reaper.pipelined_rebuild:
+            on_spot_freed = spot_freed
+
+        try:
+            system = await self._run_blocking(
+                system_obj.get_system, request.aggregates)
+            preemptible_projects = await self._preemptible_projects(system)
+            if request.project_id in preemptible_projects:
+                # Make space only if the requesting project is
+                # non-preemptible.
+                raise exception.PreemptibleRequest()
+
+            await self.free_resources_async(
+                request.resources, system, slots=len(request.uuids),
+                on_spot_freed=on_spot_freed)
+            while pending:
+                self._rebuild_later(pending.pop(0), request.image)
+        except exception.ReaperException as e:
+            LOG.error(e.message)
+            await asyncio.gather(
+                *[self._reset_instance_async(uuid) for uuid in pending])
+
+    async def _preemptible_projects(self, system):
+        # NOTE(ttsiouts): The cached list of the preemptible projects is
+        # served without blocking, ask Keystone only if there is no cache.
+        cached = CONF.identity.project_cache_ttl > 0
+        if not cached and type(system) is system_obj.System:
+            projects = await self.keystone_aio.get_projects(
+                tags=['preemptible'])
+            return [project['id'] for project in projects]
+
+        projects = await self._run_blocking(
+            lambda: system.preemptible_projects)
+        return [project.id_ for project in projects]
+
+    async def free_resources_async(self, request, system, slots=1,
+                                   watermark_mode=False, on_spot_freed=None):
+        for _ in range(3):
+            try:
+                return await self._free_resources_once(
+                    request, system, slots, watermark_mode, on_spot_freed)
+            except exception.RetryException:
+                continue
+        LOG.error('Execution of %s failed: Retries exceeded!',
+                  'free_resources_async')
+
+    async def _free_resources_once(self, request, system, slots,
+                                   watermark_mode, on_spot_freed):
+        await self.populate_system_rps_async(system)
+
+        def plan():
+            return self.plan(request, system.resource_providers, slots,
+                             watermark_mode=watermark_mode)
+
+        selected_hosts, selected_servers, spots = await self._run_blocking(
+            plan)
+
+        spots = [(spot, on_spot_freed) for spot in spots]
+        await self.release_servers_async(selected_servers, spots, system)
+
+    async def populate_system_rps_async(self, system):
+        """Loads the capabilities of the providers with concurrent requests
+
+        The snapshots of the cluster state model and the Placement database
+        are loaded as they are, without querying the APIs.
+        """
+        from_api = CONF.placement.backend == 'api'
+        if type(system) is not system_obj.System or not from_api:
+            await self._run_blocking(system.populate_system_rps)
+            return
+
+        start = time.time()
+        rps = await self._run_blocking(lambda: system.resource_providers)
+        loaded = await asyncio.gather(
+            *[self._load_capabilities(rp) for rp in rps])
+        for rp, caps in zip(rps, loaded):
+            if caps is not None:
+                rp.capabilities = caps
+        LOG.info("Loaded snapshot of %d resource providers in %.2fs",
+                 len([caps for caps in loaded if caps is not None]),
+                 time.time() - start)
+        await self._run_blocking(system.populate_preemptible_servers)
+
+    async def _load_capabilities(self, rp):
+        try:
+            inventories, usages = await asyncio.gather(
+                self.placement_aio.inventories(rp.uuid),
+                self.placement_aio.usages(rp.uuid))
+        except (aio.NotFound, aio.aiohttp.ClientError,
+                asyncio.TimeoutError) as e:
+            LOG.warning("Skipping resource provider %s from snapshot: %s",
+                        rp.uuid, e)
+            return None
+        return capabilities.Capabilities(
+            resources.Resources(usages),
+            resources.Resources.obj_from_inventories(inventories))
+
+    async def release_servers_async(self, servers, spots, system):
+        """Deletes the servers and waits until their allocations are gone
+
+        See reaper.Reaper.release_servers.
+        """
+        uuids = [s.uuid for s in servers]
+        release_tracker.tracker.watch(uuids)
+
+        try:
+            not_found = await self.delete_servers_async(servers)
+        except Exception:
+            release_tracker.tracker.unwatch(uuids)
+            raise
+
+        if not_found:
+            # One of the selected servers was not found so, we will retry
+            release_tracker.tracker.unwatch(uuids)
+            # Emptying the cached in order to retry.
+            system.empty_cache()
+            raise exception.RetryException()
+
+        spots = [(set(s.uuid for s in spot), callback)
+                 for spot, callback in spots if callback is not None]
+        for spot, callback in spots:
+            if not spot:
+                callback()
+
+        def released(uuid):
+            LOG.info('Allocations for %s not found', uuid)
+            for spot, callback in spots:
+                if uuid in spot:
+                    spot.discard(uuid)
+                    if not spot:
+                        callback()
+
+        try:
+            await self.wait_for_released_allocations(uuids, released)
+        finally:
+            # The wait watches the servers on its own.
+            release_tracker.tracker.unwatch(uuids)
+
+    async def delete_servers_async(self, servers):
+        """Deletes the given servers concurrently
+
+        Returns the servers that were not found.
+        """
+        self.delete_timings = {}
+        timings = await asyncio.gather(
+            *[self._delete_server_async(server) for server in servers])
+
+        not_found = []
+        for server, elapsed in zip(servers, timings):
+            if elapsed is None:
+                not_found.append(server)
+            else:
+                self.delete_timings[server.uuid] = elapsed
+
+        if self.delete_timings:
+            timings = sorted(self.delete_timings.values())
+            LOG.info("Deleted %d servers (median: %.2fs, max: %.2fs)",
+                     len(timings), timings[len(timings) // 2], timings[-1])
+        return not_found
+
+    async def _delete_server_async(self, server):
+        LOG.info("Trying to delete server: %s", server.name)
+        start = time.time()
+        self.notify_about_instance(server)
+        try:
+            await self.nova_aio.delete_server(server.uuid)
+        except aio.NotFound:
+            LOG.info("Server %s not found. Retrying.", server.name)
+            return None
+        elapsed = time.time() - start
+        LOG.debug("Deletion of server %s took %.2fs", server.name, elapsed)
+        return elapsed
+
+    async def wait_for_released_allocations(self, uuids, callback,
+                                            timeout=None):
+        """Calls back with each instance as soon as its allocations are gone
+
+        See reaper.Reaper.released_allocations. The allocations of all the
+        pending instances are checked concurrently in each round.
+        """
+        loop = asyncio.get_event_loop()
+        if timeout is None:
+            timeout = CONF.reaper.allocation_wait_timeout
+        deadline = loop.time() + timeout
+        interval = CONF.reaper.allocation_poll_interval
+        pending = set(uuids)
+
+        release_tracker.tracker.watch(pending)
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    LOG.warning('Timed out waiting for the allocations of '
+                                '%s to be removed', ', '.join(pending))
+                    break
+                await self._wait_released(pending, min(interval, remaining))
+                interval = min(interval * 2,
+                               CONF.reaper.allocation_poll_max_interval)
+
+                released = release_tracker.tracker.released(pending)
+                unknown = list(pending - released)
+                responses = await asyncio.gather(
+                    *[self.placement_aio.get_allocations(uuid)
+                      for uuid in unknown])
+                for uuid, resp in zip(unknown, responses):
+                    if not resp or resp['allocations'] == {}:
+                        released.add(uuid)
+
+                for uuid in released:
+                    pending.discard(uuid)
+                    callback(uuid)
+        finally:
+            release_tracker.tracker.unwatch(uuids)
+
+    async def _wait_released(self, pending, timeout):
+        """Sleeps until one of the instances is released or timeout"""
+        loop = asyncio.get_event_loop()
+        end = loop.time() + timeout
+        while not release_tracker.tracker.has_released(pending):
+            remaining = end - loop.time()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(RELEASE_CHECK_INTERVAL, remaining))
+
+    def _rebuild_later(self, uuid, image):
+        task = asyncio.ensure_future(self._rebuild_instance_async(uuid, image))
+        self._rebuilds.add(task)
+        task.add_done_callback(self._rebuilds.discard)
+
+    async def _rebuild_instance_async(self, uuid, image):
+        try:
+            LOG.info("Trying to rebuild server with uuid: %s", uuid)
+            await self.nova_aio.rebuild_server(uuid, image)
+        except aio.NotFound:
+            # Looks like we were late, and the server is deleted.
+            # Nothing more we can do.
+            LOG.info("Server with uuid: %s, not found.", uuid)
+            return
+        except Exception:
+            # Same as the threaded workers, do not leave the server pending.
+            LOG.exception("Failed to rebuild server %s", uuid)
+            await self._reset_instance_async(uuid)
+            return
+        LOG.info("Request to rebuild the server %s was sent.", uuid)
+
+    async def _reset_instance_async(self, uuid):
+        try:
+            LOG.info('Trying to reset server %s to error', uuid)
+            await self.nova_aio.reset_state(uuid)
+        except aio.NotFound:
+            # Looks like we were late, and the server is deleted.
+            # Nothing more we can do.
+            LOG.info("Server with uuid: %s, not found.", uuid)
+            return
+        except Exception:
+            LOG.exception("Failed to reset server %s", uuid)
+            return
+        LOG.info("Request to reset the server %s was sent.", uuid)
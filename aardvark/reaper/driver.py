@@ -14,6 +14,7 @@
 #    under the License.
 
 import abc
+import collections
 import six
 
 from aardvark import exception
@@ -30,6 +31,26 @@ def host_potential(host, resources, include_free):
     return resources
 
 
+def group_by_flavor(servers):
+    """Groups the servers that request the same resources
+
+    Servers with the same flavor are interchangeable when looking for space,
+    so the drivers can work with the number of servers per flavor instead of
+    every single server.
+
+    Returns a list of (resources, servers) tuples, in the order that each
+    flavor is first seen.
+    """
+    groups = collections.OrderedDict()
+    for server in servers:
+        key = tuple(sorted(server.resources.to_dict().items()))
+        try:
+            groups[key][1].append(server)
+        except KeyError:
+            groups[key] = (server.resources, [server])
+    return list(groups.values())
+
+
 @six.add_metaclass(abc.ABCMeta)
 class ReaperDriver(object):
     """The base Reaper Driver class
@@ -40,6 +61,11 @@ class ReaperDriver(object):
 
     def __init__(self, watermark_mode=False):
         self.watermark_mode = watermark_mode
+        # NOTE(ttsiouts): Every driver appends here the list of servers that
+        # have to be culled in order to free up each of the reserved spots.
+        # This enables the reaper to use a spot as soon as the servers
+        # occupying it are gone.
+        self.spots = list()
 
     @abc.abstractmethod
     def get_preemptible_servers(self, requested, hosts, num_instances):
@@ -18,6 +18,7 @@ from aardvark.objects import resources as resources_obj
 from aardvark.reaper import driver
 
 from oslo_log import log as logging
+from oslo_utils import importutils
 
 import random
 
@@ -25,11 +26,62 @@ import random
 LOG = logging.getLogger(__name__)
 CONF = aardvark.conf.CONF
 
+np = importutils.try_import('numpy')
+
+
+class HostMatrix(object):
+    """The potential resources of the hosts as a NumPy matrix
+
+    Each row holds the resources that a host can provide, one column per
+    resource class, so that the valid hosts for a request are found with a
+    single vector comparison.
+    """
+
+    def __init__(self, hosts, include_free):
+        self.hosts = list(hosts)
+        self.include_free = include_free
+        self._rows = {host.uuid: i for i, host in enumerate(self.hosts)}
+        potentials = [self._potential(host) for host in self.hosts]
+        width = len(resources_obj.resource_classes())
+        self.matrix = np.zeros((len(self.hosts), width))
+        for i, potential in enumerate(potentials):
+            self.matrix[i, :len(potential)] = potential
+
+    def _potential(self, host):
+        return driver.host_potential(
+            host, host.preemptible_resources, self.include_free).to_list()
+
+    def _vector(self, values):
+        missing = len(values) - self.matrix.shape[1]
+        if missing > 0:
+            # A resource class was seen after the matrix was built
+            self.matrix = np.pad(self.matrix, ((0, 0), (0, missing)),
+                                 'constant')
+        vector = np.zeros(self.matrix.shape[1])
+        vector[:len(values)] = values
+        return vector
+
+    def update(self, host):
+        """Recalculates the row of a host after a reservation"""
+        self.matrix[self._rows[host.uuid]] = self._vector(
+            self._potential(host))
+
+    def valid_hosts(self, requested):
+        requested = self._vector(requested.to_list())
+        # NOTE(ttsiouts): same as Resources.__ge__, only the resource classes
+        # that a host can provide are compared and hosts that can provide
+        # nothing are not valid.
+        provided = self.matrix != 0
+        enough = np.all(~provided | (self.matrix >= requested), axis=1)
+        valid = enough & np.any(provided, axis=1)
+        return [self.hosts[i] for i in np.flatnonzero(valid)]
+
 
 class ChanceDriver(driver.ReaperDriver):
 
     def __init__(self, watermark_mode=False):
         super(ChanceDriver, self).__init__(watermark_mode)
+        self.host_matrix = None
 
     def get_preemptible_servers(self, requested, hosts, num_instances):
         """Implements the strategy of freeing up the requested resources.
@@ -44,12 +96,22 @@ class ChanceDriver(driver.ReaperDriver):
         # This is the maximum number of spots that we'll try to free up
         max_allocs = num_instances * CONF.reaper.alternatives
 
+        self.host_matrix = None
+        if CONF.reaper.vectorized_host_selection:
+            if np is not None:
+                self.host_matrix = HostMatrix(hosts, not self.watermark_mode)
+            else:
+                LOG.warning('NumPy is not installed, the hosts will be '
+                            'evaluated one by one.')
+
         for i in range(0, max_allocs):
             host = self.choose_host(hosts, requested)
             if not host:
                 break
 
             servers = self.select_servers(host, requested)
+            if self.host_matrix is not None:
+                self.host_matrix.update(host)
 
             # If the host is not added and it has given servers for culling,
             # add it to the list. If a host's available are enough, then the
@@ -81,6 +143,12 @@ class ChanceDriver(driver.ReaperDriver):
         :param requested: an instance of the utils.miscellaneous.Resources
                           class representing the requested resources
         """
+        if self.host_matrix is not None:
+            valid_hosts = self.host_matrix.valid_hosts(requested)
+            if not valid_hosts:
+                return None
+            return random.choice(valid_hosts)
+
         valid_hosts = list()
         for host in hosts:
             resources = driver.host_potential(
@@ -116,23 +184,32 @@ class ChanceDriver(driver.ReaperDriver):
             host, resources, not self.watermark_mode)
         if host_resources >= requested:
             host.reserve_resources(resources, requested)
+            self.spots.append(selected)
             return selected
 
-        # Shuffle the servers
-        random.shuffle(preemptible)
+        # NOTE(ttsiouts): Servers with the same flavor are interchangeable,
+        # so instead of shuffling all of them, a flavor is drawn with a
+        # probability proportional to the number of its servers left. The
+        # actual servers are picked only after the selection is final.
+        groups = driver.group_by_flavor(preemptible)
+        left = [len(servers) for _, servers in groups]
+        counts = [0] * len(groups)
         for marker in range(0, max_attempts):
-            try:
-                # The servers have been randomly shuffled previously so we
-                # request for the preemptible server in the first position.
-                server = preemptible.pop(0)
-            except IndexError:
+            total = sum(left)
+            if not total:
                 # If we run out of servers we are stopping without killing any
                 # VM. So returning an empty list
-                selected = list()
                 break
 
-            selected.append(server)
-            resources += server.resources
+            draw = random.randrange(total)
+            for group, count in enumerate(left):
+                if draw < count:
+                    break
+                draw -= count
+
+            left[group] -= 1
+            counts[group] += 1
+            resources += groups[group][0]
 
             host_resources = driver.host_potential(
                 host, resources, not self.watermark_mode)
@@ -141,11 +218,9 @@ class ChanceDriver(driver.ReaperDriver):
                 # This is the point we want to reach. It means that requested
                 # resources will be available after the culling selected
                 # servers.
+                for (_, servers), count in zip(groups, counts):
+                    selected += random.sample(servers, count)
                 break
-        else:
-            # If we reach here, then the max_attempts have been reached.
-            # Return an empty list.
-            selected = list()
 
         # Reserving the selected resources in order to be able to perform
         # further computations if needed. Also we need the number of free
@@ -153,6 +228,7 @@ class ChanceDriver(driver.ReaperDriver):
 
         if len(selected) > 0:
             host.reserve_resources(resources, requested)
+            self.spots.append(selected)
             host.preemptible_servers = [
                 pr_server for pr_server in host.preemptible_servers
                 if pr_server not in selected]
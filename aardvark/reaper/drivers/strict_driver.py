@@ -13,21 +13,29 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import itertools
 from oslo_log import log as logging
+import time
 
 import aardvark.conf
+from aardvark.objects import resources as resources_obj
 from aardvark.reaper import driver
 
 
 LOG = logging.getLogger(__name__)
 CONF = aardvark.conf.CONF
 
+# The resource classes used to order the matching combinations
+ORDERING = ('VCPU', 'MEMORY_MB', 'DISK_GB')
+
+
+class BudgetExceeded(Exception):
+    pass
+
 
 class StrictDriver(driver.ReaperDriver):
 
-    def __init__(self):
-        super(StrictDriver, self).__init__()
+    def __init__(self, watermark_mode=False):
+        super(StrictDriver, self).__init__(watermark_mode)
 
     def get_preemptible_servers(self, requested, hosts, num_instances):
         selected = list()
@@ -38,7 +46,7 @@ class StrictDriver(driver.ReaperDriver):
 
         for i in range(0, max_allocs):
 
-            # Find all the matching flavor combinations and order them
+            # Find the best matching combination of servers
             combo = self.find_matching_server_combinations(hosts, requested)
 
             if not combo:
@@ -46,27 +54,27 @@ class StrictDriver(driver.ReaperDriver):
                 # check if we have enough spots reserved.
                 break
 
-            host = hosts[combo.provider]
+            host, servers = combo
+            resources = resources_obj.Resources()
+            for server in servers:
+                resources += server.resources
 
             # Reserve the resources to enable us to reuse the host
-            host.reserve_resources(combo.consumers, requested)
+            host.reserve_resources(resources, requested)
+            host.preemptible_servers = [
+                server for server in host.preemptible_servers
+                if server not in servers]
+            self.spots.append(servers)
 
             if host not in selected_hosts:
                 selected_hosts.append(host)
 
-            selected += combo.consumers
+            selected += servers
 
-        # If we run out of combos before the max retries, we need to
-        # check if we have enough spots reserved. If not, we won't
-        # kill any servers. The least number of reserved spots is the
-        # number of the requested instances.
-        spots = 0
-        for host in selected_hosts:
-            spots += (host.reserved + host.available) / requested
-
-        if spots < num_instances:
-            selected = list()
-            selected_hosts = list()
+        if not self.watermark_mode:
+            # Watermark mode is best effort, so we free space only if we can
+            # find the requested space.
+            self.check_spots(selected_hosts, requested, num_instances)
 
         return selected_hosts, selected
 
@@ -76,17 +84,10 @@ class StrictDriver(driver.ReaperDriver):
         The purpose of this feature is to eliminate the idle resources. So the
         best matching combination is the one that makes use of the most
         available space on a host.
-        """
-        # NOTE: Get the flavor combinations from the hosts
-        combinations = list()
-        for host in hosts:
-            preemptible = host.preemptible_servers()
-            for num in xrange(0, len(preemptible)):
-                combinations += itertools.combinations(preemptible, num)
-
-        if not combinations:
-            return None
 
+        Returns a tuple with the host and the list of servers to cull or None
+        if no combination can provide the requested resources.
+        """
         # NOTE: Order the valid combinations to find which one of them makes
         # most available space in a host. This means that the best matching
         # combination is the smallest of the valid ones!
@@ -95,10 +96,143 @@ class StrictDriver(driver.ReaperDriver):
         # from the valid_combos = [a, b] the best_matching would be combo 'a'
         # since it will force the host to make use of the available space
         # TODO(ttsiouts): Reuse scheduler weights for memory and disk
-        return min(
-            combinations, key=lambda x: (
-                x.resources.VCPU,
-                x.resources.MEMORY_MB,
-                x.resources.DISK_GB
-            )
-        )
+        deadline = time.time() + CONF.reaper.strict_driver_time_budget
+        best = None
+        for best in self._improving_combinations(hosts, requested, deadline):
+            pass
+
+        if best is None:
+            return None
+        _, host, servers = best
+        return host, servers
+
+    def _improving_combinations(self, hosts, requested, deadline):
+        """Yields combinations, each one better than the previous
+
+        The hosts are evaluated lazily and the best combination found so far
+        is used as a bound for the search in the next hosts.
+        """
+        best_key = None
+        for host in hosts:
+            try:
+                match = self._best_host_combination(
+                    host, requested, best_key, deadline)
+            except BudgetExceeded as e:
+                LOG.info("Time budget exceeded, using the best combination "
+                         "found so far")
+                match = e.args[0] if e.args else None
+                if match is not None:
+                    yield match
+                return
+
+            if match is not None:
+                best_key = match[0]
+                yield match
+                if not any(best_key):
+                    # The host can provide the requested resources without
+                    # culling servers, nothing can be better than this.
+                    return
+
+            if time.time() > deadline:
+                LOG.info("Time budget exceeded, using the best combination "
+                         "found so far")
+                return
+
+    def _best_host_combination(self, host, requested, bound, deadline):
+        """Branch and bound search for the best combination on a host
+
+        The servers of the host are grouped by flavor and the search picks
+        how many servers to cull from each group, instead of trying every
+        single server. A combination is extended only while it does not
+        provide the requested resources, since adding servers can only make
+        it worse. Partial combinations that are already worse than the best
+        one found, or that cannot reach the requested resources even with all
+        the remaining servers, are pruned.
+        """
+        base = resources_obj.Resources()
+        if not self.watermark_mode:
+            base = host.free_resources
+
+        # NOTE: Work on plain lists, aligned to the known resource classes.
+        classes = resources_obj.resource_classes()
+        width = len(classes)
+        positions = [classes.index(rc) if rc in classes else None
+                     for rc in ORDERING]
+
+        def vector(resources):
+            values = resources.to_list()
+            return values + [0] * (width - len(values))
+
+        def key(values):
+            return tuple(values[p] if p is not None else 0
+                         for p in positions)
+
+        wanted = [(i, value) for i, value in enumerate(vector(requested))
+                  if value > 0]
+
+        def covers(values, extra=None):
+            for i, value in wanted:
+                total = values[i] + (extra[i] if extra is not None else 0)
+                if total < value:
+                    return False
+            return True
+
+        groups = sorted(
+            ((vector(resources), servers) for resources, servers in
+             driver.group_by_flavor(host.preemptible_servers)),
+            key=lambda group: group[0], reverse=True)
+
+        # suffix[i] is the sum of all the servers from group i and on
+        suffix = [[0] * width for _ in range(len(groups) + 1)]
+        for i in range(len(groups) - 1, -1, -1):
+            values, servers = groups[i]
+            suffix[i] = [a + b * len(servers)
+                         for a, b in zip(suffix[i + 1], values)]
+
+        state = {'best': None, 'bound': bound}
+
+        def search(start, counts, combo, potential):
+            if time.time() > deadline:
+                raise BudgetExceeded(self._to_match(state['best'], host,
+                                                    groups))
+
+            combo_key = key(combo)
+            if state['bound'] is not None and combo_key >= state['bound']:
+                # Extending can only make the combination worse.
+                return
+            if covers(potential):
+                state['best'] = (combo_key, dict(counts))
+                state['bound'] = combo_key
+                return
+            if not covers(potential, suffix[start]):
+                # Not enough resources even with all the remaining servers.
+                return
+
+            for i in range(start, len(groups)):
+                values, servers = groups[i]
+                group_combo = combo
+                group_potential = potential
+                for count in range(1, len(servers) + 1):
+                    group_combo = [a + b for a, b in zip(group_combo, values)]
+                    group_potential = [
+                        a + b for a, b in zip(group_potential, values)]
+                    counts[i] = count
+                    search(i + 1, counts, group_combo, group_potential)
+                    if covers(group_potential):
+                        # More servers of the same flavor can only be worse.
+                        break
+                counts.pop(i, None)
+
+        search(0, {}, [0] * width, vector(base))
+        return self._to_match(state['best'], host, groups)
+
+    @staticmethod
+    def _to_match(best, host, groups):
+        if best is None:
+            return None
+        combo_key, counts = best
+        # Only now map the number of servers per flavor to actual servers.
+        servers = list()
+        for i, count in sorted(counts.items()):
+            servers += groups[i][1][:count]
+        return combo_key, host, servers
@@ -0,0 +1,243 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import threading
+import time
+
+from oslo_log import log as logging
+import redis
+from taskflow import exceptions as excp
+from taskflow.jobs import backends
+from taskflow.jobs import base
+
+import aardvark.conf
+
+
+LOG = logging.getLogger(__name__)
+CONF = aardvark.conf.CONF
+
+BOARD_NAME = "ReaperBoard"
+JOB_NAME = "ReaperJob"
+
+
+def shard_id(aggregates):
+    """Returns the id of the job board shard of a group of aggregates
+
+    The requests without aggregates go to the shared shard, whose id is None.
+    """
+    if not aggregates:
+        return None
+    digest = hashlib.sha1(','.join(sorted(aggregates)).encode('utf-8'))
+    return 'shard-%s' % digest.hexdigest()[:12]
+
+
+def backend_conf(shard=None):
+    """Returns the configuration of the taskflow job board backend
+
+    :param shard: the id of the shard, the shared shard uses the unchanged
+                  configuration
+    """
+    conf = {
+        'board': CONF.reaper.job_backend,
+        'path': "/var/lib/%s" % CONF.reaper.job_backend,
+        'host': CONF.reaper.backend_host
+    }
+    if shard is not None:
+        # NOTE(ttsiouts): Each shard is a separate board, in its own Redis
+        # namespace or ZooKeeper path.
+        conf['namespace'] = 'taskflow-%s' % shard
+        conf['path'] = "/var/lib/%s-shards/%s/jobs" % (
+            CONF.reaper.job_backend, shard)
+    return conf
+
+
+def connect(conf):
+    """Returns a connected job board for the given configuration"""
+    board = backends.fetch(BOARD_NAME, conf.copy())
+    board.connect()
+    return board
+
+
+def posted_channel(name=BOARD_NAME, conf=None):
+    """The Redis pub/sub channel where new jobs are announced"""
+    conf = conf or backend_conf()
+    return "%s.%s.posted" % (conf.get('namespace') or 'aardvark', name)
+
+
+def _redis_client(conf):
+    return redis.StrictRedis(host=conf.get('host'),
+                             port=conf.get('port', 6379),
+                             password=conf.get('password'))
+
+
+class BoardConnection(object):
+    """A long lived connection to the job board
+
+    The connection is opened on the first post and reused by all the
+    following ones, from any thread. If posting fails because of the
+    connection, the board is reconnected and the post is retried once.
+    """
+
+    def __init__(self, name=BOARD_NAME, conf=None):
+        self.name = name
+        self.conf = conf or backend_conf()
+        self._board = None
+        self._publisher = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        board = backends.fetch(self.name, self.conf.copy())
+        board.connect()
+        LOG.debug("Connected to the %s job board", self.name)
+        return board
+
+    def _disconnect(self):
+        board, self._board = self._board, None
+        if board is None:
+            return
+        try:
+            board.close()
+        except Exception:
+            LOG.debug("Failed to close the %s job board", self.name,
+                      exc_info=True)
+
+    def post(self, batch):
+        """Posts the given job details, over the same connection
+
+        Returns the posted jobs.
+
+        :param batch: a list with the details of the jobs to post
+        """
+        posted = []
+        with self._lock:
+            reconnected = False
+            while len(posted) < len(batch):
+                try:
+                    if self._board is None:
+                        self._board = self._connect()
+                    for details in batch[len(posted):]:
+                        posted.append(self._board.post(
+                            JOB_NAME, book=None, details=details))
+                except excp.JobFailure:
+                    self._disconnect()
+                    if reconnected:
+                        raise
+                    LOG.warning("Lost the connection to the %s job board, "
+                                "reconnecting", self.name)
+                    reconnected = True
+            self._announce()
+        return posted
+
+    def _announce(self):
+        # NOTE(ttsiouts): The ZooKeeper workers are notified through the
+        # watches of the board. The Redis board has no such mechanism, so the
+        # new jobs are announced through a pub/sub channel.
+        if self.conf['board'] != 'redis':
+            return
+        try:
+            if self._publisher is None:
+                self._publisher = _redis_client(self.conf)
+            self._publisher.publish(posted_channel(self.name, self.conf),
+                                    'posted')
+        except redis.RedisError as e:
+            # The workers will find the jobs when they poll the board.
+            LOG.warning("Failed to announce the new jobs: %s", e)
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+class JobWaiter(object):
+    """Blocks an idle worker until a new job is posted
+
+    With ZooKeeper, the watches of the watched boards wake up the worker.
+    With Redis, the worker subscribes to the channels where BoardConnection
+    announces the new jobs. Either way, the worker waits at most
+    CONF.reaper.job_poll_interval seconds, in case a notification was missed.
+    """
+
+    def __init__(self, conf=None):
+        self.conf = conf or backend_conf()
+        self._event = threading.Event()
+        self._boards = []
+        self._channels = []
+        self._pubsub = None
+        if self.conf['board'] == 'redis':
+            self._client = _redis_client(self.conf)
+            self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+
+    def watch(self, board, conf=None):
+        """Starts waiting for the jobs posted on the given board"""
+        conf = conf or self.conf
+        if self._pubsub is not None:
+            channel = posted_channel(board.name, conf)
+            self._pubsub.subscribe(channel)
+            self._channels.append(channel)
+        else:
+            board.notifier.register(base.POSTED, self._posted)
+        self._boards.append(board)
+
+    def _posted(self, *args, **kwargs):
+        self._event.set()
+
+    def reset(self):
+        """Forgets the jobs posted so far, called before checking the boards"""
+        self._event.clear()
+        if self._pubsub is None:
+            return
+        try:
+            while self._pubsub.get_message() is not None:
+                pass
+        except redis.RedisError as e:
+            LOG.debug("Failed to read the posted jobs: %s", e)
+
+    def wait(self, timeout=None):
+        """Waits for a new job, returns False if the timeout expired"""
+        if timeout is None:
+            timeout = CONF.reaper.job_poll_interval
+        if self._pubsub is None or not self._channels:
+            return self._event.wait(timeout)
+
+        if self._event.is_set():
+            return True
+        try:
+            return self._pubsub.get_message(timeout=timeout) is not None
+        except redis.RedisError as e:
+            LOG.warning("Failed to wait for new jobs: %s", e)
+            time.sleep(timeout)
+            return False
+
+    def wake(self):
+        """Wakes up the waiting worker, e.g. when it has to stop"""
+        self._event.set()
+        if self._channels:
+            try:
+                self._client.publish(self._channels[0], 'wake')
+            except redis.RedisError:
+                pass
+
+    def close(self):
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            except redis.RedisError:
+                pass
+        else:
+            for board in self._boards:
+                board.notifier.deregister(base.POSTED, self._posted)
+        self._boards = []
+        self._channels = []
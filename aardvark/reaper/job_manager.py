@@ -13,12 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import threading
+
 import aardvark.conf
 from aardvark import exception
+from aardvark.reaper import job_board
 from aardvark import utils
 
 from oslo_log import log as logging
-from taskflow.jobs import backends
 
 
 LOG = logging.getLogger(__name__)
@@ -27,42 +30,57 @@ CONF = aardvark.conf.CONF
 
 class JobManager(object):
 
-    board_name = "ReaperBoard"
+    board_name = job_board.BOARD_NAME
 
     def __init__(self):
-        self.watched_aggregates = []
-        for aggregates in utils.map_aggregate_names():
-            if not isinstance(aggregates, list):
-                aggregates = [aggregates]
-            self.watched_aggregates += aggregates
-
-        # HACK: if a request is received without excplicitly defined
-        # aggregates, then any of the workers can pick it up. For this
-        # reason, we make sure, that [] is always included in the list of
-        # watched aggregates.
-        if [] not in self.watched_aggregates:
-            self.watched_aggregates.append([])
+        # NOTE(ttsiouts): The connections to the job board shards are kept
+        # open for the lifetime of the manager, instead of connecting for
+        # each job.
+        self.boards = {}
+        self._lock = threading.Lock()
+
+    def route(self, aggregates):
+        """Returns the shard for a request for the given aggregates
+
+        Each group of watched aggregates has its own shard of the job board,
+        so that each worker sees only its own jobs. Requests without
+        aggregates, or any request if no aggregates are watched, go to the
+        shared shard.
+        """
+        index = utils.aggregate_registry().index()
+        if not aggregates or not index.groups:
+            return None
+        group = index.group(aggregates)
+        if group is None:
+            LOG.error('Request for not watched aggregate %s ', aggregates)
+            raise exception.UnwatchedAggregate()
+        return job_board.shard_id(group)
+
+    def _board(self, shard):
+        with self._lock:
+            if shard not in self.boards:
+                self.boards[shard] = job_board.BoardConnection(
+                    self.board_name, job_board.backend_conf(shard))
+            return self.boards[shard]
 
     def post_job(self, details):
-        # Make sure that the forwarded requests are for watched
-        # aggregates.
-        if not self._is_aggregate_watched(details.aggregates):
-            # Skip this check if we have only one worker.
-            if self.watched_aggregates != [[]]:
-                LOG.error('Request for not watched aggregate %s ',
-                          details.aggregates)
-                raise exception.UnwatchedAggregate()
-
-        backend_conf = {
-            'board': CONF.reaper.job_backend,
-            'path': "/var/lib/%s" % CONF.reaper.job_backend,
-            'host': CONF.reaper.backend_host
-        }
-
-        with backends.backend(self.board_name, backend_conf.copy()) as board:
-            board.post("ReaperJob", book=None, details=details.to_dict())
-
-    def _is_aggregate_watched(self, aggregates):
-        l1 = [agg for agg in self.watched_aggregates if agg in aggregates]
-        l2 = [agg for agg in aggregates if agg in self.watched_aggregates]
-        return l1 == l2
+        self.post_jobs([details])
+
+    def post_jobs(self, batch):
+        """Posts many requests at once over the job board connections"""
+        by_shard = collections.OrderedDict()
+        for details in batch:
+            # Make sure that the forwarded requests are for watched
+            # aggregates.
+            shard = self.route(details.aggregates)
+            by_shard.setdefault(shard, []).append(details.to_dict())
+
+        for shard, jobs in by_shard.items():
+            self._board(shard).post(jobs)
+
+    def close(self):
+        with self._lock:
+            boards = list(self.boards.values())
+            self.boards = {}
+        for board in boards:
+            board.close()
@@ -0,0 +1,252 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Runs the selection of the preemptible servers in a pool of processes
+
+The drivers are CPU bound, so the workers of different aggregates that plan
+at the same time are serialized by the GIL when they run in threads. In
+'process' mode, the resource providers are packed into a compact picklable
+snapshot, the driver runs in a child process and the changes it made to the
+providers are applied back to the original objects.
+"""
+
+from concurrent import futures
+import random
+import threading
+
+from oslo_log import log as logging
+from stevedore import driver
+
+import aardvark.conf
+from aardvark.objects import capabilities
+from aardvark.objects import resources as resources_obj
+
+
+LOG = logging.getLogger(__name__)
+CONF = aardvark.conf.CONF
+
+DRIVER_NAMESPACE = "aardvark.reaper.driver"
+
+
+def load_driver(name, watermark_mode=False):
+    return driver.DriverManager(
+        DRIVER_NAMESPACE,
+        name,
+        invoke_on_load=True,
+        invoke_args=tuple([watermark_mode])).driver
+
+
+class PlanningServer(object):
+
+    def __init__(self, uuid, resources):
+        self.uuid = uuid
+        self.name = uuid
+        self.resources = resources
+
+
+class PlanningHost(object):
+    """The parts of a resource provider that the drivers use"""
+
+    def __init__(self, uuid, name, used, total, reserved, servers):
+        self.uuid = uuid
+        self.name = name
+        self.capabilities = capabilities.Capabilities(used, total)
+        self.capabilities.reserved = reserved
+        self.preemptible_servers = servers
+        self.changed = False
+
+    @property
+    def preemptible_resources(self):
+        preempt = resources_obj.Resources()
+        for server in self.preemptible_servers:
+            preempt += server.resources
+        return preempt
+
+    @property
+    def used_resources(self):
+        return self.capabilities.used
+
+    @property
+    def reserved_resources(self):
+        return self.capabilities.reserved
+
+    @property
+    def free_resources(self):
+        return self.capabilities.free_resources
+
+    def reserve_resources(self, resources, requested):
+        if resources > requested:
+            self.capabilities.used -= resources - requested
+        else:
+            self.capabilities.used += requested - resources
+        self.capabilities.reserved += requested
+        self.changed = True
+
+    def __eq__(self, other):
+        return self.uuid == other.uuid
+
+    def __hash__(self):
+        return hash(self.uuid)
+
+
+def pack(hosts):
+    """Packs the hosts into a compact picklable snapshot
+
+    The resources of the servers are stored once per flavor.
+    """
+    flavors = []
+    index = {}
+    rows = []
+    for host in hosts:
+        servers = []
+        for server in host.preemptible_servers:
+            values = server.resources.to_dict()
+            key = tuple(sorted(values.items()))
+            if key not in index:
+                index[key] = len(flavors)
+                flavors.append(values)
+            servers.append((server.uuid, index[key]))
+        rows.append((host.uuid, host.name,
+                     host.used_resources.to_dict(),
+                     host.capabilities.total.to_dict(),
+                     host.reserved_resources.to_dict(),
+                     servers))
+    return flavors, rows
+
+
+def unpack(snapshot):
+    flavors, rows = snapshot
+    flavors = [resources_obj.Resources(values).freeze() for values in flavors]
+    hosts = []
+    for uuid, name, used, total, reserved, servers in rows:
+        servers = [PlanningServer(server, flavors[flavor])
+                   for server, flavor in servers]
+        hosts.append(PlanningHost(
+            uuid, name, resources_obj.Resources(used),
+            resources_obj.Resources(total),
+            resources_obj.Resources(reserved), servers))
+    return hosts
+
+
+_seeded = []
+
+
+def _plan(overrides, driver_name, watermark_mode, snapshot, requested,
+          slots):
+    """Runs the driver in the child process"""
+    if not _seeded:
+        # The forked children start with the random state of the parent.
+        random.seed()
+        _seeded.append(True)
+    for name, value in overrides.items():
+        CONF.set_override(name, value, group='reaper')
+
+    hosts = unpack(snapshot)
+    reaper_driver = load_driver(driver_name, watermark_mode)
+    selected_hosts, selected_servers = reaper_driver.get_preemptible_servers(
+        resources_obj.Resources(requested), hosts, slots)
+
+    changes = [(host.uuid, host.used_resources.to_dict(),
+                host.reserved_resources.to_dict(),
+                [server.uuid for server in host.preemptible_servers])
+               for host in hosts if host.changed]
+    return ([host.uuid for host in selected_hosts],
+            [server.uuid for server in selected_servers],
+            [[server.uuid for server in spot] for spot in reaper_driver.spots],
+            changes)
+
+
+def _ping():
+    return True
+
+
+class PlanningPool(object):
+    """A pool of processes that run the drivers"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or CONF.reaper.planner_workers
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = futures.ProcessPoolExecutor(
+                    max_workers=self.workers)
+            return self._executor
+
+    def plan(self, driver_name, watermark_mode, requested, hosts, slots):
+        """Runs the driver in a child process
+
+        Returns the selected hosts and servers, and the servers of each
+        spot, like the drivers do. The changes to the hosts are applied to
+        the given objects.
+        """
+        overrides = dict((name, getattr(CONF.reaper, name))
+                         for name in CONF.reaper)
+        future = self.executor.submit(
+            _plan, overrides, driver_name, watermark_mode, pack(hosts),
+            requested.to_dict(), slots)
+        host_uuids, server_uuids, spots, changes = future.result()
+
+        by_uuid = dict((host.uuid, host) for host in hosts)
+        servers = dict((server.uuid, server) for host in hosts
+                       for server in host.preemptible_servers)
+
+        for uuid, used, reserved, remaining in changes:
+            host = by_uuid[uuid]
+            host.capabilities.used = resources_obj.Resources(used)
+            host.capabilities.reserved = resources_obj.Resources(reserved)
+            remaining = set(remaining)
+            host.preemptible_servers = [
+                server for server in host.preemptible_servers
+                if server.uuid in remaining]
+
+        return ([by_uuid[uuid] for uuid in host_uuids],
+                [servers[uuid] for uuid in server_uuids],
+                [[servers[uuid] for uuid in spot] for spot in spots])
+
+    def healthy(self, timeout=10):
+        try:
+            return self.executor.submit(_ping).result(timeout=timeout)
+        except Exception as e:
+            LOG.warning("The planning pool is not responding: %s", e)
+            return False
+
+    def restart(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool():
+    """Returns the planning pool shared by the workers of the process"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PlanningPool()
+        return _pool
@@ -14,23 +14,28 @@
 #    under the License.
 
 
+from concurrent import futures
 import functools
 from novaclient import exceptions as n_exc
 from stevedore import driver
+import threading
 import time
 
 from aardvark.api.rest import nova
 from aardvark.api.rest import placement
 import aardvark.conf
 from aardvark import exception
+from aardvark.objects import resources as resources_obj
 from aardvark.objects import system as system_obj
+from aardvark.reaper import job_board
+from aardvark.reaper import planner
 from aardvark.reaper import reaper_request as rr_obj
+from aardvark.reaper import release_tracker
 from aardvark import utils
 
 from oslo_log import log as logging
 
 from taskflow import exceptions as excp
-from taskflow.jobs import backends
 
 
 CONF = aardvark.conf.CONF
@@ -45,6 +50,61 @@ def while_running(fn):
     return wrapper
 
 
+class RebuildPipeline(object):
+    """Rebuilds the pending servers of a request concurrently
+
+    Pending servers are rebuilt one by one every time a spot is freed, and
+    the ones left are rebuilt all together at the end.
+    """
+
+    def __init__(self, reaper, uuids, image):
+        self.reaper = reaper
+        self.image = image
+        self.pending = list(uuids)
+        self.rebuilds = []
+        self._lock = threading.Lock()
+        self._pool = None
+        if self.pending:
+            workers = min(len(self.pending), CONF.reaper.rebuild_workers)
+            self._pool = futures.ThreadPoolExecutor(max_workers=workers)
+
+    def _rebuild(self, uuid):
+        future = self._pool.submit(self.reaper._rebuild_instance, uuid,
+                                   self.image)
+        with self._lock:
+            self.rebuilds.append((uuid, future))
+
+    def spot_freed(self):
+        with self._lock:
+            if not self.pending:
+                return
+            uuid = self.pending.pop(0)
+        self._rebuild(uuid)
+
+    def rebuild_pending(self):
+        for uuid in self.drain():
+            self._rebuild(uuid)
+
+    def drain(self):
+        """Returns the servers not rebuilt yet and forgets them"""
+        with self._lock:
+            pending, self.pending = self.pending, []
+        return pending
+
+    def wait(self):
+        """Waits for the rebuilds and resets the ones that failed"""
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=True)
+        failed = []
+        for uuid, future in self.rebuilds:
+            error = future.exception()
+            if error is not None:
+                LOG.error("Failed to rebuild server %s: %s", uuid, error)
+                failed.append(uuid)
+        self.reaper._reset_instances(failed)
+
+
 class Reaper(object):
     """The Reaper Class
 
@@ -55,7 +115,9 @@ class Reaper(object):
         self.novaclient = nova.novaclient()
         self.placement = placement.PlacementClient()
         self.worker = None
+        self.waiter = None
         self.missed_acks = 0
+        self.delete_timings = {}
 
         self.aggregates = aggregates if aggregates else []
         # TODO(ttsiouts): Load configured notification system in order to
@@ -69,6 +131,30 @@ class Reaper(object):
             invoke_on_load=True,
             invoke_args=tuple([watermark_mode])).driver
 
+    def plan(self, requested, hosts, slots, watermark_mode=False):
+        """Selects the servers to cull using the configured driver
+
+        Returns the selected hosts, the selected servers and the servers of
+        each reserved spot.
+        """
+        if CONF.reaper.planner_mode == 'process':
+            try:
+                return planner.pool().plan(
+                    CONF.reaper.reaper_driver, watermark_mode, requested,
+                    hosts, slots)
+            except exception.ReaperException:
+                raise
+            except Exception as e:
+                LOG.warning("Planning in the process pool failed, planning "
+                            "in the worker instead: %s", e)
+                planner.pool().restart()
+
+        reaper_driver = self._load_configured_driver(
+            watermark_mode=watermark_mode)
+        selected_hosts, selected_servers = \
+            reaper_driver.get_preemptible_servers(requested, hosts, slots)
+        return selected_hosts, selected_servers, reaper_driver.spots
+
     def evaluate_reaper_request(self, request):
         # If we receive a request without explicit aggregates
         # set the aggregates of the request to self.aggregates
@@ -78,23 +164,77 @@ class Reaper(object):
         if request.aggregates == []:
             request.aggregates = self.aggregates
 
+        pipeline = RebuildPipeline(self, request.uuids, request.image)
+        on_spot_freed = None
+        if CONF.reaper.pipelined_rebuild:
+            on_spot_freed = pipeline.spot_freed
+
         try:
-            self.handle_reaper_request(request)
-            self._rebuild_instances(request.uuids, request.image)
+            self.handle_reaper_request(request, on_spot_freed=on_spot_freed)
+            pipeline.rebuild_pending()
         except exception.ReaperException as e:
             LOG.error(e.message)
-            self._reset_instances(request.uuids)
+            self._reset_instances(pipeline.drain())
+        finally:
+            pipeline.wait()
+
+    def evaluate_reaper_requests(self, requests):
+        """Handles many reaper requests for the same aggregates at once
+
+        The system is loaded once, the victims for all the requests are
+        selected in a single pass and the rebuilds are split back per
+        request.
+        """
+        if len(requests) == 1:
+            return self.evaluate_reaper_request(requests[0])
 
-    def handle_reaper_request(self, request):
+        for request in requests:
+            if request.aggregates == []:
+                request.aggregates = self.aggregates
+
+        pipelines = [RebuildPipeline(self, request.uuids, request.image)
+                     for request in requests]
+        try:
+            system = system_obj.get_system(requests[0].aggregates)
+            preemptible_projects = [
+                project.id_ for project in system.preemptible_projects
+            ]
+            accepted = []
+            for request, pipeline in zip(requests, pipelines):
+                if request.project_id in preemptible_projects:
+                    # Make space only if the requesting project is
+                    # non-preemptible.
+                    LOG.error(exception.PreemptibleRequest.message)
+                    self._reset_instances(pipeline.drain())
+                    continue
+                accepted.append((request, pipeline))
+
+            LOG.info("Handling %d coalesced requests", len(accepted))
+            failed = self.free_resources_for_requests(accepted, system)
+            for request, pipeline in failed or []:
+                self._reset_instances(pipeline.drain())
+            for pipeline in pipelines:
+                pipeline.rebuild_pending()
+        except exception.ReaperException as e:
+            LOG.error(e.message)
+            for pipeline in pipelines:
+                self._reset_instances(pipeline.drain())
+        finally:
+            for pipeline in pipelines:
+                pipeline.wait()
+
+    def handle_reaper_request(self, request, on_spot_freed=None):
         """Main functionality of the Reaper
 
         Gathers info and tries to free up the requested resources.
 
         :param req_spec: the request specification for the spawning server
         :param resources: the requested resources
+        :param on_spot_freed: called every time the servers occupying one of
+                              the reserved spots are gone
         """
 
-        system = system_obj.System(request.aggregates)
+        system = system_obj.get_system(request.aggregates)
 
         slots = len(request.uuids)
         preemptible_projects = [
@@ -105,11 +245,12 @@ class Reaper(object):
             # non-preemptible.
             raise exception.PreemptibleRequest()
 
-        self.free_resources(request.resources, system, slots=slots)
+        self.free_resources(request.resources, system, slots=slots,
+                            on_spot_freed=on_spot_freed)
 
     def handle_state_calculation_request(self, request):
 
-        system = system_obj.System(request.aggregates)
+        system = system_obj.get_system(request.aggregates)
         system_state = system.system_state()
 
         LOG.info("Current System usage = %s", system_state.usage())
@@ -121,31 +262,168 @@ class Reaper(object):
             self.free_resources(resource_request, system, watermark_mode=True)
 
     @utils.retries
-    def free_resources(self, request, system, slots=1, watermark_mode=False):
+    def free_resources(self, request, system, slots=1, watermark_mode=False,
+                       on_spot_freed=None):
 
         system.populate_system_rps()
-        reaper_driver = self._load_configured_driver(
+        selected_hosts, selected_servers, spots = self.plan(
+            request, system.resource_providers, slots,
             watermark_mode=watermark_mode)
 
-        selected_hosts, selected_servers = \
-            reaper_driver.get_preemptible_servers(
-                request, system.resource_providers, slots)
+        spots = [(spot, on_spot_freed) for spot in spots]
+        self.release_servers(selected_servers, spots, system)
+
+    @utils.retries
+    def free_resources_for_requests(self, requests, system):
+        """Frees up the resources for many requests in one pass
+
+        The victims of all the requests are selected over the same resource
+        providers, one request after the other, so that no server is picked
+        twice. Then all of them are deleted together.
 
-        for server in selected_servers:
+        Returns the requests for which no space could be found.
+
+        :param requests: a list of (request, pipeline) tuples
+        """
+        system.populate_system_rps()
+        hosts = system.resource_providers
+
+        selected_servers = []
+        spots = []
+        failed = []
+        for request, pipeline in requests:
+            saved = [(host, host.used_resources.copy(),
+                      list(host.preemptible_servers)) for host in hosts]
             try:
-                LOG.info("Trying to delete server: %s", server.name)
-                self.notify_about_instance(server)
-                self.novaclient.servers.delete(server.uuid)
-            except n_exc.NotFound:
-                # One of the selected servers was not found so, we will retry
-                LOG.info("Server %s not found. Retrying.", server.name)
-                # Emptying the cached in order to retry.
-                system.empty_cache()
-                raise exception.RetryException()
+                _, servers, request_spots = self.plan(
+                    request.resources, hosts, len(request.uuids))
+            except exception.ReaperException as e:
+                LOG.error("Request for %s failed: %s", request.uuids,
+                          e.message)
+                # Give back whatever the driver reserved for this request.
+                for host, used, preemptible in saved:
+                    host.capabilities.used = used
+                    host.preemptible_servers = preemptible
+                failed.append((request, pipeline))
+                continue
+            finally:
+                # The spots of the next request are counted from scratch.
+                for host in hosts:
+                    host.capabilities.reserved = resources_obj.Resources()
+
+            selected_servers += servers
+            on_spot_freed = None
+            if CONF.reaper.pipelined_rebuild:
+                on_spot_freed = pipeline.spot_freed
+            spots += [(spot, on_spot_freed) for spot in request_spots]
+
+        self.release_servers(selected_servers, spots, system)
+        return failed
+
+    def release_servers(self, servers, spots, system):
+        """Deletes the servers and waits until their allocations are gone
+
+        :param servers: the servers to delete
+        :param spots: a list of (servers, callback) tuples. The callback, if
+                      not None, is called as soon as all the servers occupying
+                      the spot are gone.
+        :param system: the system the servers were selected from
+        """
+        # Start watching for the delete notifications before deleting, so
+        # that no notification is missed.
+        uuids = [s.uuid for s in servers]
+        release_tracker.tracker.watch(uuids)
 
+        try:
+            not_deleted = self.delete_servers(servers)
+        except Exception:
+            release_tracker.tracker.unwatch(uuids)
+            raise
+
+        if not_deleted:
+            # Some of the selected servers were not deleted so, we will retry.
+            # NOTE(ttsiouts): Wait for the ones that were deleted first, so
+            # that the retry finds their resources free.
+            skipped = set(s.uuid for s in not_deleted)
+            deleted = [uuid for uuid in uuids if uuid not in skipped]
+            try:
+                self.wait_until_allocations_are_deleted(deleted)
+            finally:
+                release_tracker.tracker.unwatch(uuids)
+            # Emptying the cached in order to retry.
+            system.empty_cache()
+            raise exception.RetryException()
+
+        try:
+            self._wait_for_spots(uuids, spots)
+        finally:
+            # The waits watch the servers on their own.
+            release_tracker.tracker.unwatch(uuids)
+
+    def _wait_for_spots(self, uuids, spots):
         # We have to wait until the allocations are removed
-        uuids = [s.uuid for s in selected_servers]
-        self.wait_until_allocations_are_deleted(uuids)
+        spots = [(set(s.uuid for s in spot), callback)
+                 for spot, callback in spots if callback is not None]
+        if not spots:
+            self.wait_until_allocations_are_deleted(uuids)
+            return
+
+        # Pipelined mode: report each spot as soon as all the servers that
+        # occupy it are gone, instead of waiting for all of them.
+        for spot, callback in spots:
+            if not spot:
+                callback()
+        for uuid in self.released_allocations(uuids):
+            LOG.info('Allocations for %s not found', uuid)
+            for spot, callback in spots:
+                if uuid in spot:
+                    spot.discard(uuid)
+                    if not spot:
+                        callback()
+
+    def delete_servers(self, servers):
+        """Deletes the given servers concurrently
+
+        Returns the servers that were not deleted, either because they were
+        not found or because their deletion failed. The time each deletion
+        took is kept in self.delete_timings.
+        """
+        self.delete_timings = {}
+        if not servers:
+            return []
+
+        workers = min(len(servers), CONF.reaper.delete_workers)
+        with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            deletions = [(server, pool.submit(self._delete_server, server))
+                         for server in servers]
+
+        not_deleted = []
+        for server, future in deletions:
+            try:
+                self.delete_timings[server.uuid] = future.result()
+            except n_exc.NotFound:
+                LOG.info("Server %s not found. Retrying.", server.name)
+                not_deleted.append(server)
+            except Exception as e:
+                # NOTE(ttsiouts): Go on with the rest of the servers, the
+                # ones that were deleted still have to be waited for.
+                LOG.error("Failed to delete server %s: %s", server.name, e)
+                not_deleted.append(server)
+
+        if self.delete_timings:
+            timings = sorted(self.delete_timings.values())
+            LOG.info("Deleted %d servers (median: %.2fs, max: %.2fs)",
+                     len(timings), timings[len(timings) // 2], timings[-1])
+        return not_deleted
+
+    def _delete_server(self, server):
+        LOG.info("Trying to delete server: %s", server.name)
+        start = time.time()
+        self.notify_about_instance(server)
+        self.novaclient.servers.delete(server.uuid)
+        elapsed = time.time() - start
+        LOG.debug("Deletion of server %s took %.2fs", server.name, elapsed)
+        return elapsed
 
     def notify_about_instance(self, instance):
         # Notify with the configured notification system before deleting.
@@ -155,27 +433,71 @@ class Reaper(object):
     def job_handler(self):
         self.flag = True
 
-        backend_conf = {
-            'board': CONF.reaper.job_backend,
-            'path': "/var/lib/%s" % CONF.reaper.job_backend,
-            'host': CONF.reaper.backend_host
-        }
+        # NOTE(ttsiouts): Each worker reads the shard of the job board of its
+        # own aggregates and the shared shard with the requests that have no
+        # aggregates.
+        shards = [job_board.shard_id(self.aggregates)]
+        if shards[0] is not None:
+            shards.append(None)
 
-        with backends.backend("ReaperBoard", backend_conf.copy()) as board:
-            self.attempt_job_claim(board)
+        boards = []
+        self.waiter = job_board.JobWaiter()
+        try:
+            for shard in shards:
+                backend_conf = job_board.backend_conf(shard)
+                board = job_board.connect(backend_conf)
+                boards.append(board)
+                self.waiter.watch(board, backend_conf)
+            self.attempt_job_claim(boards)
+        finally:
+            self.waiter.close()
+            for board in boards:
+                board.close()
 
         LOG.info("Reaper worker stopped: %s", self.aggregates)
 
     @while_running
-    def attempt_job_claim(self, board):
+    def attempt_job_claim(self, boards):
 
         # Reset the acks in every loop to show you're alive
         self.missed_acks = 0
+        # Forget the jobs announced so far, the boards are checked right after.
+        self.waiter.reset()
+        handled = False
+        for board in boards:
+            handled = self._claim_jobs(board, boards) or handled
+
+        if not handled and self.flag:
+            # Nothing to do, block until a new job is posted instead of
+            # checking the boards again right away.
+            self.waiter.wait()
+
+    def _claim_jobs(self, board, boards):
+        handled = False
+        coalescing = CONF.reaper.coalescing_window > 0
+        for job, request in self._claimed_jobs(board):
+            if coalescing and isinstance(request, rr_obj.ReaperRequest):
+                self._coalesce(board, job, request, boards)
+            else:
+                self.handle_request(request)
+                board.consume(job, "worker")
+                LOG.debug("Consumed %s", job)
+            handled = True
+        return handled
+
+    def _claimed_jobs(self, board, accept=None):
+        """Claims the jobs of the board one by one, as they are iterated
+
+        :param accept: if given, only the requests that it returns True for
+                       are claimed
+        """
         jobs = board.iterjobs(ensure_fresh=True, only_unclaimed=True)
         for job in jobs:
             try:
                 request = rr_obj.request_from_job(job.details)
                 self._check_requested_aggregates(request.aggregates)
+                if accept is not None and not accept(request):
+                    continue
                 board.claim(job, "worker")
                 LOG.debug("Claimed %s", job)
             except exception.UnknownRequestType:
@@ -186,10 +508,32 @@ class Reaper(object):
                 # Another worker maybe claimed the job. No need to
                 # take further actions.
                 continue
+            yield job, request
 
-            self.handle_request(request)
-            board.consume(job, "worker")
-            LOG.debug("Consumed %s", job)
+    def _coalesce(self, board, job, request, boards):
+        """Handles a reaper request along with the ones posted shortly after
+
+        The other reaper requests for the same aggregates, posted within
+        CONF.reaper.coalescing_window seconds, are claimed and handled in the
+        same culling pass.
+        """
+        aggregates = frozenset(request.aggregates or self.aggregates)
+
+        def accept(other):
+            if not isinstance(other, rr_obj.ReaperRequest):
+                return False
+            return frozenset(other.aggregates or self.aggregates) == aggregates
+
+        claimed = [(board, job, request)]
+        time.sleep(CONF.reaper.coalescing_window)
+        for other_board in boards:
+            for other_job, other in self._claimed_jobs(other_board, accept):
+                claimed.append((other_board, other_job, other))
+
+        self.evaluate_reaper_requests([other for _, _, other in claimed])
+        for other_board, other_job, _ in claimed:
+            other_board.consume(other_job, "worker")
+            LOG.debug("Consumed %s", other_job)
 
     def handle_request(self, request):
 
@@ -201,18 +545,24 @@ class Reaper(object):
 
     def stop_handling(self):
         self.flag = False
+        if self.waiter is not None:
+            self.waiter.wake()
 
     def _rebuild_instances(self, uuids, image):
-        for uuid in uuids:
-            try:
-                LOG.info("Trying to rebuild server with uuid: %s", uuid)
-                self.novaclient.servers.rebuild(uuid, image)
-            except n_exc.NotFound:
-                # Looks like we were late, and the server is deleted.
-                # Nothing more we can do.
-                LOG.info("Server with uuid: %s, not found.", uuid)
-                continue
-            LOG.info("Request to rebuild the server %s was sent.", uuid)
+        pipeline = RebuildPipeline(self, uuids, image)
+        pipeline.rebuild_pending()
+        pipeline.wait()
+
+    def _rebuild_instance(self, uuid, image):
+        try:
+            LOG.info("Trying to rebuild server with uuid: %s", uuid)
+            self.novaclient.servers.rebuild(uuid, image)
+        except n_exc.NotFound:
+            # Looks like we were late, and the server is deleted.
+            # Nothing more we can do.
+            LOG.info("Server with uuid: %s, not found.", uuid)
+            return
+        LOG.info("Request to rebuild the server %s was sent.", uuid)
 
     def _reset_instances(self, uuids):
         for uuid in uuids:
@@ -227,33 +577,60 @@ class Reaper(object):
             LOG.info("Request to reset the server %s was sent.", uuid)
 
     def _check_requested_aggregates(self, aggregates):
-        l1 = [agg for agg in self.aggregates if agg in aggregates]
-        l2 = [agg for agg in aggregates if agg in self.aggregates]
-        if l1 != l2:
+        # A worker without aggregates watches the whole infrastructure.
+        watched = frozenset(self.aggregates)
+        if watched and not watched.issuperset(aggregates):
             raise exception.UnwatchedAggregate()
 
-    def wait_until_allocations_are_deleted(self, uuids, timeout=20):
+    def wait_until_allocations_are_deleted(self, uuids, timeout=None):
         """Wait until the allocation is deleted
 
-        Tries to get the allocations of a given instance until it's not found
-        or the timeout exceeds
+        Waits until the allocations of all the given instances are removed
+        or the timeout exceeds.
         """
-        # Awful way to wait until the allocation is removed.....
-        # Have to live with it for now... If we don't wait here, the claiming
-        # of the resources will most probably fail since placement will not be
-        # updated right away....
-        start = time.time()
-        now = start
-        while now - start <= timeout:
-            not_found = False
-            for uuid in uuids:
-                resp = self.placement.get_allocations(uuid)
-                if resp['allocations'] == {}:
-                    not_found = True
+        for uuid in self.released_allocations(uuids, timeout=timeout):
+            LOG.info('Allocations for %s not found', uuid)
+
+    def released_allocations(self, uuids, timeout=None):
+        """Yields the instances as soon as their allocations are removed
+
+        If we don't wait here, the claiming of the resources will most
+        probably fail since placement will not be updated right away. An
+        instance is considered released when its instance.delete.end
+        notification is received, or when a polling round finds that it has
+        no allocations. All the pending instances are checked in each round
+        and the interval between rounds backs off exponentially.
+        """
+        if timeout is None:
+            timeout = CONF.reaper.allocation_wait_timeout
+        deadline = time.time() + timeout
+        interval = CONF.reaper.allocation_poll_interval
+        pending = set(uuids)
+
+        release_tracker.tracker.watch(pending)
+        try:
+            while pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    LOG.warning('Timed out waiting for the allocations of '
+                                '%s to be removed', ', '.join(pending))
                     break
-            if not_found:
-                LOG.info('Allocations for %s not found', uuid)
-                uuids.remove(uuid)
-            if len(uuids) == 0:
-                break
-            now = time.time()
+                release_tracker.tracker.wait(pending,
+                                             min(interval, remaining))
+                interval = min(interval * 2,
+                               CONF.reaper.allocation_poll_max_interval)
+
+                # NOTE(ttsiouts): Nova sends instance.delete.end after the
+                # allocations of the instance are deleted, so there is no
+                # need to double check the notified ones.
+                released = release_tracker.tracker.released(pending)
+                for uuid in list(pending - released):
+                    resp = self.placement.get_allocations(uuid)
+                    if not resp or resp['allocations'] == {}:
+                        released.add(uuid)
+
+                for uuid in released:
+                    pending.discard(uuid)
+                    yield uuid
+        finally:
+            release_tracker.tracker.unwatch(uuids)
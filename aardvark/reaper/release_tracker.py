@@ -0,0 +1,72 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import threading
+
+
+class ReleaseTracker(object):
+    """Tracks the deleted servers that the reaper workers are waiting for
+
+    The notification listener marks a server as released as soon as the
+    instance.delete.end notification arrives, waking up the workers that
+    wait for its allocations to be removed.
+
+    More than one worker may watch the same server, so the watchers of each
+    server are counted and it is forgotten when the last one stops watching.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._watched = collections.Counter()
+        self._released = set()
+
+    def watch(self, uuids):
+        with self._cond:
+            self._watched.update(uuids)
+
+    def unwatch(self, uuids):
+        with self._cond:
+            for uuid in uuids:
+                self._watched[uuid] -= 1
+                if self._watched[uuid] <= 0:
+                    del self._watched[uuid]
+                    self._released.discard(uuid)
+
+    def release(self, uuid):
+        with self._cond:
+            if uuid not in self._watched:
+                return
+            self._released.add(uuid)
+            self._cond.notify_all()
+
+    def released(self, uuids):
+        """Returns the released servers among the given ones"""
+        with self._cond:
+            return self._released.intersection(uuids)
+
+    def has_released(self, uuids):
+        """Returns True if one of the given servers is released"""
+        with self._cond:
+            return bool(self._released.intersection(uuids))
+
+    def wait(self, uuids, timeout):
+        """Waits until one of the given servers is released or timeout"""
+        with self._cond:
+            if not self._released.intersection(uuids):
+                self._cond.wait(timeout)
+
+
+tracker = ReleaseTracker()
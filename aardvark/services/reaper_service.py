@@ -25,7 +25,9 @@ from taskflow.utils import threading_utils
 import aardvark.conf
 from aardvark import config
 from aardvark.notifications import manager
+from aardvark.objects import cluster_state
 from aardvark.reaper import job_manager
+from aardvark.reaper import planner
 from aardvark.reaper import reaper
 from aardvark.reaper import reaper_request as rr_obj
 from aardvark import utils
@@ -39,7 +41,7 @@ class ReaperService(service.Service):
 
     def __init__(self):
         super(ReaperService, self).__init__()
-        if six.PY3:
+        if six.PY3 and worker_mode() == 'thread':
             from taskflow.utils import eventlet_utils as _eu  # noqa
             try:
                 import eventlet as _eventlet  # noqa
@@ -51,12 +53,18 @@ class ReaperService(service.Service):
 
     def start(self):
         super(ReaperService, self).start()
+        self._start_state_model()
         self._start_workers()
         self._start_state_calculation()
         self._start_notification_handling()
 
     def stop(self, graceful=True):
         self._stop_workers()
+        if worker_mode() == 'asyncio':
+            from aardvark.reaper import async_worker
+            async_worker.event_loop.stop()
+        planner.pool().shutdown()
+        self._stop_state_calculation()
         self._stop_notification_handling()
         # No need to need to explicitly stop the periodic tasks,
         # since it is taken care of by the Service.stop()
@@ -84,6 +92,19 @@ class ReaperService(service.Service):
             periodic_interval_max=CONF.aardvark.periodic_interval,
             context=admin_context)
 
+    @utils.state_model_enabled
+    def _start_state_model(self):
+        if not CONF.aardvark.enable_notification_handling:
+            LOG.warning('The cluster state model is only updated by the '
+                        'notifications, without them it is updated only '
+                        'by the periodic reconciliation.')
+        self.state_reconciler = ClusterStateReconciler()
+        LOG.info('Starting Periodic Cluster State Reconciliation')
+        self.tg.add_dynamic_timer(
+            self.state_reconciler.periodic_tasks,
+            periodic_interval_max=CONF.aardvark.state_reconcile_interval,
+            context=context.get_admin_context())
+
     @utils.notifications_enabled
     def _start_notification_handling(self):
         LOG.info('Starting Notification listener')
@@ -95,34 +116,65 @@ class ReaperService(service.Service):
             instance.stop_handling()
             instance.worker.join()
 
+    @utils.watermark_enabled
+    def _stop_state_calculation(self):
+        self.state_calculator.job_manager.close()
+
     @utils.notifications_enabled
     def _stop_notification_handling(self):
         LOG.info('Stoping Notification listener')
         self.notification_manager.stop()
 
     def _setup_workers(self, watched_aggregates):
-        if len(watched_aggregates) == 0:
-            LOG.debug('One worker for all infrastructure will be started')
-            watched_aggregates = [watched_aggregates]
-
-        for aggregates in watched_aggregates:
-            if not isinstance(aggregates, list):
-                aggregates = [aggregates]
-            instance = reaper.Reaper(aggregates)
-            instance.worker = threading_utils.daemon_thread(
-                instance.job_handler)
-            self.reaper_instances.append(instance)
+        for aggregates in worker_aggregates(watched_aggregates):
+            self.reaper_instances.append(create_reaper(aggregates))
 
     @utils.notifications_enabled
     def _setup_notification_manager(self):
         self.notification_manager = manager.ListenerManager()
 
 
+def worker_mode():
+    """Returns the mode of the reaper workers that can be used here"""
+    if CONF.reaper.worker_mode == 'asyncio':
+        if six.PY2:
+            LOG.warning('The asyncio reaper workers require Python 3, '
+                        'using threads instead.')
+            return 'thread'
+        from aardvark.api.rest import aio
+        if not aio.available():
+            LOG.warning('The asyncio reaper workers require aiohttp, '
+                        'using threads instead.')
+            return 'thread'
+    return CONF.reaper.worker_mode
+
+
+def worker_aggregates(watched_aggregates):
+    """Returns the aggregates of each of the reaper workers"""
+    if len(watched_aggregates) == 0:
+        LOG.debug('One worker for all infrastructure will be started')
+        return [[]]
+    return [aggregates if isinstance(aggregates, list) else [aggregates]
+            for aggregates in watched_aggregates]
+
+
+def create_reaper(aggregates):
+    """Creates a reaper for the aggregates along with its worker"""
+    if worker_mode() == 'asyncio':
+        from aardvark.reaper import async_worker
+        instance = async_worker.AsyncReaper(aggregates)
+        instance.worker = async_worker.TaskWorker(instance)
+        return instance
+
+    instance = reaper.Reaper(aggregates)
+    instance.worker = threading_utils.daemon_thread(instance.job_handler)
+    return instance
+
+
 class SystemStateCalculator(periodic_task.PeriodicTasks):
 
     def __init__(self):
         super(SystemStateCalculator, self).__init__(CONF)
-        self.watched_aggregates = utils.map_aggregate_names()
         self.job_manager = job_manager.JobManager()
 
     def periodic_tasks(self, context, raise_on_error=False):
@@ -132,11 +184,26 @@ class SystemStateCalculator(periodic_task.PeriodicTasks):
                                  run_immediately=True)
     def calculate_system_state(self, context, startup=True):
         LOG.debug('Periodic Timer for state check expired ')
-        for aggregates in self.watched_aggregates:
+        for aggregates in utils.map_aggregate_names():
             request = rr_obj.StateCalculationRequest(aggregates)
             self.job_manager.post_job(request)
 
 
+class ClusterStateReconciler(periodic_task.PeriodicTasks):
+
+    def __init__(self):
+        super(ClusterStateReconciler, self).__init__(CONF)
+
+    def periodic_tasks(self, context, raise_on_error=False):
+        return self.run_periodic_tasks(context, raise_on_error=raise_on_error)
+
+    @periodic_task.periodic_task(
+        spacing=CONF.aardvark.state_reconcile_interval, run_immediately=True)
+    def reconcile_cluster_state(self, context, startup=True):
+        LOG.debug('Periodic Timer for cluster state reconciliation expired')
+        cluster_state.state.reconcile(utils.map_aggregate_names())
+
+
 class ReaperWorkerHealthCheck(periodic_task.PeriodicTasks):
 
     def __init__(self, reaper_instances):
@@ -146,6 +213,39 @@ class ReaperWorkerHealthCheck(periodic_task.PeriodicTasks):
     def periodic_tasks(self, context, raise_on_error=False):
         return self.run_periodic_tasks(context, raise_on_error=raise_on_error)
 
+    @periodic_task.periodic_task(spacing=20, run_immediately=False)
+    def check_planning_pool(self, context, startup=True):
+        if CONF.reaper.planner_mode != 'process':
+            return
+        pool = planner.pool()
+        if not pool.healthy():
+            LOG.info('Planning pool found broken, restarting it.')
+            pool.restart()
+
+    @periodic_task.periodic_task(spacing=20, run_immediately=False)
+    def check_watched_aggregates(self, context, startup=True):
+        # NOTE(ttsiouts): The requests are routed to the shards of the
+        # aggregates last loaded by the registry, so the workers follow the
+        # same aggregates, e.g. after an aggregate is recreated.
+        watched = worker_aggregates(utils.map_aggregate_names())
+        wanted = set(frozenset(aggregates) for aggregates in watched)
+        for instance in list(self.reaper_instances):
+            if frozenset(instance.aggregates) not in wanted:
+                LOG.info('Aggregates %s are not watched anymore, stopping '
+                         'their worker.', instance.aggregates)
+                instance.stop_handling()
+                instance.worker.join(timeout=0.1)
+                self.reaper_instances.remove(instance)
+
+        running = set(frozenset(instance.aggregates)
+                      for instance in self.reaper_instances)
+        for aggregates in watched:
+            if frozenset(aggregates) not in running:
+                LOG.info('Starting worker for aggregates %s.', aggregates)
+                instance = create_reaper(aggregates)
+                self.reaper_instances.append(instance)
+                instance.worker.start()
+
     @periodic_task.periodic_task(spacing=20, run_immediately=False)
     def check_worker_state(self, context, startup=True):
         LOG.debug('Periodic Timer for worker health check expired')
@@ -167,9 +267,7 @@ class ReaperWorkerHealthCheck(periodic_task.PeriodicTasks):
                 self.reaper_instances.remove(instance)
                 LOG.info('Reviving worker for aggregates %s.',
                          instance.aggregates)
-                new_instance = reaper.Reaper(instance.aggregates)
-                new_instance.worker = threading_utils.daemon_thread(
-                    new_instance.job_handler)
+                new_instance = create_reaper(instance.aggregates)
                 self.reaper_instances.append(new_instance)
                 new_instance.worker.start()
 
@@ -0,0 +1,24 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import six
+
+
+collect_ignore = []
+if six.PY2:
+    # NOTE(ttsiouts): The asyncio reaper worker requires Python 3, its tests
+    # cannot even be imported on Python 2.
+    collect_ignore += ['unit/api/test_aio.py',
+                       'unit/reaper/test_async_worker.py']
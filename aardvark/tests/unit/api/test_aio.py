@@ -0,0 +1,59 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+
+import mock
+from oslotest import base
+
+from aardvark.api.rest import aio
+import aardvark.conf
+
+
+CONF = aardvark.conf.CONF
+
+
+class AsyncRestClientTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(AsyncRestClientTests, self).setUp()
+        get_session = mock.patch.object(aio.session, 'get_session')
+        self.session = get_session.start().return_value
+        self.addCleanup(get_session.stop)
+        self.session.get_token.return_value = 'token'
+        self.session.get_endpoint.return_value = 'http://endpoint/'
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def _auth(self, client):
+        return self.loop.run_until_complete(client._auth())
+
+    def test_keystone_endpoint(self):
+        client = aio.AsyncKeystoneClient(None)
+
+        self.assertEqual(('token', 'http://endpoint'), self._auth(client))
+        self.session.get_endpoint.assert_called_once_with(
+            service_type='identity',
+            interface=CONF.identity.valid_interfaces)
+
+    def test_configured_service_type(self):
+        client = aio.AsyncNovaClient(None)
+
+        self._auth(client)
+        self._auth(client)
+        # The endpoint is looked up once.
+        self.session.get_endpoint.assert_called_once_with(
+            service_type=CONF.compute.service_type,
+            interface=CONF.compute.valid_interfaces)
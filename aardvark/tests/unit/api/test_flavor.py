@@ -0,0 +1,40 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from novaclient import exceptions as n_exc
+from oslotest import base
+
+from aardvark.api import flavor
+
+
+class FlavorListTests(base.BaseTestCase):
+
+    @mock.patch.object(flavor.nova, 'novaclient')
+    def test_flavor(self, novaclient):
+        flavors = novaclient.return_value.flavors
+        flavors.get.return_value = mock.Mock(vcpus=2, ram=4096, disk=20,
+                                             ephemeral=0, swap='')
+
+        self.assertEqual({'vcpus': 2, 'ram': 4096, 'disk': 20,
+                          'ephemeral': 0, 'swap': 0},
+                         flavor.FlavorList().flavor('f1'))
+
+    @mock.patch.object(flavor.nova, 'novaclient')
+    def test_deleted_flavor(self, novaclient):
+        flavors = novaclient.return_value.flavors
+        flavors.get.side_effect = n_exc.NotFound(404)
+
+        self.assertIsNone(flavor.FlavorList().flavor('f1'))
@@ -0,0 +1,59 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslotest import base
+
+from aardvark.api import instance
+
+
+class FakeServers(object):
+    """Lists the servers like Nova, at most max_limit per request"""
+
+    def __init__(self, servers, max_limit=2):
+        self.servers = servers
+        self.max_limit = max_limit
+        self.requests = 0
+
+    def list(self, search_opts=None, marker=None, limit=None):
+        self.requests += 1
+        start = 0
+        if marker is not None:
+            start = [s.id for s in self.servers].index(marker) + 1
+        return self.servers[start:start + min(limit, self.max_limit)]
+
+
+def fake_server(uuid, host):
+    server = mock.Mock(id=uuid, flavor={}, tenant_id='p1')
+    server.name = uuid
+    setattr(server, instance.HOST_ATTR, host)
+    return server
+
+
+class InstanceListTests(base.BaseTestCase):
+
+    @mock.patch.object(instance.nova, 'novaclient')
+    def test_instances_by_host_paged(self, novaclient):
+        servers = FakeServers([fake_server('s%d' % i, 'host%d' % (i % 2))
+                               for i in range(5)])
+        novaclient.return_value.servers = servers
+
+        by_host = instance.InstanceList().instances_by_host(project_id='p1')
+
+        self.assertEqual(['s0', 's2', 's4'],
+                         [s.uuid for s in by_host['host0']])
+        self.assertEqual(['s1', 's3'], [s.uuid for s in by_host['host1']])
+        # Three pages and the empty one that ends the listing.
+        self.assertEqual(4, servers.requests)
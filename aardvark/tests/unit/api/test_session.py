@@ -0,0 +1,82 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+import aardvark.conf
+from aardvark.api.rest import nova
+from aardvark.api.rest import session
+
+
+class GetSessionTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(GetSessionTests, self).setUp()
+        self.conf = self.useFixture(config_fixture.Config(aardvark.conf.CONF))
+        self.conf.config(group='aardvark', http_pool_connections=2,
+                         http_pool_maxsize=7)
+        patch = mock.patch.object(session, 'keystone_loading')
+        self.loading = patch.start()
+        self.addCleanup(patch.stop)
+        self.loading.load_session_from_conf_options.side_effect = (
+            lambda conf, group, auth, session: mock.Mock(http=session))
+        session.reset()
+        self.addCleanup(session.reset)
+
+    def test_session_per_group(self):
+        placement = session.get_session('placement')
+
+        self.assertIs(placement, session.get_session('placement'))
+        self.assertIsNot(placement, session.get_session('compute'))
+        self.assertEqual(
+            2, self.loading.load_session_from_conf_options.call_count)
+
+    def test_pool_sizes(self):
+        http = session.get_session('placement').http
+
+        for url in ('http://placement', 'https://placement'):
+            adapter = http.get_adapter(url)
+            self.assertEqual(2, adapter._pool_connections)
+            self.assertEqual(7, adapter._pool_maxsize)
+
+    def test_reset(self):
+        placement = session.get_session('placement')
+        session.reset()
+
+        self.assertIsNot(placement, session.get_session('placement'))
+
+
+class NovaclientTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(NovaclientTests, self).setUp()
+        for name in ('client', 'session'):
+            patch = mock.patch.object(nova, name)
+            patch.start()
+            self.addCleanup(patch.stop)
+        patch = mock.patch.object(nova, '_novaclient', None)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_shared_client(self):
+        client = nova.novaclient()
+
+        self.assertIs(client, nova.novaclient())
+        nova.client.Client.assert_called_once_with(
+            aardvark.conf.CONF.compute.client_version,
+            session=nova.session.get_session.return_value)
+        nova.session.get_session.assert_called_once_with('compute')
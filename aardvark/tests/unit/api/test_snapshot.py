@@ -0,0 +1,145 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+from keystoneauth1 import exceptions as keystone_exc
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+import aardvark.conf
+from aardvark.api import snapshot
+
+
+INVENTORY = {'VCPU': {'total': 8, 'allocation_ratio': 1.0, 'reserved': 0}}
+USAGES = {'VCPU': 2}
+
+
+class FakePlacement(object):
+
+    def __init__(self, failures=None):
+        # Maps (call, uuid) to the list of exceptions to raise, one per call.
+        self.failures = failures or {}
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def _call(self, call, uuid, result):
+        with self._lock:
+            self.calls.append((call, uuid))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            errors = self.failures.get((call, uuid))
+            error = errors.pop(0) if errors else None
+        try:
+            # Give the other workers the chance to overlap with this call,
+            # time.sleep is patched by the tests.
+            threading.Event().wait(0.01)
+            if error is not None:
+                raise error
+            return result
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def inventories(self, uuid):
+        return self._call('inventories', uuid, INVENTORY)
+
+    def usages(self, uuid):
+        return self._call('usages', uuid, USAGES)
+
+
+class SnapshotLoaderTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(SnapshotLoaderTests, self).setUp()
+        self.conf = self.useFixture(config_fixture.Config(aardvark.conf.CONF))
+        self.conf.config(group='placement', snapshot_workers=4,
+                         snapshot_retries=2)
+        patcher = mock.patch.object(snapshot.client, 'PlacementClient')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(snapshot.time, 'sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _loader(self, placement):
+        loader = snapshot.SnapshotLoader()
+        loader.client = placement
+        return loader
+
+    def test_concurrent_load(self):
+        placement = FakePlacement()
+        uuids = ['rp%d' % i for i in range(8)]
+
+        loaded = self._loader(placement).load(uuids)
+
+        self.assertEqual(set(uuids), set(loaded))
+        self.assertEqual(16, len(placement.calls))
+        self.assertGreater(placement.max_active, 1)
+        self.assertLessEqual(placement.max_active, 4)
+        self.assertEqual(8, loaded['rp0'].total.VCPU)
+        self.assertEqual(2, loaded['rp0'].used.VCPU)
+
+    def test_retried_with_backoff(self):
+        unavailable = keystone_exc.ServiceUnavailable()
+        placement = FakePlacement(
+            {('usages', 'rp1'): [unavailable, unavailable]})
+        loader = self._loader(placement)
+
+        loaded = loader.load(['rp0', 'rp1'])
+
+        self.assertEqual({'rp0', 'rp1'}, set(loaded))
+        self.assertEqual(2, loader.retried)
+        self.assertEqual(0, loader.failed)
+        self.assertEqual([mock.call(snapshot.RETRY_BACKOFF),
+                          mock.call(snapshot.RETRY_BACKOFF * 2)],
+                         self.sleep.call_args_list)
+
+    def test_retries_exhausted(self):
+        placement = FakePlacement(
+            {('inventories', 'rp1'): [keystone_exc.GatewayTimeout()] * 3})
+        loader = self._loader(placement)
+
+        loaded = loader.load(['rp0', 'rp1'])
+
+        self.assertEqual({'rp0'}, set(loaded))
+        self.assertEqual(2, loader.retried)
+        self.assertEqual(1, loader.failed)
+
+    def test_not_retriable(self):
+        placement = FakePlacement(
+            {('usages', 'rp1'): [keystone_exc.NotFound()]})
+        loader = self._loader(placement)
+
+        loaded = loader.load(['rp0', 'rp1'])
+
+        self.assertEqual({'rp0'}, set(loaded))
+        self.assertEqual(0, loader.retried)
+        self.assertEqual(1, loader.failed)
+        self.sleep.assert_not_called()
+
+    def test_counters_reset_per_load(self):
+        placement = FakePlacement(
+            {('usages', 'rp1'): [keystone_exc.NotFound()]})
+        loader = self._loader(placement)
+        loader.load(['rp0', 'rp1'])
+
+        loader.load(['rp0', 'rp1'])
+
+        self.assertEqual(0, loader.failed)
+        self.assertEqual(0, loader.retried)
@@ -0,0 +1,92 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+import aardvark.conf
+from aardvark.db import api
+from aardvark.db import models
+from aardvark.db import resource_provider
+
+
+CONF = aardvark.conf.CONF
+
+
+class ResourceProviderListTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(ResourceProviderListTests, self).setUp()
+        conf = self.useFixture(config_fixture.Config(CONF))
+        conf.config(connection='sqlite://', group='placement')
+        self.addCleanup(api.reset)
+
+        engine = api.get_engine()
+        models.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(models.resource_providers.insert(), [
+                {'id': 1, 'uuid': 'rp1', 'name': 'host1'},
+                {'id': 2, 'uuid': 'rp2', 'name': 'host2'},
+            ])
+            conn.execute(models.placement_aggregates.insert(), [
+                {'id': 1, 'uuid': 'agg1'},
+            ])
+            conn.execute(models.resource_provider_aggregates.insert(), [
+                {'resource_provider_id': 2, 'aggregate_id': 1},
+            ])
+            conn.execute(models.resource_classes.insert(), [
+                {'id': 10000, 'name': 'CUSTOM_GPU'},
+            ])
+            inventory = {'reserved': 0, 'min_unit': 1, 'max_unit': 16,
+                         'step_size': 1, 'allocation_ratio': 1.0}
+            conn.execute(models.inventories.insert(), [
+                dict(inventory, resource_provider_id=1, resource_class_id=0,
+                     total=16, allocation_ratio=2.0),
+                dict(inventory, resource_provider_id=1, resource_class_id=1,
+                     total=32768, reserved=512),
+                dict(inventory, resource_provider_id=2, resource_class_id=0,
+                     total=8),
+                dict(inventory, resource_provider_id=2,
+                     resource_class_id=10000, total=2),
+            ])
+            conn.execute(models.allocations.insert(), [
+                {'resource_provider_id': 1, 'consumer_id': 's1',
+                 'resource_class_id': 0, 'used': 2},
+                {'resource_provider_id': 1, 'consumer_id': 's1',
+                 'resource_class_id': 1, 'used': 4096},
+                {'resource_provider_id': 1, 'consumer_id': 's2',
+                 'resource_class_id': 0, 'used': 4},
+            ])
+        self.rp_list = resource_provider.ResourceProviderList()
+
+    def test_resource_providers(self):
+        rps = self.rp_list.resource_providers
+        self.assertEqual(['host1', 'host2'], sorted(rp.name for rp in rps))
+
+        rp_list = resource_provider.ResourceProviderList(['agg1'])
+        rps = rp_list.resource_providers
+        self.assertEqual(['rp2'], [rp.uuid for rp in rps])
+
+    def test_load_capabilities(self):
+        loaded = self.rp_list.load_capabilities(
+            self.rp_list.resource_providers)
+
+        self.assertEqual({'VCPU': 32, 'MEMORY_MB': 32256},
+                         loaded['rp1'].total.to_dict())
+        self.assertEqual({'VCPU': 6, 'MEMORY_MB': 4096},
+                         loaded['rp1'].used.to_dict())
+        self.assertEqual({'VCPU': 8, 'CUSTOM_GPU': 2},
+                         loaded['rp2'].total.to_dict())
+        self.assertEqual({}, loaded['rp2'].used.to_dict())
@@ -0,0 +1,102 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo_messaging.notify import dispatcher
+from oslotest import base
+
+from aardvark.notifications import batch
+
+
+def update_message(uuid, old_state, state):
+    state_update = {'nova_object.data': {'old_state': old_state,
+                                         'state': state}}
+    payload = {'nova_object.data': {'uuid': uuid,
+                                    'state_update': state_update}}
+    return {'ctxt': {}, 'publisher_id': 'nova', 'metadata': {},
+            'event_type': 'instance.update', 'payload': payload}
+
+
+class InstanceBatchEndpointTests(base.BaseTestCase):
+
+    def test_info(self):
+        scheduling = mock.Mock(event_types=['instance.schedule'])
+        state_update = mock.Mock(event_types=['instance.update'])
+        endpoint = batch.InstanceBatchEndpoint(scheduling, state_update)
+
+        endpoint.info([update_message('u1', 'building', 'pending'),
+                       update_message('u2', 'building', 'active'),
+                       update_message('u3', 'building', 'pending')])
+
+        pending = [call[0][0].instance_uuid
+                   for call in state_update.handle_pending.call_args_list]
+        self.assertEqual(['u1', 'u3'], pending)
+        state_update.forget.assert_called_once_with('u2')
+
+    def test_failing_messages(self):
+        scheduling = mock.Mock(event_types=['instance.schedule'])
+        state_update = mock.Mock(event_types=['instance.update'])
+        state_update.handle_pending.side_effect = [Exception('boom'), None]
+        endpoint = batch.InstanceBatchEndpoint(scheduling, state_update)
+        malformed = update_message('u0', 'building', 'active')
+        malformed['payload'] = {}
+
+        endpoint.info([malformed,
+                       update_message('u1', 'building', 'pending'),
+                       update_message('u2', 'building', 'active'),
+                       update_message('u3', 'building', 'pending')])
+
+        pending = [call[0][0].instance_uuid
+                   for call in state_update.handle_pending.call_args_list]
+        self.assertEqual(['u1', 'u3'], pending)
+        state_update.forget.assert_called_once_with('u2')
+
+    def test_schedule_recorded_before_update(self):
+        handled = []
+        scheduling = mock.Mock(event_types=['instance.schedule'])
+        scheduling.error.side_effect = (
+            lambda *args: handled.append('schedule'))
+        state_update = mock.Mock(event_types=['instance.update'])
+        state_update.handle_pending.side_effect = (
+            lambda *args: handled.append('update'))
+        batch_dispatcher = dispatcher.BatchNotificationDispatcher(
+            [batch.InstanceBatchEndpoint(scheduling, state_update)], None)
+
+        def incoming(priority, message):
+            raw = dict(message, priority=priority, message_id=priority)
+            return mock.Mock(ctxt={}, message=raw)
+
+        schedule = {'publisher_id': 'nova',
+                    'event_type': 'instance.schedule', 'payload': {}}
+        batch_dispatcher.dispatch([
+            incoming('info', update_message('u1', 'building', 'pending')),
+            incoming('error', schedule)])
+
+        self.assertEqual(['schedule', 'update'], handled)
+
+
+class BatchEndpointTests(base.BaseTestCase):
+
+    def test_failing_messages(self):
+        requeue = batch.oslo_messaging.NotificationResult.REQUEUE
+        endpoint = mock.Mock()
+        endpoint.info.side_effect = [Exception('boom'), requeue, None]
+        messages = [update_message('u%d' % i, 'building', 'active')
+                    for i in range(3)]
+
+        result = batch.BatchEndpoint(endpoint).info(messages)
+
+        self.assertEqual(requeue, result)
+        self.assertEqual(3, endpoint.info.call_count)
@@ -0,0 +1,78 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+from oslotest import base
+
+from aardvark.notifications import correlation
+from aardvark import utils
+
+
+class CorrelatorTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(CorrelatorTests, self).setUp()
+        self.events = utils.ShardedMap(ttl=60, max_size=100)
+        self.completed = []
+        self.expired = threading.Event()
+
+    def _update(self, correlator, uuid):
+        correlator.update_received(uuid, self.completed.append,
+                                   self.expired.set)
+
+    def test_schedule_first(self):
+        correlator = correlation.Correlator(self.events, 10)
+        correlator.schedule_received('u1', 'event')
+        self._update(correlator, 'u1')
+
+        self.assertEqual(['event'], self.completed)
+        self.assertEqual(1, correlator.stats()['immediate'])
+
+    def test_update_first(self):
+        correlator = correlation.Correlator(self.events, 10)
+        self._update(correlator, 'u1')
+        self.assertEqual([], self.completed)
+
+        correlator.schedule_received('u1', 'event')
+        self.assertEqual(['event'], self.completed)
+        self.assertNotIn('u1', self.events)
+        stats = correlator.stats()
+        self.assertEqual((1, 1, 0), (stats['deferred'], stats['correlated'],
+                                     stats['parked']))
+
+    def test_expired(self):
+        correlator = correlation.Correlator(self.events, 0.05)
+        self._update(correlator, 'u1')
+
+        self.assertTrue(self.expired.wait(5))
+        # The late scheduling event is kept for nothing, it will expire.
+        correlator.schedule_received('u1', 'event')
+        self.assertEqual([], self.completed)
+        self.assertEqual(1, correlator.stats()['expired'])
+
+    def test_cancelled(self):
+        correlator = correlation.Correlator(self.events, 0.05)
+        self._update(correlator, 'u1')
+        correlator.cancel('u1')
+        correlator.cancel('u2')
+
+        # Neither completed, nor expired.
+        self.assertFalse(self.expired.wait(0.2))
+        correlator.schedule_received('u1', 'event')
+        self.assertEqual([], self.completed)
+        stats = correlator.stats()
+        self.assertEqual((0, 1, 0), (stats['parked'], stats['cancelled'],
+                                     stats['expired']))
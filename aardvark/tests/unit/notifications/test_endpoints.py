@@ -0,0 +1,135 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+import aardvark.conf
+from aardvark import exception
+from aardvark.notifications import endpoints
+
+
+FLAVOR = {'vcpus': 2, 'memory_mb': 4096, 'root_gb': 20, 'ephemeral_gb': 0,
+          'swap': 0}
+
+
+class StateUpdateEndpointTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(StateUpdateEndpointTests, self).setUp()
+        for patch in (mock.patch.object(endpoints.nova, 'novaclient'),
+                      mock.patch.object(endpoints.job_manager, 'JobManager'),
+                      mock.patch.object(endpoints, 'correlator')):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.endpoint = endpoints.StateUpdateEndpoint()
+
+    def _event(self, uuid):
+        return mock.Mock(instance_uuid=uuid, old_state='building',
+                         new_state='pending')
+
+    def test_duplicates_dropped(self):
+        correlator = endpoints.correlator.return_value
+
+        self.endpoint.handle_pending(self._event('u1'), {'message_id': 'm1'})
+        # Redelivered message and the same transition from another transport
+        self.endpoint.handle_pending(self._event('u1'), {'message_id': 'm1'})
+        self.endpoint.handle_pending(self._event('u1'), {'message_id': 'm2'})
+        self.endpoint.handle_pending(self._event('u2'), {'message_id': 'm3'})
+
+        handled = [call[0][0]
+                   for call in correlator.update_received.call_args_list]
+        self.assertEqual(['u1', 'u2'], handled)
+        stats = self.endpoint.deduplicator.stats()
+        self.assertEqual((4, 2), (stats['checked'], stats['duplicates']))
+
+    @mock.patch.object(endpoints, 'LOG')
+    def test_stats_logged_per_interval(self, log):
+        conf = self.useFixture(config_fixture.Config(aardvark.conf.CONF))
+        conf.config(group='notification', stats_interval=60)
+        self.endpoint._next_stats = 0
+        self.endpoint.bundled_reqs['r1'] = ['u1']
+
+        self.endpoint.handle_pending(self._event('u1'), {'message_id': 'm1'})
+        self.endpoint.handle_pending(self._event('u2'), {'message_id': 'm2'})
+
+        stats = [call[0] for call in log.info.call_args_list
+                 if call[0][0].startswith('Notification stats')]
+        self.assertEqual(1, len(stats))
+        dedup, pending, bundled, correlator = stats[0][1:5]
+        self.assertEqual(0, dedup['checked'])
+        self.assertIn('evicted', pending)
+        self.assertEqual(1, bundled['size'])
+        self.assertIs(endpoints.correlator.return_value.stats.return_value,
+                      correlator)
+
+    def test_stats_disabled(self):
+        conf = self.useFixture(config_fixture.Config(aardvark.conf.CONF))
+        conf.config(group='notification', stats_interval=0)
+        self.endpoint._next_stats = 0
+
+        with mock.patch.object(endpoints, 'instance_map') as instance_map:
+            self.endpoint.log_stats()
+        instance_map.assert_not_called()
+
+    def test_forget_cancels_parked_update(self):
+        self.endpoint.forget('u1')
+        correlator = endpoints.correlator.return_value
+        correlator.cancel.assert_called_once_with('u1')
+
+    def _handled(self):
+        correlator = endpoints.correlator.return_value
+        return [call[0][0]
+                for call in correlator.update_received.call_args_list]
+
+    def test_pending_again(self):
+        self.endpoint.handle_pending(self._event('u1'), {'message_id': 'm1'})
+        # pending -> building -> pending
+        self.endpoint.forget('u1')
+        self.endpoint.handle_pending(self._event('u1'), {'message_id': 'm2'})
+
+        self.assertEqual(['u1', 'u1'], self._handled())
+
+    def test_message_marked_after_post(self):
+        info = mock.Mock(multiple_instances=False, instance_uuids=['u1'])
+        post_job = self.endpoint.job_manager.post_job
+        post_job.side_effect = exception.ReaperException()
+
+        self.endpoint.trigger_reaper('u1', FLAVOR, 'image', info,
+                                     message_id='m1')
+        self.endpoint.forget('u1')
+        # The redelivered message was not handled, so it is not dropped.
+        self.endpoint.handle_pending(self._event('u1'), {'message_id': 'm1'})
+        self.assertEqual(['u1'], self._handled())
+
+        post_job.side_effect = None
+        self.endpoint.trigger_reaper('u1', FLAVOR, 'image', info,
+                                     message_id='m1')
+        self.endpoint.forget('u1')
+        self.endpoint.handle_pending(self._event('u1'), {'message_id': 'm1'})
+        self.assertEqual(['u1'], self._handled())
+
+
+class ProjectUpdateEndpointTests(base.BaseTestCase):
+
+    @mock.patch.object(endpoints.project_api, 'preemptible_projects_cache')
+    def test_invalidate(self, cache):
+        endpoint = endpoints.ProjectUpdateEndpoint()
+
+        endpoint.info({}, 'keystone', 'identity.project.updated',
+                      {'resource_info': 'p1'}, {})
+
+        cache.return_value.invalidate.assert_called_once_with()
@@ -0,0 +1,140 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslotest import base
+
+from aardvark.objects import capabilities
+from aardvark.objects import cluster_state
+from aardvark.objects import instance
+from aardvark.objects import resources
+
+
+Resources = resources.Resources
+
+FLAVOR = {'vcpus': 2, 'ram': 4096, 'disk': 20, 'ephemeral': 0, 'swap': 0}
+PAYLOAD_FLAVOR = {'vcpus': 2, 'memory_mb': 4096, 'root_gb': 20,
+                  'ephemeral_gb': 0, 'swap': 0, 'name': 'm1.medium'}
+
+
+class ClusterStateTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(ClusterStateTests, self).setUp()
+        self.state = cluster_state.ClusterState()
+        load = mock.patch.object(self.state, '_load',
+                                 side_effect=self._load)
+        load.start()
+        self.addCleanup(load.stop)
+        self.state.reconcile()
+
+    def _load(self, watched_aggregates):
+        providers = {
+            'rp1': ('host1', capabilities.Capabilities(
+                Resources({'VCPU': 2, 'MEMORY_MB': 4096, 'DISK_GB': 20}),
+                Resources({'VCPU': 16, 'MEMORY_MB': 32768,
+                           'DISK_GB': 200}))),
+            'rp2': ('host2', capabilities.Capabilities(
+                Resources(),
+                Resources({'VCPU': 16, 'MEMORY_MB': 32768,
+                           'DISK_GB': 200}))),
+        }
+        servers = [instance.Instance('s1', 's1', FLAVOR, host='host1',
+                                     project_id='preemptible')]
+        return providers, {frozenset(['agg1']): set(['rp2'])}, servers
+
+    def _used(self, name):
+        for rp in self.state.snapshot():
+            if rp.name == name:
+                return rp.used_resources.to_dict()
+
+    def test_snapshot(self):
+        rps = self.state.snapshot(preemptible_projects=['preemptible'])
+        servers = {rp.name: [s.uuid for s in rp.preemptible_servers]
+                   for rp in rps}
+        self.assertEqual({'host1': ['s1'], 'host2': []}, servers)
+
+        rps = self.state.snapshot(['agg1'])
+        self.assertEqual(['host2'], [rp.name for rp in rps])
+
+    def test_snapshot_is_a_copy(self):
+        rp = self.state.snapshot()[0]
+        rp.reserve_resources(Resources(), Resources({'VCPU': 4}))
+        self.assertNotEqual(rp.used_resources,
+                            self.state.snapshot()[0].used_resources)
+
+    def test_deltas(self):
+        self.state.server_created('s2', 'host2', 'other', PAYLOAD_FLAVOR)
+        self.assertEqual({'VCPU': 2, 'MEMORY_MB': 4096, 'DISK_GB': 20},
+                         self._used('host2'))
+
+        # Already accounted for
+        self.state.server_created('s2', 'host2', 'other', PAYLOAD_FLAVOR)
+        self.assertEqual({'VCPU': 2, 'MEMORY_MB': 4096, 'DISK_GB': 20},
+                         self._used('host2'))
+
+        self.state.server_moved('s1', 'host2', PAYLOAD_FLAVOR)
+        self.assertEqual({}, self._used('host1'))
+        self.assertEqual({'VCPU': 4, 'MEMORY_MB': 8192, 'DISK_GB': 40},
+                         self._used('host2'))
+
+        self.state.server_deleted('s1')
+        self.state.server_deleted('s1')
+        self.assertEqual({'VCPU': 2, 'MEMORY_MB': 4096, 'DISK_GB': 20},
+                         self._used('host2'))
+        self.assertEqual(3, self.state.applied)
+        self.assertEqual(2, self.state.ignored)
+
+    def test_deltas_during_reconcile(self):
+        def load(watched_aggregates):
+            # The APIs are queried before the notifications are received.
+            loaded = self._load(watched_aggregates)
+            self.state.server_deleted('s1')
+            self.state.server_created('s2', 'host2', 'other', PAYLOAD_FLAVOR)
+            return loaded
+        self.state._load.side_effect = load
+
+        self.state.reconcile()
+
+        self.assertEqual({}, self._used('host1'))
+        self.assertEqual({'VCPU': 2, 'MEMORY_MB': 4096, 'DISK_GB': 20},
+                         self._used('host2'))
+        rps = self.state.snapshot(preemptible_projects=['preemptible',
+                                                        'other'])
+        self.assertEqual({'host1': [], 'host2': ['s2']},
+                         {rp.name: [s.uuid for s in rp.preemptible_servers]
+                          for rp in rps})
+
+        # Nothing is recorded after the reconciliation.
+        self.state.server_deleted('s2')
+        self.assertIsNone(self.state._recorded)
+
+
+class ClusterStateLoadTests(base.BaseTestCase):
+
+    @mock.patch.object(cluster_state.resource_provider,
+                       'ResourceProviderList')
+    @mock.patch.object(cluster_state.instance, 'InstanceList')
+    def test_load_active_servers(self, instance_list, rp_list):
+        rp_list.return_value.resource_providers = []
+        rp_list.return_value.load_capabilities.return_value = {}
+        server = instance.Instance('s1', 's1', FLAVOR, host='host1')
+        by_host = instance_list.return_value.instances_by_host
+        by_host.return_value = {'host1': [server]}
+
+        _, _, servers = cluster_state.ClusterState()._load([])
+
+        self.assertEqual([server], servers)
+        by_host.assert_called_once_with(all_tenants=True, vm_state='ACTIVE')
@@ -0,0 +1,102 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+import aardvark.conf
+from aardvark.objects import flavor as flavor_obj
+from aardvark.objects import resources
+
+
+FLAVOR = {'vcpus': 2, 'ram': 4096, 'disk': 20, 'ephemeral': 0, 'swap': 0}
+
+
+class FlavorCacheTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(FlavorCacheTests, self).setUp()
+        self.conf = self.useFixture(config_fixture.Config(aardvark.conf.CONF))
+        flavor_list = mock.patch.object(flavor_obj, 'FlavorList')
+        self.flavor = flavor_list.start().return_value.flavor
+        self.addCleanup(flavor_list.stop)
+        self.flavor.return_value = dict(FLAVOR)
+        self.cache = flavor_obj.FlavorCache()
+
+    def test_keyed_by_spec(self):
+        obj = self.cache.resources(dict(FLAVOR, original_name='m1.medium'))
+        same = self.cache.resources(dict(FLAVOR, original_name='medium'))
+        other = self.cache.resources(dict(FLAVOR, swap=512))
+
+        self.assertIs(obj, same)
+        self.assertIsNot(obj, other)
+        self.assertEqual({'VCPU': 2, 'MEMORY_MB': 4096, 'DISK_GB': 20},
+                         obj.to_dict())
+
+    def test_shared_objects_are_frozen(self):
+        obj = self.cache.resources(FLAVOR)
+        total = obj
+        total += resources.Resources({'VCPU': 1})
+
+        self.assertEqual(3, total.VCPU)
+        self.assertEqual(2, self.cache.resources(FLAVOR).VCPU)
+
+    def test_by_id(self):
+        obj = self.cache.resources({'id': 'f1'})
+        self.assertIs(obj, self.cache.resources({'id': 'f1'}))
+        # The flavors resolved by id share the objects keyed by spec.
+        self.assertIs(obj, self.cache.resources(FLAVOR))
+        self.flavor.assert_called_once_with('f1')
+
+    def test_by_id_expires(self):
+        self.conf.config(group='compute', flavor_cache_ttl=0)
+        self.cache.resources({'id': 'f1'})
+        self.cache.resources({'id': 'f1'})
+        self.assertEqual(2, self.flavor.call_count)
+
+    def test_deleted_flavor(self):
+        self.flavor.return_value = None
+
+        obj = self.cache.resources({'id': 'f1'})
+
+        self.assertEqual({}, obj.to_dict())
+        self.cache.resources({'id': 'f1'})
+        self.flavor.assert_called_once_with('f1')
+
+    def test_slow_nova_blocks_only_its_flavor(self):
+        fetching = threading.Event()
+        release = threading.Event()
+
+        def flavor(flavor_id):
+            fetching.set()
+            release.wait(5)
+            return dict(FLAVOR)
+        self.flavor.side_effect = flavor
+
+        thread = threading.Thread(target=self.cache.resources,
+                                  args=({'id': 'f1'},))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        self.assertTrue(fetching.wait(5))
+
+        # Neither the specs, nor the other flavors wait for the request.
+        self.flavor.side_effect = None
+        self.assertEqual(2, self.cache.resources(FLAVOR).VCPU)
+        self.assertEqual(2, self.cache.resources({'id': 'f2'}).VCPU)
+        self.assertTrue(thread.is_alive())
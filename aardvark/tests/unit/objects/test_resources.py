@@ -0,0 +1,134 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from aardvark.objects import resources
+from oslotest import base
+
+
+Resources = resources.Resources
+
+
+class ResourcesTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(ResourcesTests, self).setUp()
+        self.big = Resources({'VCPU': 8, 'MEMORY_MB': 16384, 'DISK_GB': 0})
+        self.small = Resources({'VCPU': 2, 'MEMORY_MB': 4096})
+
+    def test_zero_values_are_dropped(self):
+        self.assertEqual(set(['VCPU', 'MEMORY_MB']), self.big.resources)
+        self.assertEqual({'VCPU': 8, 'MEMORY_MB': 16384}, self.big.to_dict())
+        self.assertEqual(8, self.big.VCPU)
+        self.assertRaises(AttributeError, getattr, self.big, 'DISK_GB')
+        self.assertEqual(0, getattr(self.big, 'DISK_GB', 0))
+
+    def test_arithmetic(self):
+        disk = Resources({'DISK_GB': 10})
+        self.assertEqual({'VCPU': 10, 'MEMORY_MB': 20480},
+                         (self.big + self.small).to_dict())
+        self.assertEqual({'VCPU': 2, 'MEMORY_MB': 4096, 'DISK_GB': 10},
+                         (self.small + disk).to_dict())
+        self.assertEqual({'VCPU': 6, 'MEMORY_MB': 12288},
+                         (self.big - self.small).to_dict())
+        self.assertEqual({}, (self.small - self.small).to_dict())
+        self.assertEqual({'VCPU': -2, 'MEMORY_MB': -4096, 'DISK_GB': 10},
+                         (disk - self.small).to_dict())
+        fractional = Resources({'VCPU': 1.5, 'MEMORY_MB': 2048.7})
+        self.assertEqual({'VCPU': 1, 'MEMORY_MB': 2048},
+                         (fractional - Resources()).to_dict())
+        self.assertEqual({'VCPU': 4, 'MEMORY_MB': 8192},
+                         (self.small * 2).to_dict())
+        self.assertIsNone(self.small * self.small)
+        self.assertEqual({'VCPU': 4, 'MEMORY_MB': 4},
+                         self.big / self.small)
+        self.assertEqual({'VCPU': 4.0, 'MEMORY_MB': 8192.0},
+                         (self.big / 2).to_dict())
+        self.assertRaises(TypeError, lambda: self.big / 'two')
+
+    def test_ratios(self):
+        self.assertEqual(4, Resources.min_ratio(self.big, self.small))
+        self.assertEqual(16384, Resources.max_ratio(
+            self.big, Resources({'VCPU': 1})))
+
+    def test_comparisons_are_not_numbers(self):
+        other = Resources({'VCPU': 16, 'MEMORY_MB': 1024})
+        self.assertFalse(self.big < other)
+        self.assertFalse(self.big > other)
+        self.assertFalse(self.big == other)
+        self.assertTrue(self.big != other)
+        self.assertTrue(self.big >= self.small)
+        self.assertTrue(self.big > self.small)
+        self.assertTrue(self.small <= self.big)
+        self.assertTrue(self.small < self.big)
+        self.assertTrue(self.small == Resources(self.small.to_dict()))
+
+    def test_comparisons_only_check_own_classes(self):
+        # Only the resource classes of the left operand are compared.
+        self.assertTrue(self.small >= Resources({'VCPU': 2, 'DISK_GB': 10}))
+
+    def test_empty_comparisons(self):
+        empty = Resources()
+        self.assertFalse(empty >= self.small)
+        self.assertTrue(empty <= self.small)
+        self.assertTrue(empty > self.small)
+        self.assertTrue(empty < self.small)
+        self.assertTrue(empty == Resources({'VCPU': 0}))
+
+    def test_inplace_accumulation(self):
+        total = Resources()
+        alias = total
+        for _ in range(3):
+            total += self.small
+        self.assertEqual({'VCPU': 6, 'MEMORY_MB': 12288}, total.to_dict())
+        total -= self.small
+        self.assertEqual({'VCPU': 4, 'MEMORY_MB': 8192}, alias.to_dict())
+        self.assertEqual({'VCPU': 2, 'MEMORY_MB': 4096},
+                         self.small.to_dict())
+
+    def test_frozen_objects_are_not_modified_in_place(self):
+        frozen = Resources({'VCPU': 2}).freeze()
+        total = frozen
+        total += self.small
+        self.assertEqual({'VCPU': 4, 'MEMORY_MB': 4096}, total.to_dict())
+        self.assertEqual({'VCPU': 2}, frozen.to_dict())
+
+    def test_new_resource_classes(self):
+        old = Resources({'VCPU': 1})
+        new = Resources({'CUSTOM_RESOURCES_TEST': 1})
+        self.assertEqual({'VCPU': 1, 'CUSTOM_RESOURCES_TEST': 1},
+                         (old + new).to_dict())
+        self.assertTrue(old != new)
+        self.assertEqual(1, new.CUSTOM_RESOURCES_TEST)
+
+    def test_other_operand_is_not_padded(self):
+        frozen = Resources({'VCPU': 2}).freeze()
+        values = frozen._values
+        length = len(values)
+        newer = Resources({'CUSTOM_RESOURCES_PADDING': 1, 'VCPU': 1})
+
+        newer += frozen
+        newer -= frozen
+        self.assertFalse(newer >= frozen)
+        self.assertTrue(frozen <= newer + frozen)
+        self.assertIs(values, frozen._values)
+        self.assertEqual(length, len(frozen._values))
+
+        # The padding of self by an in-place operator keeps the object.
+        older = Resources({'VCPU': 1})
+        alias = older
+        older += newer
+        self.assertIs(alias, older)
+        self.assertEqual({'VCPU': 2, 'CUSTOM_RESOURCES_PADDING': 1},
+                         alias.to_dict())
@@ -0,0 +1,86 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslotest import base
+
+from aardvark.objects import capabilities
+from aardvark.objects import resources
+from aardvark.objects import system
+
+
+class FakeProvider(object):
+
+    def __init__(self, uuid):
+        self.uuid = uuid
+        self.name = uuid
+        self.preemptible_servers = []
+
+    @property
+    def total_resources(self):
+        return self.capabilities.total
+
+    @property
+    def used_resources(self):
+        return self.capabilities.used
+
+    def reinit_object(self):
+        pass
+
+
+def _capabilities():
+    return capabilities.Capabilities(resources.Resources({'VCPU': 1}),
+                                     resources.Resources({'VCPU': 4}))
+
+
+class SystemTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(SystemTests, self).setUp()
+        self.rps = [FakeProvider('rp0'), FakeProvider('rp1')]
+        rp_list = mock.Mock(resource_providers=self.rps)
+        # Only rp0 is loaded, rp1 failed to load.
+        rp_list.load_capabilities.return_value = {'rp0': _capabilities()}
+        for name, obj in (
+                ('resource_provider', mock.Mock(
+                    ResourceProviderList=mock.Mock(return_value=rp_list))),
+                ('project', mock.Mock()),
+                ('instance', mock.Mock())):
+            patcher = mock.patch.object(system, name, obj)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        system.instance.InstanceList.return_value.instances_by_host\
+            .return_value = {}
+        system.project.ProjectList.return_value.preemptible_projects = []
+        self.system = system.System()
+
+    def test_load_capabilities(self):
+        loaded = self.system.load_capabilities()
+
+        self.assertEqual(['rp0'], [rp.uuid for rp in loaded])
+        self.assertEqual(4, loaded[0].capabilities.total.VCPU)
+
+    def test_populate_system_rps_skips_failed(self):
+        self.system.populate_system_rps()
+
+        rps = self.system.resource_providers
+        self.assertEqual(['rp0'], [rp.uuid for rp in rps])
+        self.assertEqual([], rps[0].preemptible_servers)
+
+    def test_system_state_counts_loaded(self):
+        state = self.system.system_state()
+
+        self.assertEqual(4, state.total.VCPU)
+        self.assertEqual(1, state.used.VCPU)
@@ -0,0 +1,182 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import asyncio
+import collections
+
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+from aardvark.api.rest import aio
+import aardvark.conf
+from aardvark import exception
+from aardvark.reaper import async_worker
+from aardvark.reaper import reaper
+
+
+FakeServer = collections.namedtuple('FakeServer', ['uuid', 'name'])
+
+
+class FakeNova(object):
+
+    def __init__(self, missing=(), broken=()):
+        self.missing = set(missing)
+        self.broken = set(broken)
+        self.deleted = []
+        self.rebuilt = []
+        self.reset = []
+
+    async def delete_server(self, uuid):
+        await asyncio.sleep(0)
+        if uuid in self.missing:
+            raise aio.NotFound(uuid)
+        self.deleted.append(uuid)
+
+    async def rebuild_server(self, uuid, image):
+        if uuid in self.broken:
+            raise Exception('Conflict')
+        self.rebuilt.append(uuid)
+
+    async def reset_state(self, uuid):
+        self.reset.append(uuid)
+
+
+class FakePlacement(object):
+
+    def __init__(self, nova):
+        self.nova = nova
+
+    async def get_allocations(self, uuid):
+        if uuid in self.nova.deleted:
+            return {'allocations': {}}
+        return {'allocations': {'rp': {}}}
+
+
+class AsyncReaperTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(AsyncReaperTests, self).setUp()
+        for patch in (mock.patch.object(reaper.nova, 'novaclient'),
+                      mock.patch.object(reaper.placement, 'PlacementClient')):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.reaper = async_worker.AsyncReaper(['agg1'])
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def _run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_release_servers(self):
+        nova = FakeNova()
+        self.reaper.nova_aio = nova
+        self.reaper.placement_aio = FakePlacement(nova)
+        servers = [FakeServer('a', 'a'), FakeServer('b', 'b'),
+                   FakeServer('c', 'c')]
+        freed = []
+        spots = [(servers[:2], lambda: freed.append(1)),
+                 (servers[2:], lambda: freed.append(2))]
+
+        self._run(self.reaper.release_servers_async(servers, spots,
+                                                    mock.Mock()))
+
+        self.assertEqual(['a', 'b', 'c'], sorted(nova.deleted))
+        self.assertEqual([1, 2], sorted(freed))
+        self.assertEqual(3, len(self.reaper.delete_timings))
+
+    def test_release_servers_not_found(self):
+        nova = FakeNova(missing=['b'])
+        self.reaper.nova_aio = nova
+        system = mock.Mock()
+        servers = [FakeServer('a', 'a'), FakeServer('b', 'b')]
+
+        self.assertRaises(
+            exception.RetryException, self._run,
+            self.reaper.release_servers_async(servers, [], system))
+        system.empty_cache.assert_called_once_with()
+
+
+class EvaluateReaperRequestTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(EvaluateReaperRequestTests, self).setUp()
+        for patch in (mock.patch.object(reaper.nova, 'novaclient'),
+                      mock.patch.object(reaper.placement, 'PlacementClient'),
+                      mock.patch.object(async_worker.system_obj,
+                                        'get_system')):
+            patch.start()
+            self.addCleanup(patch.stop)
+        conf = self.useFixture(config_fixture.Config(aardvark.conf.CONF))
+        conf.config(group='reaper', pipelined_rebuild=True)
+        system = async_worker.system_obj.get_system.return_value
+        system.preemptible_projects = []
+        self.reaper = async_worker.AsyncReaper(['agg1'])
+        self.reaper.nova_aio = self.nova = FakeNova()
+        self.request = mock.Mock(aggregates=['agg1'], uuids=['u1', 'u2'],
+                                 image='image', project_id='p1')
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def _evaluate(self, free_resources):
+        async def evaluate():
+            with mock.patch.object(self.reaper, 'free_resources_async',
+                                   side_effect=free_resources):
+                await self.reaper.evaluate_reaper_request_async(self.request)
+            await asyncio.gather(*self.reaper._rebuilds)
+        self.loop.run_until_complete(evaluate())
+
+    def test_rebuild(self):
+        async def free_resources(request, system, slots, on_spot_freed):
+            on_spot_freed()
+
+        self._evaluate(free_resources)
+
+        self.assertEqual(['u1', 'u2'], sorted(self.nova.rebuilt))
+        self.assertEqual([], self.nova.reset)
+
+    def test_reset_on_failure(self):
+        async def free_resources(request, system, slots, on_spot_freed):
+            # Only one of the two spots was freed up.
+            on_spot_freed()
+            raise exception.NotEnoughResources()
+
+        self._evaluate(free_resources)
+
+        self.assertEqual(['u1'], self.nova.rebuilt)
+        self.assertEqual(['u2'], self.nova.reset)
+
+    def test_reset_failed_rebuild(self):
+        self.nova.broken.add('u2')
+
+        async def free_resources(request, system, slots, on_spot_freed):
+            pass
+
+        self._evaluate(free_resources)
+
+        self.assertEqual(['u1'], self.nova.rebuilt)
+        self.assertEqual(['u2'], self.nova.reset)
+
+    def test_preemptible_request(self):
+        project = mock.Mock(id_='p1')
+        system = async_worker.system_obj.get_system.return_value
+        system.preemptible_projects = [project]
+        free_resources = mock.Mock()
+
+        self._evaluate(free_resources)
+
+        free_resources.assert_not_called()
+        self.assertEqual([], self.nova.rebuilt)
+        self.assertEqual(['u1', 'u2'], sorted(self.nova.reset))
@@ -0,0 +1,97 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import random
+
+from oslo_config import fixture as config_fixture
+from oslotest import base
+import testtools
+
+import aardvark.conf
+from aardvark.objects import resources
+from aardvark.reaper.drivers import chance_driver
+
+
+Resources = resources.Resources
+
+
+class FakeServer(object):
+
+    def __init__(self, uuid, resources):
+        self.uuid = uuid
+        self.resources = Resources(resources)
+
+
+class FakeHost(object):
+
+    def __init__(self, uuid, free, servers):
+        self.uuid = uuid
+        self.free_resources = Resources(free)
+        self.reserved_resources = Resources()
+        self.preemptible_servers = servers
+
+    @property
+    def preemptible_resources(self):
+        preempt = Resources()
+        for server in self.preemptible_servers:
+            preempt += server.resources
+        return preempt
+
+    def reserve_resources(self, resources, requested):
+        self.free_resources += resources
+        self.free_resources -= requested
+        self.reserved_resources += requested
+
+
+SMALL = {'VCPU': 1, 'MEMORY_MB': 2048}
+MEDIUM = {'VCPU': 2, 'MEMORY_MB': 4096}
+LARGE = {'VCPU': 4, 'MEMORY_MB': 8192}
+
+
+def hosts():
+    flavors = [SMALL, MEDIUM, LARGE]
+    return [FakeHost('host%d' % h, {'VCPU': h % 3},
+                     [FakeServer('host%d-%d' % (h, i), flavors[(h + i) % 3])
+                      for i in range(1 + h % 4)])
+            for h in range(12)]
+
+
+class ChanceDriverTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(ChanceDriverTests, self).setUp()
+        self.conf = self.useFixture(config_fixture.Config(aardvark.conf.CONF))
+        self.conf.config(group='reaper', alternatives=2)
+
+    def _select(self, vectorized, seed):
+        self.conf.config(group='reaper',
+                         vectorized_host_selection=vectorized)
+        driver = chance_driver.ChanceDriver()
+        random.seed(seed)
+        selected, culled = driver.get_preemptible_servers(
+            Resources(LARGE), hosts(), 3)
+        return ([host.uuid for host in selected],
+                [server.uuid for server in culled])
+
+    def test_pure_python_selection(self):
+        selected, culled = self._select(False, 42)
+        self.assertEqual(len(selected), len(set(selected)))
+        self.assertTrue(culled)
+
+    @testtools.skipIf(chance_driver.np is None, 'NumPy is not installed')
+    def test_vectorized_selection_matches(self):
+        for seed in range(10):
+            self.assertEqual(self._select(False, seed),
+                             self._select(True, seed))
@@ -0,0 +1,120 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+import mock
+from oslotest import base
+from taskflow import exceptions as excp
+from taskflow.jobs import base as jobs_base
+from taskflow.types import notifier
+
+from aardvark import exception
+from aardvark.reaper import job_board
+from aardvark.reaper import job_manager
+from aardvark import utils
+
+
+class BoardConnectionTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(BoardConnectionTests, self).setUp()
+        fetch = mock.patch('taskflow.jobs.backends.fetch')
+        self.fetch = fetch.start()
+        self.addCleanup(fetch.stop)
+        self.connection = job_board.BoardConnection(
+            conf={'board': 'zookeeper'})
+
+    def test_connection_is_reused(self):
+        self.connection.post([{'job': 1}])
+        self.connection.post([{'job': 2}, {'job': 3}])
+
+        self.assertEqual(1, self.fetch.call_count)
+        board = self.fetch.return_value
+        self.assertEqual(1, board.connect.call_count)
+        self.assertEqual(3, board.post.call_count)
+
+    def test_reconnect(self):
+        broken = mock.Mock()
+        broken.post.side_effect = [mock.sentinel.job1,
+                                   excp.JobFailure('connection lost')]
+        healthy = mock.Mock()
+        healthy.post.return_value = mock.sentinel.job2
+        self.fetch.side_effect = [broken, healthy]
+
+        posted = self.connection.post([{'job': 1}, {'job': 2}])
+
+        self.assertEqual([mock.sentinel.job1, mock.sentinel.job2], posted)
+        broken.close.assert_called_once_with()
+        healthy.post.assert_called_once_with(
+            job_board.JOB_NAME, book=None, details={'job': 2})
+
+    def test_reconnect_once(self):
+        self.fetch.return_value.post.side_effect = excp.JobFailure('down')
+
+        self.assertRaises(excp.JobFailure, self.connection.post,
+                          [{'job': 1}])
+        self.assertEqual(2, self.fetch.call_count)
+
+
+class JobWaiterTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(JobWaiterTests, self).setUp()
+        self.board = mock.Mock(notifier=notifier.Notifier())
+        self.waiter = job_board.JobWaiter(conf={'board': 'zookeeper'})
+        self.waiter.watch(self.board)
+
+    def test_wait_for_posted_job(self):
+        self.waiter.reset()
+        timer = threading.Timer(0.01, self.board.notifier.notify,
+                                args=(jobs_base.POSTED, {}))
+        timer.start()
+        self.addCleanup(timer.join)
+
+        self.assertTrue(self.waiter.wait(timeout=5))
+
+    def test_wait_timeout(self):
+        self.waiter.reset()
+        self.assertFalse(self.waiter.wait(timeout=0.01))
+
+    def test_close(self):
+        self.waiter.close()
+        self.board.notifier.notify(jobs_base.POSTED, {})
+        self.assertFalse(self.waiter.wait(timeout=0.01))
+
+
+class JobManagerTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(JobManagerTests, self).setUp()
+        index = utils.AggregateIndex([['agg1', 'agg2'], ['agg3']])
+        aggregates = mock.patch('aardvark.utils.aggregate_registry')
+        aggregates.start().return_value.index.return_value = index
+        self.addCleanup(aggregates.stop)
+        self.manager = job_manager.JobManager()
+
+    def test_route(self):
+        shard = job_board.shard_id(['agg2', 'agg1'])
+        self.assertEqual(shard, self.manager.route(['agg1', 'agg2']))
+        self.assertEqual(shard, self.manager.route(['agg2']))
+        self.assertNotEqual(shard, self.manager.route(['agg3']))
+        self.assertIsNone(self.manager.route([]))
+
+    def test_route_unwatched(self):
+        self.assertRaises(exception.UnwatchedAggregate,
+                          self.manager.route, ['agg4'])
+        self.assertRaises(exception.UnwatchedAggregate,
+                          self.manager.route, ['agg1', 'agg3'])
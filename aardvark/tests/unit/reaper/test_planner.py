@@ -0,0 +1,76 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import pickle
+
+import mock
+from oslotest import base
+
+from aardvark.objects import resources
+from aardvark.reaper.drivers import strict_driver
+from aardvark.reaper import planner
+
+
+Resources = resources.Resources
+
+SMALL = Resources({'VCPU': 1, 'MEMORY_MB': 2048})
+MEDIUM = Resources({'VCPU': 2, 'MEMORY_MB': 4096})
+
+
+def make_host(uuid, free, servers):
+    total = Resources({'VCPU': 8, 'MEMORY_MB': 16384})
+    return planner.PlanningHost(uuid, uuid, total - free, total, Resources(),
+                                servers)
+
+
+class PlannerTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(PlannerTests, self).setUp()
+        self.hosts = [
+            make_host('host1', Resources(), [
+                planner.PlanningServer('s1', MEDIUM),
+                planner.PlanningServer('s2', SMALL),
+                planner.PlanningServer('s3', MEDIUM)]),
+            make_host('host2', SMALL, []),
+        ]
+
+    def test_pack(self):
+        flavors, rows = pickle.loads(pickle.dumps(planner.pack(self.hosts)))
+
+        self.assertEqual(2, len(flavors))
+        hosts = planner.unpack((flavors, rows))
+        self.assertEqual(['host1', 'host2'], [h.uuid for h in hosts])
+        self.assertEqual(self.hosts[0].used_resources,
+                         hosts[0].used_resources)
+        self.assertEqual(['s1', 's2', 's3'],
+                         [s.uuid for s in hosts[0].preemptible_servers])
+        self.assertEqual(MEDIUM, hosts[0].preemptible_servers[2].resources)
+
+    @mock.patch.object(planner, 'load_driver')
+    def test_plan(self, load_driver):
+        load_driver.return_value = strict_driver.StrictDriver()
+
+        host_uuids, server_uuids, spots, changes = planner._plan(
+            {}, 'strict_driver', False, planner.pack(self.hosts),
+            MEDIUM.to_dict(), 1)
+
+        self.assertEqual(['host1'], host_uuids)
+        self.assertEqual([['s1']], spots)
+        self.assertEqual(1, len(changes))
+        uuid, used, reserved, remaining = changes[0]
+        self.assertEqual('host1', uuid)
+        self.assertEqual(MEDIUM.to_dict(), reserved)
+        self.assertEqual(['s2', 's3'], sorted(remaining))
@@ -0,0 +1,196 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+import mock
+from novaclient import exceptions as n_exc
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+import aardvark.conf
+from aardvark import exception
+from aardvark.objects import capabilities
+from aardvark.objects import instance
+from aardvark.objects import resource_provider
+from aardvark.objects import resources
+from aardvark.reaper.drivers import chance_driver
+from aardvark.reaper import reaper
+
+
+FLAVOR = {'vcpus': 2, 'ram': 4096, 'disk': 20, 'ephemeral': 0, 'swap': 0}
+
+
+class RebuildPipelineTests(base.BaseTestCase):
+
+    def test_failed_rebuilds_reset(self):
+        fake_reaper = mock.Mock()
+
+        def rebuild(uuid, image):
+            if uuid == 'u2':
+                raise Exception('Conflict')
+        fake_reaper._rebuild_instance.side_effect = rebuild
+
+        pipeline = reaper.RebuildPipeline(fake_reaper, ['u1', 'u2', 'u3'],
+                                          'image')
+        pipeline.spot_freed()
+        pipeline.rebuild_pending()
+        pipeline.wait()
+
+        self.assertEqual(3, fake_reaper._rebuild_instance.call_count)
+        fake_reaper._reset_instances.assert_called_once_with(['u2'])
+
+
+class FreeResourcesForRequestsTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(FreeResourcesForRequestsTests, self).setUp()
+        for patch in (mock.patch.object(reaper.nova, 'novaclient'),
+                      mock.patch.object(reaper.placement, 'PlacementClient')):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.reaper = reaper.Reaper(['agg1'])
+        driver = mock.patch.object(
+            self.reaper, '_load_configured_driver',
+            side_effect=lambda watermark_mode: chance_driver.ChanceDriver(
+                watermark_mode))
+        driver.start()
+        self.addCleanup(driver.stop)
+        release = mock.patch.object(self.reaper, 'release_servers')
+        self.release_servers = release.start()
+        self.addCleanup(release.stop)
+
+    def test_failed_request_is_rolled_back(self):
+        # A full host with two preemptible servers, enough for two spots.
+        host = resource_provider.ResourceProvider('rp1', 'host1')
+        total = resources.Resources(
+            {'VCPU': 4, 'MEMORY_MB': 8192, 'DISK_GB': 40})
+        host.capabilities = capabilities.Capabilities(total.copy(), total)
+        host.preemptible_servers = [instance.Instance('s1', 's1', FLAVOR),
+                                    instance.Instance('s2', 's2', FLAVOR)]
+        system = mock.Mock(resource_providers=[host])
+        requested = instance.Instance('r', 'r', FLAVOR).resources
+        # The first request reserves both spots before failing on its third.
+        first = (mock.Mock(resources=requested, uuids=['a1', 'a2', 'a3']),
+                 mock.Mock())
+        second = (mock.Mock(resources=requested, uuids=['b1', 'b2']),
+                  mock.Mock())
+
+        failed = self.reaper.free_resources_for_requests([first, second],
+                                                         system)
+
+        self.assertEqual([first], failed)
+        servers, spots, _ = self.release_servers.call_args[0]
+        self.assertEqual(['s1', 's2'], sorted(s.uuid for s in servers))
+        self.assertEqual(2, len(spots))
+        self.assertEqual([], host.preemptible_servers)
+        self.assertEqual(total, host.used_resources)
+
+
+class FakeServers(object):
+
+    def __init__(self, errors=None):
+        # Maps the uuid of a server to the exception its deletion raises.
+        self.errors = errors or {}
+        self.deleted = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def delete(self, uuid):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            # Give the other workers the chance to overlap with this one.
+            threading.Event().wait(0.01)
+            if uuid in self.errors:
+                raise self.errors[uuid]
+            with self._lock:
+                self.deleted.append(uuid)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class DeleteServersTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(DeleteServersTests, self).setUp()
+        self.conf = self.useFixture(config_fixture.Config(aardvark.conf.CONF))
+        self.conf.config(group='reaper', delete_workers=3)
+        for patch in (mock.patch.object(reaper.nova, 'novaclient'),
+                      mock.patch.object(reaper.placement, 'PlacementClient')):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.reaper = reaper.Reaper(['agg1'])
+        wait = mock.patch.object(self.reaper,
+                                 'wait_until_allocations_are_deleted')
+        self.wait = wait.start()
+        self.addCleanup(wait.stop)
+        self.servers = [instance.Instance('s%d' % i, 's%d' % i, FLAVOR)
+                        for i in range(6)]
+
+    def _nova(self, errors=None):
+        servers = FakeServers(errors)
+        self.reaper.novaclient = mock.Mock(servers=servers)
+        return servers
+
+    def test_concurrent_deletion(self):
+        nova = self._nova()
+
+        not_deleted = self.reaper.delete_servers(self.servers)
+
+        self.assertEqual([], not_deleted)
+        self.assertEqual(6, len(nova.deleted))
+        self.assertGreater(nova.max_active, 1)
+        self.assertLessEqual(nova.max_active, 3)
+        self.assertEqual(set(s.uuid for s in self.servers),
+                         set(self.reaper.delete_timings))
+
+    def test_failed_deletions_collected(self):
+        self._nova({'s1': n_exc.NotFound(404), 's2': Exception('Conflict')})
+
+        not_deleted = self.reaper.delete_servers(self.servers)
+
+        self.assertEqual(['s1', 's2'], [s.uuid for s in not_deleted])
+        self.assertEqual({'s0', 's3', 's4', 's5'},
+                         set(self.reaper.delete_timings))
+
+    def test_no_servers(self):
+        self.reaper.delete_timings = {'old': 1.0}
+
+        self.assertEqual([], self.reaper.delete_servers([]))
+        self.assertEqual({}, self.reaper.delete_timings)
+
+    def test_release_not_found_retries(self):
+        self._nova({'s1': n_exc.NotFound(404), 's4': Exception('Conflict')})
+        system = mock.Mock()
+
+        self.assertRaises(exception.RetryException,
+                          self.reaper.release_servers, self.servers, [],
+                          system)
+
+        self.wait.assert_called_once_with(['s0', 's2', 's3', 's5'])
+        system.empty_cache.assert_called_once_with()
+
+    def test_release_waits_for_spots(self):
+        self._nova()
+        system = mock.Mock()
+
+        self.reaper.release_servers(self.servers, [], system)
+
+        self.wait.assert_called_once_with([s.uuid for s in self.servers])
+        system.empty_cache.assert_not_called()
@@ -0,0 +1,90 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+import aardvark.conf
+from aardvark.reaper import reaper
+from aardvark.reaper import release_tracker
+
+
+class ReleaseTrackerTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(ReleaseTrackerTests, self).setUp()
+        self.tracker = release_tracker.ReleaseTracker()
+
+    def test_release_wakes_up_waiter(self):
+        self.tracker.watch(['u1'])
+        timer = threading.Timer(0.05, self.tracker.release, ('u1',))
+        timer.start()
+
+        start = time.time()
+        self.tracker.wait(['u1'], 5)
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(set(['u1']), self.tracker.released(['u1', 'u2']))
+
+    def test_unwatched_not_released(self):
+        self.tracker.release('u1')
+        self.assertEqual(set(), self.tracker.released(['u1']))
+
+    def test_shared_watch(self):
+        # Two workers watch the same server, one of them gives up.
+        self.tracker.watch(['u1'])
+        self.tracker.watch(['u1'])
+        self.tracker.unwatch(['u1'])
+
+        self.tracker.release('u1')
+        self.assertEqual(set(['u1']), self.tracker.released(['u1']))
+
+        self.tracker.unwatch(['u1'])
+        self.assertEqual(set(), self.tracker.released(['u1']))
+
+
+class ReleasedAllocationsTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(ReleasedAllocationsTests, self).setUp()
+        for patch in (mock.patch.object(reaper.nova, 'novaclient'),
+                      mock.patch.object(reaper.placement, 'PlacementClient'),
+                      mock.patch.object(release_tracker, 'tracker',
+                                        release_tracker.ReleaseTracker())):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.reaper = reaper.Reaper(['agg1'])
+        # Placement keeps reporting the allocations of all the servers.
+        self.reaper.placement.get_allocations.return_value = {
+            'allocations': {'rp': {}}}
+
+    def test_notified_release(self):
+        conf = self.useFixture(config_fixture.Config(aardvark.conf.CONF))
+        conf.config(group='reaper', allocation_poll_interval=10)
+        timer = threading.Timer(0.05, release_tracker.tracker.release,
+                                ('u1',))
+        timer.start()
+
+        start = time.time()
+        released = list(self.reaper.released_allocations(['u1'], timeout=20))
+
+        self.assertEqual(['u1'], released)
+        self.assertLess(time.time() - start, 5)
+        # Nothing is left watched after the wait.
+        release_tracker.tracker.release('u1')
+        self.assertEqual(set(), release_tracker.tracker.released(['u1']))
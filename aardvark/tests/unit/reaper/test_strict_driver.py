@@ -0,0 +1,156 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import itertools
+
+from oslotest import base
+
+from aardvark import exception
+from aardvark.objects import resources
+from aardvark.reaper.drivers import strict_driver
+
+
+Resources = resources.Resources
+
+
+class FakeServer(object):
+
+    def __init__(self, uuid, resources):
+        self.uuid = uuid
+        self.resources = Resources(resources)
+
+
+class FakeHost(object):
+
+    def __init__(self, name, free, servers):
+        self.name = name
+        self.free_resources = Resources(free)
+        self.reserved_resources = Resources()
+        self.preemptible_servers = servers
+
+    def reserve_resources(self, resources, requested):
+        self.free_resources += resources
+        self.free_resources -= requested
+        self.reserved_resources += requested
+
+
+def servers(prefix, *flavors):
+    return [FakeServer('%s-%d' % (prefix, i), flavor)
+            for i, flavor in enumerate(flavors)]
+
+
+SMALL = {'VCPU': 1, 'MEMORY_MB': 2048}
+MEDIUM = {'VCPU': 2, 'MEMORY_MB': 4096}
+LARGE = {'VCPU': 4, 'MEMORY_MB': 8192}
+
+
+class StrictDriverTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(StrictDriverTests, self).setUp()
+        self.driver = strict_driver.StrictDriver()
+
+    def test_best_combination_is_the_smallest(self):
+        host = FakeHost('host1', {'VCPU': 1, 'MEMORY_MB': 2048},
+                        servers('host1', LARGE, MEDIUM, SMALL, SMALL))
+        requested = Resources(LARGE)
+
+        found, culled = self.driver.find_matching_server_combinations(
+            [host], requested)
+
+        # The medium and a small server are enough, no need to cull the
+        # large one.
+        self.assertEqual(host, found)
+        self.assertEqual(['host1-1', 'host1-2'],
+                         sorted(s.uuid for s in culled))
+
+    def test_free_resources_are_enough(self):
+        host1 = FakeHost('host1', {}, servers('host1', MEDIUM))
+        host2 = FakeHost('host2', LARGE, servers('host2', SMALL))
+
+        found, culled = self.driver.find_matching_server_combinations(
+            [host1, host2], Resources(MEDIUM))
+
+        self.assertEqual(host2, found)
+        self.assertEqual([], culled)
+
+    def test_identical_servers(self):
+        host = FakeHost('host1', {}, servers('host1', *[MEDIUM] * 32))
+
+        found, culled = self.driver.find_matching_server_combinations(
+            [host], Resources({'VCPU': 33, 'MEMORY_MB': 2048}))
+
+        self.assertEqual(17, len(culled))
+        self.assertEqual(17, len(set(s.uuid for s in culled)))
+
+    def test_matches_exhaustive_search(self):
+        flavors = [SMALL, MEDIUM, LARGE, {'VCPU': 8, 'MEMORY_MB': 4096}]
+        hosts = [
+            FakeHost('host%d' % h, {'VCPU': h},
+                     servers('host%d' % h, *[flavors[(h + i) % 4]
+                                            for i in range(2 + h)]))
+            for h in range(5)]
+        requested = Resources({'VCPU': 7, 'MEMORY_MB': 10240})
+
+        def key(combo):
+            total = Resources()
+            for server in combo:
+                total += server.resources
+            return tuple(total.to_dict().get(rc, 0)
+                         for rc in strict_driver.ORDERING)
+
+        expected = None
+        for host in hosts:
+            for size in range(len(host.preemptible_servers) + 1):
+                for combo in itertools.combinations(
+                        host.preemptible_servers, size):
+                    potential = host.free_resources
+                    for server in combo:
+                        potential = potential + server.resources
+                    totals = potential.to_dict()
+                    if totals.get('VCPU', 0) < 7:
+                        continue
+                    if totals.get('MEMORY_MB', 0) < 10240:
+                        continue
+                    if expected is None or key(combo) < expected:
+                        expected = key(combo)
+
+        _, culled = self.driver.find_matching_server_combinations(
+            hosts, requested)
+
+        self.assertEqual(expected, key(culled))
+
+    def test_get_preemptible_servers(self):
+        host = FakeHost('host1', {},
+                        servers('host1', MEDIUM, MEDIUM, SMALL))
+
+        hosts, culled = self.driver.get_preemptible_servers(
+            Resources(MEDIUM), [host], 2)
+
+        self.assertEqual([host], hosts)
+        self.assertEqual(set(['host1-0', 'host1-1']),
+                         set(s.uuid for s in culled))
+        self.assertEqual([['host1-0'], ['host1-1']],
+                         [[s.uuid for s in spot]
+                          for spot in self.driver.spots])
+        self.assertEqual(['host1-2'],
+                         [s.uuid for s in host.preemptible_servers])
+
+    def test_not_enough_resources(self):
+        host = FakeHost('host1', {}, servers('host1', SMALL))
+
+        self.assertRaises(exception.NotEnoughResources,
+                          self.driver.get_preemptible_servers,
+                          Resources(MEDIUM), [host], 1)
@@ -0,0 +1,61 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslotest import base
+
+from aardvark.services import reaper_service
+
+
+def fake_reaper(aggregates):
+    return mock.Mock(aggregates=aggregates)
+
+
+class ReaperWorkerHealthCheckTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(ReaperWorkerHealthCheckTests, self).setUp()
+        for patch in (mock.patch.object(reaper_service, 'create_reaper',
+                                        side_effect=fake_reaper),
+                      mock.patch.object(reaper_service.utils,
+                                        'map_aggregate_names')):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.kept = fake_reaper(['u1', 'u2'])
+        self.dropped = fake_reaper(['u3'])
+        self.instances = [self.kept, self.dropped]
+        self.check = reaper_service.ReaperWorkerHealthCheck(self.instances)
+
+    def test_workers_follow_the_aggregates(self):
+        # The aggregate u3 was recreated as u4.
+        reaper_service.utils.map_aggregate_names.return_value = [
+            ['u2', 'u1'], ['u4']]
+
+        self.check.check_watched_aggregates(None)
+
+        self.assertEqual([['u1', 'u2'], ['u4']],
+                         [instance.aggregates for instance in self.instances])
+        self.assertIs(self.kept, self.instances[0])
+        self.dropped.stop_handling.assert_called_once_with()
+        self.instances[1].worker.start.assert_called_once_with()
+        self.kept.worker.start.assert_not_called()
+
+    def test_no_watched_aggregates(self):
+        reaper_service.utils.map_aggregate_names.return_value = []
+
+        self.check.check_watched_aggregates(None)
+
+        self.assertEqual([[]],
+                         [instance.aggregates for instance in self.instances])
@@ -0,0 +1,199 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+
+import mock
+from oslo_config import fixture as config_fixture
+from oslotest import base
+
+import aardvark.conf
+from aardvark import utils
+
+
+class ShardedMapTests(base.BaseTestCase):
+
+    def test_expired_entries(self):
+        shmap = utils.ShardedMap(ttl=10, max_size=100, shards=4)
+        with mock.patch('time.time', return_value=100):
+            shmap['a'] = 1
+        with mock.patch('time.time', return_value=105):
+            shmap['b'] = 2
+            self.assertEqual(1, shmap['a'])
+        with mock.patch('time.time', return_value=111):
+            self.assertNotIn('a', shmap)
+            self.assertEqual(2, shmap.pop('b'))
+        self.assertEqual({'size': 0, 'expired': 1, 'evicted': 0},
+                         shmap.stats())
+
+    def test_size_cap(self):
+        shmap = utils.ShardedMap(ttl=10, max_size=2, shards=1)
+        for key in 'abc':
+            shmap[key] = key
+        self.assertEqual(2, len(shmap))
+        self.assertNotIn('a', shmap)
+        self.assertEqual(1, shmap.stats()['evicted'])
+
+    def test_update(self):
+        shmap = utils.ShardedMap(ttl=10, max_size=10)
+        for uuid in ('u1', 'u2'):
+            bundled = shmap.update('req', lambda v: (v or []) + [uuid])
+        self.assertEqual(['u1', 'u2'], bundled)
+
+    def test_pop_or_wait(self):
+        shmap = utils.ShardedMap(ttl=10, max_size=10)
+        self.assertIsNone(shmap.pop_or_wait('a', 0))
+
+        timer = threading.Timer(0.05, shmap.__setitem__, ('a', 1))
+        timer.start()
+        self.assertEqual(1, shmap.pop_or_wait('a', 5))
+        self.assertNotIn('a', shmap)
+
+
+class ExpiringCacheTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(ExpiringCacheTests, self).setUp()
+        self.loader = mock.Mock(side_effect=['v1', 'v2', 'v3'])
+
+    def _wait_refreshed(self, cache):
+        deadline = time.time() + 5
+        while True:
+            with cache._lock:
+                if not cache._refreshing:
+                    return
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+
+    def test_no_ttl(self):
+        cache = utils.ExpiringCache(self.loader, 0)
+        self.assertEqual(['v1', 'v2'], [cache.get(), cache.get()])
+
+    def test_stale_while_refreshing(self):
+        cache = utils.ExpiringCache(self.loader, 60)
+        self.assertEqual('v1', cache.get())
+        self.assertEqual('v1', cache.get())
+        self.assertEqual(1, self.loader.call_count)
+
+        cache._expires = 0
+        # The stale value is served while it is refreshed.
+        self.assertEqual('v1', cache.get())
+        self._wait_refreshed(cache)
+        self.assertEqual('v2', cache.get())
+
+    def test_failed_refresh(self):
+        self.loader.side_effect = ['v1', Exception('down'), 'v2']
+        cache = utils.ExpiringCache(self.loader, 60, retry_interval=60)
+        cache.get()
+
+        cache._expires = 0
+        cache.get()
+        self._wait_refreshed(cache)
+        # No new refresh until the retry interval passes.
+        for _ in range(3):
+            self.assertEqual('v1', cache.get())
+        self.assertEqual(2, self.loader.call_count)
+
+        cache.invalidate()
+        self._wait_refreshed(cache)
+        self.assertEqual('v2', cache.get())
+
+    def test_none_is_a_value(self):
+        self.loader.side_effect = ['v1', None]
+        cache = utils.ExpiringCache(self.loader, 60)
+        cache.get()
+
+        cache.invalidate()
+        self._wait_refreshed(cache)
+        self.assertIsNone(cache.get())
+        self.assertEqual(2, self.loader.call_count)
+
+    def test_invalidated_while_loading(self):
+        cache = utils.ExpiringCache(self.loader, 60)
+        cache.get()
+
+        def load():
+            # Another invalidation arrives while loading.
+            self.loader.side_effect = ['v3']
+            cache.invalidate()
+            return 'v2'
+        self.loader.side_effect = load
+        cache.invalidate()
+        self._wait_refreshed(cache)
+        # The value loaded after the last invalidation is kept.
+        deadline = time.time() + 5
+        while cache.get() != 'v3':
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+
+
+def aggregate(name, uuid):
+    agg = mock.Mock(uuid=uuid)
+    agg.name = name
+    return agg
+
+
+class AggregateRegistryTests(base.BaseTestCase):
+
+    def setUp(self):
+        super(AggregateRegistryTests, self).setUp()
+        conf = self.useFixture(config_fixture.Config(aardvark.conf.CONF))
+        conf.config(group='reaper', watched_aggregates=['agg1|agg2', 'agg3'])
+        novaclient = mock.patch.object(utils.nova, 'novaclient')
+        self.aggregates = novaclient.start().return_value.aggregates
+        self.addCleanup(novaclient.stop)
+        self.aggregates.list.return_value = [
+            aggregate('agg1', 'u1'), aggregate('agg2', 'u2'),
+            aggregate('agg3', 'u3')]
+        self.registry = utils.AggregateRegistry()
+
+    def _wait_for(self, watched):
+        deadline = time.time() + 5
+        while self.registry.watched() != watched:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+
+    def test_loaded_once(self):
+        self.assertEqual([['u1', 'u2'], ['u3']], self.registry.watched())
+        self.assertEqual(['u1', 'u2'],
+                         self.registry.index().group(['u2']))
+        self.assertEqual(1, self.aggregates.list.call_count)
+
+    def test_invalidate(self):
+        self.registry.watched()
+        # agg3 was recreated
+        self.aggregates.list.return_value = [
+            aggregate('agg1', 'u1'), aggregate('agg2', 'u2'),
+            aggregate('agg3', 'u4')]
+
+        self.registry.invalidate()
+
+        self._wait_for([['u1', 'u2'], ['u4']])
+        self.assertEqual(2, self.aggregates.list.call_count)
+
+    def test_failed_refresh_serves_stale(self):
+        self.registry.watched()
+        self.aggregates.list.side_effect = Exception('Nova is down')
+
+        self.registry.invalidate()
+
+        self.assertEqual([['u1', 'u2'], ['u3']], self.registry.watched())
+        self.aggregates.list.side_effect = None
+        self.aggregates.list.return_value = [aggregate('agg1', 'u1'),
+                                             aggregate('agg2', 'u5'),
+                                             aggregate('agg3', 'u3')]
+        self.registry.invalidate()
+        self._wait_for([['u1', 'u5'], ['u3']])
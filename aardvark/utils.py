@@ -13,8 +13,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 from functools import wraps
-from oslo_concurrency import lockutils
+import threading
+import time
+
 from oslo_log import log
 
 from aardvark.api.rest import nova
@@ -44,6 +47,15 @@ def watermark_enabled(fn):
     return wrapper
 
 
+def state_model_enabled(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if CONF.aardvark.enable_state_model:
+            return fn(*args, **kwargs)
+        return None
+    return wrapper
+
+
 def retries(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
@@ -57,30 +69,280 @@ def retries(fn):
     return wrapper
 
 
-class SafeDict(dict):
-    """Provides a threadsafe dictionary by locking the methods needed"""
+_MISSING = object()
+
+
+class ShardedMap(object):
+    """Provides a threadsafe map with entries that expire
+
+    The keys are spread over shards with a lock each, so that concurrent
+    threads rarely wait for each other. Every entry is evicted ttl seconds
+    after it was set and, when a shard is full, the oldest entries of the
+    shard are evicted first.
+    """
 
-    @lockutils.synchronized('reaper_lock')
-    def __setitem__(self, key, item):
-        super(SafeDict, self).__setitem__(key, item)
+    def __init__(self, ttl, max_size, shards=16):
+        self.ttl = ttl
+        self._shards = [_MapShard() for _ in range(shards)]
+        self._shard_size = max(1, max_size // shards)
+
+    def _shard(self, key):
+        shard = self._shards[hash(key) % len(self._shards)]
+        shard.expire(time.time())
+        return shard
+
+    def __setitem__(self, key, value):
+        shard = self._shard(key)
+        with shard.cond:
+            shard.put(key, value, time.time() + self.ttl, self._shard_size)
 
-    @lockutils.synchronized('reaper_lock')
     def __getitem__(self, key):
-        return super(SafeDict, self).__getitem__(key)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
 
-    @lockutils.synchronized('reaper_lock')
     def __delitem__(self, key):
-        super(SafeDict, self).__delitem__(key)
+        self.pop(key)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return sum(len(shard.entries) for shard in self._shards)
+
+    def get(self, key, default=None):
+        shard = self._shard(key)
+        with shard.cond:
+            return shard.entries.get(key, (0, default))[1]
+
+    def pop(self, key, default=_MISSING):
+        shard = self._shard(key)
+        with shard.cond:
+            if key in shard.entries:
+                return shard.entries.pop(key)[1]
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def pop_or_wait(self, key, timeout, default=None):
+        """Pops the entry of the key, waiting for it to be set if needed
+
+        Returns default if the key is not set within timeout seconds.
+        """
+        deadline = time.time() + timeout
+        shard = self._shard(key)
+        with shard.cond:
+            while key not in shard.entries:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return default
+                shard.cond.wait(remaining)
+            return shard.entries.pop(key)[1]
+
+    def update(self, key, fn):
+        """Atomically replaces the value of the key with fn(value)
+
+        fn is called with None if the key is not set. Returns the new value.
+        """
+        shard = self._shard(key)
+        with shard.cond:
+            value = fn(shard.entries.get(key, (0, None))[1])
+            shard.put(key, value, time.time() + self.ttl, self._shard_size)
+            return value
+
+    def stats(self):
+        """Returns the size of the map and the number of evicted entries"""
+        return {
+            'size': len(self),
+            'expired': sum(shard.expired for shard in self._shards),
+            'evicted': sum(shard.evicted for shard in self._shards),
+        }
+
+
+class _MapShard(object):
+
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        # NOTE(ttsiouts): All the entries have the same ttl, so the order of
+        # insertion is also the order of expiration.
+        self.entries = collections.OrderedDict()
+        self.expired = 0
+        self.evicted = 0
+
+    def put(self, key, value, expires, max_size):
+        self.entries.pop(key, None)
+        self.entries[key] = (expires, value)
+        while len(self.entries) > max_size:
+            evicted, _ = self.entries.popitem(last=False)
+            self.evicted += 1
+            LOG.debug("Evicted %s, the map is full", evicted)
+        self.cond.notify_all()
+
+    def expire(self, now):
+        with self.cond:
+            while self.entries:
+                expires, _ = next(iter(self.entries.values()))
+                if expires > now:
+                    break
+                self.entries.popitem(last=False)
+                self.expired += 1
+
+
+# How long (in seconds) the stale value is served after a failed refresh,
+# before the next refresh is attempted.
+REFRESH_RETRY_INTERVAL = 30
+
+
+class ExpiringCache(object):
+    """Caches the value returned by a loader for a given time
+
+    The first access loads the value synchronously. After the value expires,
+    the stale value keeps being served while a single background thread
+    refreshes it (stale-while-revalidate). If the refresh fails, the stale
+    value is served for retry_interval more seconds.
+    """
+
+    def __init__(self, loader, ttl, retry_interval=REFRESH_RETRY_INTERVAL):
+        self.loader = loader
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+        self._expires = 0
+        self._refreshing = False
+        self._generation = 0
+
+    def get(self):
+        if not self.ttl:
+            return self.loader()
+
+        with self._lock:
+            if not self._loaded:
+                self._store(self.loader())
+            elif self._expires <= time.time():
+                self._start_refresh()
+            return self._value
+
+    def invalidate(self):
+        """Marks the cached value as stale and starts refreshing it"""
+        with self._lock:
+            self._expires = 0
+            self._generation += 1
+            if self._loaded:
+                self._start_refresh()
+
+    def _start_refresh(self):
+        if self._refreshing:
+            return
+        self._refreshing = True
+        thread = threading.Thread(target=self._refresh,
+                                  args=(self._generation,))
+        thread.daemon = True
+        thread.start()
+
+    def _store(self, value):
+        self._value = value
+        self._loaded = True
+        self._expires = time.time() + self.ttl
+
+    def _refresh(self, generation):
+        loaded = False
+        try:
+            value = self.loader()
+            loaded = True
+        except Exception:
+            LOG.exception('Failed to refresh cached value, serving the '
+                          'stale one')
+        with self._lock:
+            if loaded:
+                self._store(value)
+            else:
+                # Do not retry on every access while the loader fails.
+                self._expires = time.time() + self.retry_interval
+            self._refreshing = False
+            if generation != self._generation:
+                # Invalidated while loading, the value may already be stale.
+                self._expires = 0
+                self._start_refresh()
+
+
+class AggregateIndex(object):
+    """Index of the groups of watched aggregates
+
+    Finds the watched group that a set of aggregates belongs to, either as a
+    whole or through each one of its aggregates.
+    """
+
+    def __init__(self, groups):
+        self.groups = groups
+        self._by_set = {}
+        self._by_aggregate = {}
+        for index, group in enumerate(groups):
+            self._by_set[frozenset(group)] = index
+            for aggregate in group:
+                self._by_aggregate[aggregate] = index
+
+    def group(self, aggregates):
+        """Returns the watched group of the aggregates or None"""
+        index = self._by_set.get(frozenset(aggregates))
+        if index is None:
+            indexes = set(self._by_aggregate.get(agg) for agg in aggregates)
+            if len(indexes) != 1 or None in indexes:
+                return None
+            index = indexes.pop()
+        return self.groups[index]
+
+
+class AggregateRegistry(object):
+    """Resolves the names of the watched aggregates to their uuids
+
+    The aggregates are listed from Nova once and the lookups are served from
+    memory. The mapping is refreshed in the background every
+    CONF.aardvark.aggregate_cache_ttl seconds, or as soon as an aggregate
+    notification is received.
+    """
+
+    def __init__(self):
+        self._cache = ExpiringCache(self._load,
+                                    CONF.aardvark.aggregate_cache_ttl)
+
+    def _load(self):
+        novaclient = nova.novaclient()
+        aggregate_map = {
+            agg.name: agg.uuid for agg in novaclient.aggregates.list()
+        }
+        uuids = []
+        for aggregates in CONF.reaper.watched_aggregates:
+            aggregates = aggregates.split('|')
+            uuids.append([aggregate_map[agg.strip()] for agg in aggregates])
+        return AggregateIndex(uuids)
+
+    def index(self):
+        return self._cache.get()
+
+    def watched(self):
+        """Returns the uuids of each group of watched aggregates"""
+        return [list(group) for group in self.index().groups]
+
+    def invalidate(self):
+        self._cache.invalidate()
+
+
+_aggregate_registry = None
+_registry_lock = threading.Lock()
+
+
+def aggregate_registry():
+    """Returns the process wide registry of the watched aggregates"""
+    global _aggregate_registry
+    with _registry_lock:
+        if _aggregate_registry is None:
+            _aggregate_registry = AggregateRegistry()
+        return _aggregate_registry
 
 
 def map_aggregate_names():
     """Maps aggregate names to uuids"""
-    novaclient = nova.novaclient()
-    aggregate_map = {
-        agg.name: agg.uuid for agg in novaclient.aggregates.list()
-    }
-    uuids = []
-    for aggregates in CONF.reaper.watched_aggregates:
-        aggregates = aggregates.split('|')
-        uuids.append([aggregate_map[agg.strip()] for agg in aggregates])
-    return uuids
+    return aggregate_registry().watched()
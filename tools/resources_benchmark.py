@@ -0,0 +1,55 @@
+# Copyright (c) 2018 European Organization for Nuclear Research.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Microbenchmark of the Resources arithmetic used by the reaper drivers
+
+Usage: python tools/resources_benchmark.py [number]
+"""
+
+from __future__ import print_function
+
+import sys
+import timeit
+
+
+SETUP = """
+from aardvark.objects.resources import Resources
+a = Resources({'VCPU': 8, 'MEMORY_MB': 16384, 'DISK_GB': 160})
+b = Resources({'VCPU': 2, 'MEMORY_MB': 4096, 'DISK_GB': 40})
+servers = [b] * 32
+"""
+
+CASES = [
+    ('a + b', 'a + b'),
+    ('a - b', 'a - b'),
+    ('a * 3', 'a * 3'),
+    ('a >= b', 'a >= b'),
+    ('a == b', 'a == b'),
+    ('min_ratio(a, b)', 'Resources.min_ratio(a, b)'),
+    ('sum of 32 servers',
+     'total = Resources()\nfor s in servers:\n    total += s'),
+]
+
+
+def main(number):
+    print('%-20s %12s' % ('operation', 'usec/op'))
+    for name, stmt in CASES:
+        timer = timeit.Timer(stmt, setup=SETUP)
+        best = min(timer.repeat(repeat=3, number=number))
+        print('%-20s %12.3f' % (name, best * 1e6 / number))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)